@@ -95,6 +95,7 @@ ln -s  %{_bindir}/osbs-%{binaries_py_version} %{buildroot}%{_bindir}/osbs
 %license LICENSE
 %{_bindir}/osbs-%{python3_version}
 %{_bindir}/osbs-3
+%{_bindir}/osbs-loadtest
 %{python3_sitelib}/osbs*
 
 
@@ -0,0 +1,9 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+asyncio client, see osbs.aio.api.OSBS
+"""
@@ -0,0 +1,222 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import inspect
+import logging
+import sys
+import warnings
+from functools import wraps
+from typing import Any, Dict
+
+from osbs import api
+from osbs.aio.tekton import Openshift, PipelineRun
+from osbs.tekton import PipelineRunStatus, list_pipeline_runs_status
+from osbs.exceptions import OsbsException
+
+logger = logging.getLogger(__name__)
+
+
+def _convert_exception(ex):
+    """
+    Convert anything except OsbsException to OsbsException, as osbs.api.osbsapi does
+    """
+    # Propogate flexmock errors immediately (used in test cases)
+    if isinstance(ex, OsbsException) or getattr(ex, '__module__', None) == 'flexmock':
+        return ex
+    return OsbsException(cause=ex, traceback=sys.exc_info()[2])
+
+
+async def _catch_awaitable_exceptions(awaitable):
+    try:
+        return await awaitable
+    except Exception as ex:
+        converted = _convert_exception(ex)
+        if converted is ex:
+            raise
+        raise converted from ex
+
+
+async def _catch_generator_exceptions(generator):
+    try:
+        async for item in generator:
+            yield item
+    except Exception as ex:
+        converted = _convert_exception(ex)
+        if converted is ex:
+            raise
+        raise converted from ex
+
+
+# Decorator for API methods, counterpart of osbs.api.osbsapi for methods
+# returning awaitables or async generators
+def osbsapi(func):
+    @wraps(func)
+    def catch_exceptions(*args, **kwargs):
+        if kwargs.pop("namespace", None):
+            warnings.warn("OSBS.%s: the 'namespace' argument is no longer supported" %
+                          func.__name__)
+        try:
+            result = func(*args, **kwargs)
+        except Exception as ex:
+            converted = _convert_exception(ex)
+            if converted is ex:
+                raise
+            raise converted from ex
+
+        if inspect.isasyncgen(result):
+            return _catch_generator_exceptions(result)
+        return _catch_awaitable_exceptions(result)
+
+    return catch_exceptions
+
+
+class OSBS(object):
+    """
+    asyncio version of osbs.api.OSBS, methods have the same names and arguments
+
+    Building pipeline run definitions is delegated to osbs.api.OSBS, available
+    as the 'sync' attribute.
+    """
+
+    def __init__(self, openshift_configuration, executor=None, stream_executor=None):
+        """
+        :param openshift_configuration: osbs.conf.Configuration
+        :param executor: concurrent.futures.Executor used for blocking requests,
+                         None for the loop's default executor
+        :param stream_executor: concurrent.futures.Executor used for watches and
+                                followed logs, its max_workers limits how many of them
+                                are read at once, see osbs.aio.tekton; None to create
+                                one with aio_stream_workers threads of the configuration
+        """
+        self.sync = api.OSBS(openshift_configuration)
+        self.os_conf = self.sync.os_conf
+        self.os = Openshift(self.sync.os, executor=executor, stream_executor=stream_executor,
+                            stream_workers=self.os_conf.get_aio_stream_workers())
+
+    def close(self):
+        """
+        Shut down the stream executor, unless it was given
+        """
+        self.os.close()
+
+    def _wrap(self, pipeline_run):
+        return PipelineRun(self.os, pipeline_run.pipeline_run_name,
+                           pipeline_run_data=pipeline_run.input_data)
+
+    async def _create(self, create, **kwargs):
+        return self._wrap(await self.os.run(create, **kwargs))
+
+    @osbsapi
+    async def create_binary_container_pipeline_run(self, **kwargs):
+        return await self._create(self.sync.create_binary_container_pipeline_run, **kwargs)
+
+    @osbsapi
+    async def create_binary_container_pipeline_runs(self, builds, **kwargs):
+        results = await self.os.run(self.sync.create_binary_container_pipeline_runs, builds,
+                                    **kwargs)
+        return [api.BatchResult(self._wrap(result.pipeline_run) if result.pipeline_run else None,
+                                result.error)
+                for result in results]
+
+    @osbsapi
+    async def create_source_container_pipeline_run(self, **kwargs):
+        return await self._create(self.sync.create_source_container_pipeline_run, **kwargs)
+
+    @osbsapi
+    async def get_build_name(self, build_response: PipelineRun):
+        return build_response.pipeline_run_name
+
+    @osbsapi
+    async def get_build(self, build_name):
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.get_info()
+
+    @osbsapi
+    async def get_builds_status(self, build_names=None,
+                                label_selector=None) -> Dict[str, PipelineRunStatus]:
+        return await self.os.run(list_pipeline_runs_status, self.sync.os,
+                                 pipeline_run_names=build_names, label_selector=label_selector)
+
+    @osbsapi
+    async def get_final_platforms(self, build_name):
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.get_final_platforms()
+
+    @osbsapi
+    async def get_build_reason(self, build_name):
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.get_status_reason()
+
+    @osbsapi
+    async def build_has_succeeded(self, build_name):
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.has_succeeded()
+
+    @osbsapi
+    async def build_not_finished(self, build_name):
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.has_not_finished()
+
+    @osbsapi
+    async def wait_for_build_to_finish(self, build_name, timeout=None, deadline=None):
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.wait_for_finish(timeout=timeout, deadline=deadline)
+
+    @osbsapi
+    async def build_was_cancelled(self, build_name):
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.was_cancelled()
+
+    @osbsapi
+    async def build_has_any_failed_tasks(self, build_name):
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.any_task_failed()
+
+    @osbsapi
+    async def build_has_any_cancelled_tasks(self, build_name):
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.any_task_was_cancelled()
+
+    @osbsapi
+    async def cancel_build(self, build_name):
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.cancel_pipeline_run()
+
+    @osbsapi
+    async def remove_build(self, build_name):
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.remove_pipeline_run()
+
+    @osbsapi
+    def get_build_logs(self, build_name, follow=False, wait=False):
+        """
+        :return: async generator of (pipeline task name, log line) when following
+                 or waiting, otherwise awaitable of {pipeline task name: logs}
+        """
+        pipeline_run = PipelineRun(self.os, build_name)
+        return pipeline_run.get_logs(follow=follow, wait=wait)
+
+    @osbsapi
+    async def save_build_logs(self, build_name, directory):
+        return await self.os.run(self.sync.save_build_logs, build_name, directory)
+
+    @osbsapi
+    async def get_build_error_message(self, build_name):
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.get_error_message()
+
+    @osbsapi
+    async def get_build_results(self, build_name) -> Dict[str, Any]:
+        """Fetch the pipelineResults for this build."""
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.get_pipeline_results()
+
+    @osbsapi
+    async def get_task_results(self, build_name) -> Dict[str, Any]:
+        """Fetch tasks results for this build."""
+        pipeline_run = PipelineRun(self.os, build_name)
+        return await pipeline_run.get_task_results()
@@ -0,0 +1,670 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+asyncio versions of Openshift, PipelineRun, TaskRun and Pod from osbs.tekton
+
+Requests are made by the wrapped osbs.tekton objects, so HTTP session, authentication
+and retries are shared with the synchronous client. Blocking requests run in an
+executor, so the event loop is never blocked and a single loop can follow many
+builds at once.
+
+Short requests run in the executor of Openshift, the loop's default one unless
+given. Long-lived streams, i.e. watches, followed container logs and informer
+waits, run in a separate stream executor, so they can't starve short requests.
+
+Reading a stream blocks in the HTTP client, so a stream holds a thread of the stream
+executor whenever it waits for the next item, which for a watch or a followed log
+is nearly all the time it's open. At most stream_workers streams (the max_workers
+of a given stream executor) are read at the same time; further streams wait for
+a free thread and their builds aren't followed meanwhile. Following logs of a build
+holds a thread for the watch of the pipeline run, one for each running task run
+until its pod starts and one for each container of pods of running task runs;
+waiting for a build to finish holds one. The aio_stream_workers configuration
+option sets the number of threads used by osbs.aio.api.OSBS; http_pool_maxsize
+should be raised along with it, as each stream also holds a connection.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+
+import requests
+
+from osbs import tekton
+from osbs.constants import AIO_STREAM_WORKERS
+from osbs.exceptions import OsbsException, OsbsResponseException
+from osbs.tekton import LOG_STREAM_BUFFER_SIZE
+
+logger = logging.getLogger(__name__)
+
+_END = object()
+
+
+async def _wait_done(future):
+    """
+    Wait until the future is done, even when cancelled meanwhile
+
+    :return: bool, whether waiting was cancelled
+    """
+    cancelled = False
+    while not future.done():
+        try:
+            await asyncio.wait([future])
+        except asyncio.CancelledError:
+            cancelled = True
+    return cancelled
+
+
+async def iterate_in_executor(iterable, executor=None, stopper=None):
+    """
+    Iterate a blocking iterable without blocking the event loop
+
+    Each item is fetched in the executor, the iterable is closed in the executor
+    when the async generator is closed early or cancelled. A generator can't be
+    closed while it's fetching an item, so the stopper is stopped first, which
+    interrupts its stream, and it's closed once the fetch has ended. The thread
+    is released before CancelledError is raised.
+
+    :param iterable: iterable, e.g. generator reading a streamed response
+    :param executor: concurrent.futures.Executor, None for the loop's default one
+    :param stopper: osbs.tekton._StreamStopper given to the iterable as its multiplexer,
+                    None when fetching an item doesn't block for a long time
+    :return: async generator of items of the iterable
+    """
+    loop = asyncio.get_running_loop()
+    iterator = iter(iterable)
+    fetch = None
+    try:
+        while True:
+            fetch = loop.run_in_executor(executor, next, iterator, _END)
+            # when cancelled, the fetch keeps running in its thread
+            item = await asyncio.shield(fetch)
+            fetch = None
+            if item is _END:
+                return
+            yield item
+    finally:
+        cancelled = False
+        if fetch is not None:
+            if not fetch.done() and stopper is not None:
+                stopper.stop()
+            cancelled = await _wait_done(fetch)
+            if not fetch.cancelled():
+                # errors of interrupted fetches are expected
+                fetch.exception()
+
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            closing = loop.run_in_executor(executor, close)
+            cancelled = await _wait_done(closing) or cancelled
+            closing.result()
+        if cancelled:
+            raise asyncio.CancelledError()
+
+
+class Openshift(object):
+    def __init__(self, os, executor=None, stream_executor=None,
+                 stream_workers=AIO_STREAM_WORKERS):
+        """
+        :param os: osbs.tekton.Openshift, client used for requests
+        :param executor: concurrent.futures.Executor used for blocking requests,
+                         None for the loop's default executor
+        :param stream_executor: concurrent.futures.Executor used for long-lived streams,
+                                None to create one when it's needed
+        :param stream_workers: int, number of threads of the created stream executor,
+                               i.e. how many streams are read at once
+        """
+        self.sync = os
+        self.executor = executor
+        self.stream_workers = stream_workers
+        self._stream_executor = stream_executor
+        self._owns_stream_executor = stream_executor is None
+
+    @property
+    def stream_executor(self):
+        if self._stream_executor is None:
+            self._stream_executor = ThreadPoolExecutor(max_workers=self.stream_workers,
+                                                       thread_name_prefix='osbs-aio-stream')
+        return self._stream_executor
+
+    def close(self):
+        """
+        Shut down the stream executor created by this object, streams which are
+        still read keep their threads until they end
+        """
+        if self._owns_stream_executor and self._stream_executor is not None:
+            self._stream_executor.shutdown(wait=False)
+            self._stream_executor = None
+
+    @property
+    def namespace(self):
+        return self.sync.namespace
+
+    @property
+    def use_informers(self):
+        return self.sync.use_informers
+
+    async def run(self, func, *args, **kwargs):
+        """
+        Call blocking func in the executor
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor,
+                                          functools.partial(func, *args, **kwargs))
+
+    async def run_stream(self, func, *args, **kwargs):
+        """
+        Call blocking func, which waits for a long time, in the stream executor
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.stream_executor,
+                                          functools.partial(func, *args, **kwargs))
+
+    def iterate(self, iterable, stopper=None):
+        """
+        Iterate a long-lived blocking iterable, e.g. a watch or log stream,
+        in the stream executor, see iterate_in_executor
+        """
+        return iterate_in_executor(iterable, self.stream_executor, stopper)
+
+    async def wait_for_cached(self, informer, name, predicate, exists=None, timeout=None):
+        """
+        Informer.wait_for in the stream executor, the waiting thread is released within
+        INFORMER_STOP_POLL_SECS when the coroutine is cancelled
+        """
+        stop = threading.Event()
+        try:
+            return await self.run_stream(informer.wait_for, name, predicate, exists=exists,
+                                         timeout=timeout, stop=stop)
+        finally:
+            stop.set()
+
+    def build_url(self, api_path, api_version, url, _prepend_namespace=True, **query):
+        return self.sync.build_url(api_path, api_version, url,
+                                   _prepend_namespace=_prepend_namespace, **query)
+
+    async def post(self, url, with_auth=True, **kwargs):
+        return await self.run(self.sync.post, url, with_auth=with_auth, **kwargs)
+
+    async def get(self, url, with_auth=True, **kwargs):
+        return await self.run(self.sync.get, url, with_auth=with_auth, **kwargs)
+
+    async def put(self, url, with_auth=True, **kwargs):
+        return await self.run(self.sync.put, url, with_auth=with_auth, **kwargs)
+
+    async def patch(self, url, with_auth=True, **kwargs):
+        return await self.run(self.sync.patch, url, with_auth=with_auth, **kwargs)
+
+    async def delete(self, url, with_auth=True, **kwargs):
+        return await self.run(self.sync.delete, url, with_auth=with_auth, **kwargs)
+
+    async def list_resource(self, api_path, api_version, resource_type, limit=None, **query):
+        return await self.run(self.sync.list_resource, api_path, api_version, resource_type,
+                              limit=limit, **query)
+
+    def watch_resource(self, api_path, api_version, resource_type, resource_name,
+                       **request_args):
+        """
+        Async generator of the object's json representation after each update to it,
+        see osbs.tekton.Openshift.watch_resource
+        """
+        stopper = tekton._StreamStopper()
+        return self.iterate(self.sync.watch_resource(api_path, api_version, resource_type,
+                                                     resource_name, _multiplexer=stopper,
+                                                     **request_args),
+                            stopper)
+
+
+class _LogMultiplexer(object):
+    """
+    Read any number of async log streams at the same time, each in its own task,
+    and yield their lines in order of arrival, see osbs.tekton._LogMultiplexer
+    """
+    _STREAM_END = object()
+
+    def __init__(self, buffer_size=LOG_STREAM_BUFFER_SIZE):
+        self._buffer_size = buffer_size
+        self._lines = asyncio.Queue()
+        self._tasks = set()
+        self._running = 0
+
+    def add(self, key, lines):
+        """
+        Start reading a stream in a new task
+
+        :param key: tuple, yielded with each line of the stream
+        :param lines: async iterable of lines, or awaitable adding other streams
+        """
+        self._running += 1
+        self._tasks.add(asyncio.ensure_future(self._read(key, lines)))
+
+    async def _read(self, key, lines):
+        free_slots = asyncio.Semaphore(self._buffer_size)
+        try:
+            if hasattr(lines, '__aiter__'):
+                try:
+                    async for line in lines:
+                        await free_slots.acquire()
+                        self._lines.put_nowait((key, line, free_slots))
+                finally:
+                    # release the stream now rather than when it's garbage collected
+                    if hasattr(lines, 'aclose'):
+                        await lines.aclose()
+            else:
+                await lines
+        except Exception as exc:  # pylint: disable=broad-except
+            self._lines.put_nowait((key, exc, None))
+        finally:
+            self._lines.put_nowait(self._STREAM_END)
+
+    async def __aiter__(self):
+        try:
+            while self._running:
+                item = await self._lines.get()
+                if item is self._STREAM_END:
+                    self._running -= 1
+                    continue
+
+                key, line, free_slots = item
+                if free_slots is None:
+                    raise line
+                free_slots.release()
+                yield key + (line,)
+        finally:
+            for task in self._tasks:
+                task.cancel()
+            # streams end once their threads are released
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+class PipelineRun(object):
+    def __init__(self, os, pipeline_run_name, pipeline_run_data=None):
+        """
+        :param os: osbs.aio.tekton.Openshift
+        """
+        self.os = os
+        self.pipeline_run_name = pipeline_run_name
+        self.sync = tekton.PipelineRun(os.sync, pipeline_run_name, pipeline_run_data)
+
+    async def start_pipeline_run(self):
+        return await self.os.run(self.sync.start_pipeline_run)
+
+    async def remove_pipeline_run(self):
+        return await self.os.run(self.sync.remove_pipeline_run)
+
+    async def cancel_pipeline_run(self):
+        return await self.os.run(self.sync.cancel_pipeline_run)
+
+    async def get_info(self, wait=False):
+        if wait:
+            await self.wait_for_start()
+        return await self.os.run(self.sync.get_info)
+
+    async def get_task_runs(self):
+        return await self.os.run(self.sync.get_task_runs)
+
+    async def get_task_results(self):
+        return await self.os.run(self.sync.get_task_results)
+
+    async def get_error_message(self):
+        return await self.os.run(self.sync.get_error_message)
+
+    async def get_final_platforms(self):
+        return await self.os.run(self.sync.get_final_platforms)
+
+    async def has_succeeded(self):
+        return await self.os.run(self.sync.has_succeeded)
+
+    async def has_not_finished(self):
+        return await self.os.run(self.sync.has_not_finished)
+
+    async def was_cancelled(self):
+        return await self.os.run(self.sync.was_cancelled)
+
+    async def any_task_failed(self):
+        return await self.os.run(self.sync.any_task_failed)
+
+    async def any_task_was_cancelled(self):
+        return await self.os.run(self.sync.any_task_was_cancelled)
+
+    async def get_status_reason(self):
+        return await self.os.run(lambda: self.sync.status_reason)
+
+    async def get_status_status(self):
+        return await self.os.run(lambda: self.sync.status_status)
+
+    async def get_pipeline_results(self):
+        return await self.os.run(lambda: self.sync.pipeline_results)
+
+    async def wait_for_finish(self, timeout=None, deadline=None):
+        """
+        Wait until the pipeline run finishes, see osbs.tekton.PipelineRun.wait_for_finish
+
+        The watch holds a thread of the stream executor while it waits for the next
+        event, i.e. while the pipeline run is running; polling sleeps in the event loop
+        and holds a thread only for each request.
+
+        :param timeout: float, maximum number of seconds to wait, 5 hours by default
+        :param deadline: float, time.time() timestamp when waiting ends at the latest
+        :return: bool, False when waiting timed out
+        """
+        end = tekton._wait_end(timeout, deadline)
+
+        pipeline_run = await self.get_info()
+        if self.sync._has_finished(pipeline_run):
+            self.sync._log_wait_result(True)
+            return True
+        resource_version = pipeline_run['metadata'].get('resourceVersion')
+
+        if self.os.use_informers:
+            informer = self.os.sync.get_informer(self.sync.api_path, self.sync.api_version,
+                                                 "pipelineruns")
+            pipeline_run = await self.os.wait_for_cached(
+                informer, self.pipeline_run_name, self.sync._has_finished,
+                exists=lambda: bool(self.sync.get_info()),
+                timeout=max(end - time.time(), 0))
+            finished = pipeline_run is not None or not await self.get_info()
+        else:
+            try:
+                finished = await self._watch_for_finish(end, resource_version)
+            except (OsbsException, requests.exceptions.RequestException) as exc:
+                logger.info("Can't watch pipeline run '%s', polling it instead: %r",
+                            self.pipeline_run_name, exc)
+                finished = await self._poll_for_finish(end)
+
+        self.sync._log_wait_result(finished)
+        return finished
+
+    async def _watch_for_finish(self, end, resource_version):
+        """
+        Watch the pipeline run from the given resourceVersion until it finishes,
+        see osbs.tekton._FinishWatch
+
+        :param end: float, time.time() timestamp when waiting ends
+        :param resource_version: str, resourceVersion of the last fetched pipeline run
+        :return: bool, False when waiting timed out
+        """
+        watch = tekton._FinishWatch(self.sync, end, resource_version)
+        while watch.remaining() > 0:
+            if watch.need_baseline and watch.set_baseline(await self.get_info()):
+                return True
+            stopper = tekton._StreamStopper()
+            events = self.os.iterate(self.os.sync.watch_events(
+                self.sync.api_path, self.sync.api_version, "pipelineruns",
+                self.pipeline_run_name, _multiplexer=stopper, **watch.start_stream()), stopper)
+            try:
+                async for event in events:
+                    if watch.handle_event(event):
+                        return True
+                    if watch.need_baseline:
+                        break
+            except OsbsResponseException as exc:
+                if not watch.history_expired(exc):
+                    raise
+            finally:
+                await events.aclose()
+            sleep_secs = watch.stream_ended()
+            if sleep_secs is not None:
+                await asyncio.sleep(sleep_secs)
+        return False
+
+    async def _poll_for_finish(self, end):
+        """
+        Poll the pipeline run with exponentially growing intervals until it finishes
+
+        :param end: float, time.time() timestamp when waiting ends
+        :return: bool, False when waiting timed out
+        """
+        intervals = tekton._poll_intervals(end)
+        while await self.has_not_finished():
+            sleep_secs = next(intervals, None)
+            if sleep_secs is None:
+                return False
+            logger.info("Waiting for pipeline run '%s' to finish, sleep for %ss",
+                        self.pipeline_run_name, sleep_secs)
+            await asyncio.sleep(sleep_secs)
+        return True
+
+    async def wait_for_start(self):
+        """
+        https://tekton.dev/docs/pipelines/pipelineruns/#monitoring-execution-status
+        """
+        logger.info("Waiting for pipeline run '%s' to start", self.pipeline_run_name)
+        if self.os.use_informers:
+            informer = self.os.sync.get_informer(self.sync.api_path, self.sync.api_version,
+                                                 "pipelineruns")
+            pipeline_run = await self.os.wait_for_cached(
+                informer, self.pipeline_run_name, self.sync._has_started,
+                exists=lambda: bool(self.sync.get_info()))
+            if not pipeline_run:
+                logger.info("Pipeline run '%s' does not exist", self.pipeline_run_name)
+            return pipeline_run
+
+        async for pipeline_run in self.os.watch_resource(
+                self.sync.api_path,
+                self.sync.api_version,
+                resource_type="pipelineruns",
+                resource_name=self.pipeline_run_name,
+        ):
+            # failed because connection or timeout and pipeline was removed
+            if not pipeline_run and not await self.get_info():
+                logger.info("Pipeline run '%s' does not exist", self.pipeline_run_name)
+                return None
+
+            if self.sync._has_started(pipeline_run):
+                return pipeline_run
+
+    def wait_for_taskruns(self):
+        """
+        Async generator of lists of newly started task runs,
+        see osbs.tekton.PipelineRun.wait_for_taskruns
+        """
+        stopper = tekton._StreamStopper()
+        return self.os.iterate(self.sync.wait_for_taskruns(_multiplexer=stopper), stopper)
+
+    async def follow_logs(self, buffer_size=LOG_STREAM_BUFFER_SIZE):
+        """
+        Follow logs of all containers of all task runs at the same time,
+        see osbs.tekton.PipelineRun.follow_logs
+
+        :param buffer_size: int, maximum number of lines buffered for each container
+        :return: async generator of (pipeline task name, container, line)
+        """
+        await self.wait_for_start()
+        logs = _LogMultiplexer(buffer_size)
+
+        async def follow_task_run(pipeline_task_name, task_run_name):
+            task_run = TaskRun(os=self.os, task_run_name=task_run_name)
+            pod = await task_run.wait_for_pod()
+            if pod:
+                for container in pod.containers:
+                    logs.add((pipeline_task_name, container), pod.stream_container_logs(container))
+
+        async def follow_task_runs():
+            async for task_runs in self.wait_for_taskruns():
+                for pipeline_task_name, task_run_name in task_runs:
+                    logs.add((pipeline_task_name,),
+                             follow_task_run(pipeline_task_name, task_run_name))
+
+        logs.add((self.pipeline_run_name,), follow_task_runs())
+        async for item in logs:
+            yield item
+
+    async def _get_logs_stream(self):
+        async for pipeline_task_name, _, line in self.follow_logs():
+            yield pipeline_task_name, line
+
+    def get_logs(self, follow=False, wait=False):
+        """
+        :return: async generator of (pipeline task name, log line) when following
+                 or waiting, otherwise awaitable of {pipeline task name: logs}
+        """
+        if wait or follow:
+            return self._get_logs_stream()
+        return self.os.run(self.sync.get_logs)
+
+
+class TaskRun(object):
+    def __init__(self, os, task_run_name):
+        """
+        :param os: osbs.aio.tekton.Openshift
+        """
+        self.os = os
+        self.task_run_name = task_run_name
+        self.sync = tekton.TaskRun(os.sync, task_run_name)
+
+    async def get_info(self, wait=False):
+        if wait:
+            await self.wait_for_start()
+        return await self.os.run(self.sync.get_info)
+
+    async def wait_for_pod(self):
+        """
+        Wait for the task run and its pod to start
+
+        :return: Pod of the task run, None when the task run or pod doesn't exist
+        """
+        task_run = await self.wait_for_start() or await self.get_info()
+        if not task_run:
+            return None
+
+        pod = self.get_pod(task_run)
+        if not await pod.wait_for_start() and not await pod.get_info():
+            return None
+        return pod
+
+    def get_logs(self, follow=False, wait=False):
+        """
+        :return: async generator of log lines when following or waiting,
+                 otherwise awaitable of {container: logs}
+        """
+        if follow or wait:
+            return self._get_logs_stream()
+        return self.os.run(self.sync.get_logs)
+
+    async def _get_logs_stream(self):
+        task_run = await self.wait_for_start()
+        if not task_run and not await self.get_info():
+            return
+        async for line in self.get_pod_logs(task_run, follow=True, wait=True):
+            yield line
+
+    def get_pod_logs(self, task_run, follow=False, wait=False):
+        """
+        Get logs of the pod of the task run
+
+        :param task_run: dict, already fetched task run data
+        """
+        return self.get_pod(task_run).get_logs(follow=follow, wait=wait)
+
+    def get_pod(self, task_run):
+        """
+        :param task_run: dict, already fetched task run data
+        :return: Pod of the task run with containers of its steps
+        """
+        pod = self.sync.get_pod(task_run)
+        return Pod(os=self.os, pod_name=pod.pod_name, containers=pod.containers)
+
+    async def wait_for_start(self):
+        """
+        https://tekton.dev/docs/pipelines/taskruns/#monitoring-execution-status
+        """
+        logger.info("Waiting for task run '%s' to start", self.task_run_name)
+        if self.os.use_informers:
+            informer = self.os.sync.get_informer(self.sync.api_path, self.sync.api_version,
+                                                 "taskruns")
+            task_run = await self.os.wait_for_cached(
+                informer, self.task_run_name, self.sync._has_started,
+                exists=lambda: bool(self.sync.get_info()))
+            if not task_run:
+                logger.info("Task run '%s' does not exist", self.task_run_name)
+            return task_run
+
+        async for task_run in self.os.watch_resource(
+                self.sync.api_path,
+                self.sync.api_version,
+                resource_type="taskruns",
+                resource_name=self.task_run_name,
+        ):
+            # failed because connection or timeout and task was removed
+            if not task_run and not await self.get_info():
+                logger.info("Task run '%s' does not exist", self.task_run_name)
+                return None
+
+            if self.sync._has_started(task_run):
+                return task_run
+
+
+class Pod(object):
+    def __init__(self, os, pod_name, containers=None):
+        """
+        :param os: osbs.aio.tekton.Openshift
+        """
+        self.os = os
+        self.pod_name = pod_name
+        self.containers = containers
+        self.sync = tekton.Pod(os.sync, pod_name, containers=containers)
+
+    async def get_info(self, wait=False):
+        if wait:
+            await self.wait_for_start()
+        return await self.os.run(self.sync.get_info)
+
+    async def _get_logs_stream(self):
+        pod = await self.wait_for_start()
+
+        if not pod and not await self.get_info():
+            return
+
+        for container in self.containers:
+            async for line in self.stream_container_logs(container):
+                yield line
+
+    def stream_container_logs(self, container, cursor=None):
+        """
+        :param cursor: osbs.tekton.LogCursor, position to continue from, updated
+                       as lines are delivered
+        :return: async generator of log lines of the container, following new ones
+        """
+        stopper = tekton._StreamStopper()
+        return self.os.iterate(self.sync._stream_logs(container, cursor, stopper), stopper)
+
+    def get_logs(self, follow=False, wait=False):
+        """
+        :return: async generator of log lines when following or waiting,
+                 otherwise awaitable of {container: logs} or of logs
+                 when containers aren't specified
+        """
+        if follow or wait:
+            return self._get_logs_stream()
+        return self.os.run(self.sync.get_logs)
+
+    async def wait_for_start(self):
+        logger.info("Waiting for pod to start '%s'", self.pod_name)
+        if self.os.use_informers:
+            informer = self.os.sync.get_informer(self.sync.api_path, self.sync.api_version,
+                                                 "pods")
+            pod = await self.os.wait_for_cached(
+                informer, self.pod_name, self.sync._has_started,
+                exists=lambda: bool(self.sync.get_info()))
+            if not pod:
+                logger.info("Pod '%s' does not exist", self.pod_name)
+            return pod
+
+        async for pod in self.os.watch_resource(
+                self.sync.api_path, self.sync.api_version,
+                resource_type="pods", resource_name=self.pod_name
+        ):
+            # failed because connection or timeout and pod was removed
+            if not pod and not await self.get_info():
+                logger.info("Pod '%s' does not exist", self.pod_name)
+                return None
+
+            if self.sync._has_started(pod):
+                return pod
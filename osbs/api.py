@@ -8,12 +8,16 @@ of the BSD license. See the LICENSE file for details.
 from __future__ import print_function, unicode_literals, absolute_import
 
 from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import logging
+import os
 import sys
+import threading
+import time
 import warnings
-import yaml
 from functools import wraps
-from typing import Any, Dict
+from typing import Any, Dict, List
 from string import Template
 
 from osbs.build.user_params import (
@@ -21,20 +25,104 @@ from osbs.build.user_params import (
     SourceContainerUserParams
 )
 from osbs.constants import (RELEASE_LABEL_FORMAT, VERSION_LABEL_FORBIDDEN_CHARS,
-                            ISOLATED_RELEASE_FORMAT)
-from osbs.tekton import Openshift, PipelineRun
+                            ISOLATED_RELEASE_FORMAT, BATCH_MAX_WORKERS, BATCH_MAX_GIT_WORKERS)
+from osbs.tekton import Openshift, PipelineRun, PipelineRunStatus, list_pipeline_runs_status
 from osbs.exceptions import (OsbsException, OsbsValidationException, OsbsResponseException)
+from osbs.utils import metrics
+from osbs.utils.git_cache import GitMirrorCache
+from osbs.utils.repo_info_cache import RepoInfoCache
 from osbs.utils.labels import Labels
 # import utils in this way, so that we can mock standalone functions with flexmock
 from osbs import utils
 
 
+class _TemplateScalar(object):
+    """
+    String scalar of a pipeline run template which contains $placeholders
+    """
+
+    def __init__(self, value, plain):
+        self.template = Template(value)
+        # plain (unquoted) scalars are resolved to int, bool, ... after substitution
+        self.plain = plain
+
+
+class _PipelineRunTemplate(object):
+    """
+    Pipeline run template, parsed once and rendered by substituting placeholders
+    in the parsed structure
+
+    Rendering gives the same result as substituting placeholders in the template
+    text and parsing it, as long as the substituted values don't change the YAML
+    structure (e.g. contain quotes or newlines), which they must not anyway.
+    """
+
+    _loader = None
+
+    def __init__(self, yaml_data):
+        import yaml
+
+        # the loader is a subclass of yaml.SafeLoader, it only adds template scalars
+        self.data = yaml.load(yaml_data, Loader=self._get_loader())  # nosec B506
+
+    @classmethod
+    def _get_loader(cls):
+        import yaml
+
+        if cls._loader is None:
+            class Loader(yaml.SafeLoader):
+                def construct_yaml_str(self, node):
+                    value = self.construct_scalar(node)
+                    if '$' in value:
+                        return _TemplateScalar(value, plain=node.style is None)
+                    return value
+
+            Loader.add_constructor('tag:yaml.org,2002:str', Loader.construct_yaml_str)
+            cls._loader = Loader
+        return cls._loader
+
+    def render(self, substitutions):
+        import yaml
+
+        resolver = yaml.resolver.Resolver()
+
+        def render(data):
+            if isinstance(data, dict):
+                return {render(key): render(value) for key, value in data.items()}
+            if isinstance(data, list):
+                return [render(item) for item in data]
+            if isinstance(data, _TemplateScalar):
+                value = data.template.safe_substitute(substitutions)
+                if (data.plain and resolver.resolve(yaml.ScalarNode, value, (True, False)) !=
+                        'tag:yaml.org,2002:str'):
+                    return yaml.safe_load(value)
+                return value
+            # other scalars are immutable
+            return data
+
+        return render(self.data)
+
+
+# {path: (mtime, _PipelineRunTemplate)}
+_pipeline_run_templates = {}
+_pipeline_run_templates_lock = threading.Lock()
+
+
+@metrics.instrumented('load_pipeline_run_template')
 def _load_pipeline_from_template(pipeline_run_path, substitutions):
-    """Load pipeline run from template and apply substitutions"""
-    with open(pipeline_run_path) as f:
-        yaml_data = f.read()
-    template = Template(yaml_data)
-    return yaml.safe_load(template.safe_substitute(substitutions))
+    """Load pipeline run from template and apply substitutions
+
+    Templates are parsed once and cached until the file is modified
+    """
+    mtime = os.stat(pipeline_run_path).st_mtime_ns
+    with _pipeline_run_templates_lock:
+        cached_mtime, template = _pipeline_run_templates.get(pipeline_run_path, (None, None))
+        if cached_mtime != mtime:
+            metrics.count('pipeline_run_template_parses')
+            with open(pipeline_run_path) as f:
+                template = _PipelineRunTemplate(f.read())
+            _pipeline_run_templates[pipeline_run_path] = (mtime, template)
+    return template.render(substitutions)
 
 
 # Decorator for API methods.
@@ -70,6 +158,25 @@ _REQUIRED_PARAM = object()
 logger = logging.getLogger(__name__)
 
 LogEntry = namedtuple('LogEntry', ['platform', 'line'])
+BatchResult = namedtuple('BatchResult', ['pipeline_run', 'error'])
+
+
+@contextmanager
+def _unlimited():
+    yield
+
+
+@contextmanager
+def _timed(phase, timings):
+    """
+    Add seconds spent in the phase to timings, if provided
+    """
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[phase] = timings.get(phase, 0) + time.monotonic() - start
 
 
 class OSBS(object):
@@ -96,8 +203,28 @@ class OSBS(object):
                             use_auth=self.os_conf.get_use_auth(),
                             verify_ssl=self.os_conf.get_verify_ssl(),
                             token=self.os_conf.get_oauth2_token(),
-                            namespace=self.os_conf.get_namespace())
+                            namespace=self.os_conf.get_namespace(),
+                            http_pool_maxsize=self.os_conf.get_http_pool_maxsize(),
+                            http_keep_alive=self.os_conf.get_http_keep_alive(),
+                            http_circuit_breaker_threshold=(
+                                self.os_conf.get_http_circuit_breaker_threshold()),
+                            http_circuit_breaker_reset=(
+                                self.os_conf.get_http_circuit_breaker_reset()),
+                            use_informers=self.os_conf.get_use_informers(),
+                            api_qps=self.os_conf.get_api_qps(),
+                            api_burst=self.os_conf.get_api_burst())
         self._bm = None
+        self._git_cache = None
+        git_cache_dir = self.os_conf.get_git_cache_dir()
+        if git_cache_dir:
+            self._git_cache = GitMirrorCache(
+                git_cache_dir, max_size=self.os_conf.get_git_cache_max_size_mb() * 1024 * 1024)
+        self._repo_info_cache = None
+        if self.os_conf.get_use_repo_info_cache():
+            self._repo_info_cache = RepoInfoCache(
+                cache_dir=self.os_conf.get_repo_info_cache_dir(),
+                max_entries=self.os_conf.get_repo_info_cache_size(),
+                ttl=self.os_conf.get_repo_info_cache_ttl())
 
     def _check_labels(self, repo_info):
         labels = repo_info.labels
@@ -257,18 +384,66 @@ class OSBS(object):
         return self.create_binary_container_pipeline_run(**kwargs)
 
     @osbsapi
-    def create_binary_container_pipeline_run(self,
-                                             git_uri=_REQUIRED_PARAM, git_ref=_REQUIRED_PARAM,
-                                             git_branch=_REQUIRED_PARAM,
-                                             component=None,
-                                             flatpak=None,
-                                             git_commit_depth=None,
-                                             isolated=None,
-                                             koji_task_id=None,
-                                             target=None,
-                                             operator_csv_modifications_url=None,
-                                             **kwargs):
+    def create_binary_container_pipeline_run(self, *args, **kwargs):
+        return self._create_binary_container_pipeline_run(_unlimited(), _unlimited(),
+                                                          *args, **kwargs)
 
+    @osbsapi
+    def create_binary_container_pipeline_runs(self, builds, max_workers=BATCH_MAX_WORKERS,
+                                              max_git_workers=BATCH_MAX_GIT_WORKERS,
+                                              max_api_workers=None) -> List[BatchResult]:
+        """
+        Create many binary container pipeline runs in parallel
+
+        Each build is created as by create_binary_container_pipeline_run, in a pool
+        of max_workers threads. At most max_git_workers builds clone their repo
+        and at most max_api_workers builds send requests to create the pipeline run
+        at the same time, other stages (parsing, validation, rendering) aren't limited.
+
+        :param builds: list of dicts, keyword arguments of
+                       create_binary_container_pipeline_run for each build
+        :param max_workers: int, number of builds created at the same time
+        :param max_git_workers: int, number of repos cloned at the same time
+        :param max_api_workers: int, number of pipeline runs created at the same time,
+                                http_pool_maxsize by default
+        :return: list of BatchResult(pipeline_run, error), in the order of builds,
+                 error is OsbsException raised when creating the build, or None
+        """
+        git_slots = threading.BoundedSemaphore(max_git_workers)
+        api_slots = threading.BoundedSemaphore(max_api_workers or
+                                               self.os_conf.get_http_pool_maxsize())
+        create = osbsapi(self._create_binary_container_pipeline_run)
+
+        def create_build(kwargs):
+            try:
+                return BatchResult(create(git_slots, api_slots, **kwargs), None)
+            except OsbsException as ex:
+                logger.error("failed to create pipeline run for %s: %s",
+                             kwargs.get('git_uri'), ex)
+                return BatchResult(None, ex)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(create_build, builds))
+
+    def _create_binary_container_pipeline_run(self, git_slots, api_slots,
+                                              git_uri=_REQUIRED_PARAM, git_ref=_REQUIRED_PARAM,
+                                              git_branch=_REQUIRED_PARAM,
+                                              component=None,
+                                              flatpak=None,
+                                              git_commit_depth=None,
+                                              isolated=None,
+                                              koji_task_id=None,
+                                              target=None,
+                                              operator_csv_modifications_url=None,
+                                              timings=None,
+                                              **kwargs):
+        """
+        :param git_slots: context manager limiting concurrent cloning of repos
+        :param api_slots: context manager limiting concurrent creation of pipeline runs
+        :param timings: dict, optional, seconds spent getting repo info ('repo_info'),
+                        creating user params and pipeline run data ('render') and
+                        creating the pipeline run ('create') are added to it
+        """
         required_params = {"git_uri": git_uri, "git_ref": git_ref, "git_branch": git_branch}
         missing_params = []
         for param_name, param_arg in required_params.items():
@@ -280,9 +455,38 @@ class OSBS(object):
         if operator_csv_modifications_url and not isolated:
             raise OsbsException('Only isolated build can update operator CSV metadata')
 
-        repo_info = utils.get_repo_info(git_uri, git_ref, git_branch=git_branch,
-                                        depth=git_commit_depth)
+        with git_slots, _timed('repo_info', timings):
+            repo_info = utils.get_repo_info(git_uri, git_ref, git_branch=git_branch,
+                                            depth=git_commit_depth, git_cache=self._git_cache,
+                                            repo_info_cache=self._repo_info_cache)
+
+        with _timed('render', timings):
+            pipeline_run_name, pipeline_run_data = self._render_binary_container_pipeline_run(
+                repo_info, component=component, flatpak=flatpak, isolated=isolated,
+                koji_task_id=koji_task_id, target=target,
+                operator_csv_modifications_url=operator_csv_modifications_url, **kwargs)
 
+        logger.info("creating binary container image pipeline run: %s", pipeline_run_name)
+
+        pipeline_run = PipelineRun(self.os, pipeline_run_name, pipeline_run_data)
+
+        try:
+            with api_slots, _timed('create', timings):
+                logger.info("pipeline run created: %s", pipeline_run.start_pipeline_run())
+        except OsbsResponseException:
+            logger.error("failed to create pipeline run %s", pipeline_run_name)
+            raise
+
+        return pipeline_run
+
+    def _render_binary_container_pipeline_run(self, repo_info, component, flatpak, isolated,
+                                              koji_task_id, target,
+                                              operator_csv_modifications_url, **kwargs):
+        """
+        Validate the repo and build params and create the pipeline run data
+
+        :return: tuple, pipeline run name and data
+        """
         self._checks_for_flatpak(flatpak, repo_info)
 
         default_buildtime_limit = kwargs.get('default_buildtime_limit')
@@ -319,17 +523,7 @@ class OSBS(object):
             user_params=user_params,
             pipeline_run_name=pipeline_run_name)
 
-        logger.info("creating binary container image pipeline run: %s", pipeline_run_name)
-
-        pipeline_run = PipelineRun(self.os, pipeline_run_name, pipeline_run_data)
-
-        try:
-            logger.info("pipeline run created: %s", pipeline_run.start_pipeline_run())
-        except OsbsResponseException:
-            logger.error("failed to create pipeline run %s", pipeline_run_name)
-            raise
-
-        return pipeline_run
+        return pipeline_run_name, pipeline_run_data
 
     def _get_source_container_pipeline_name(self):
         pipeline_run_postfix = utils.generate_random_postfix()
@@ -406,6 +600,22 @@ class OSBS(object):
         pipeline_run = PipelineRun(self.os, build_name)
         return pipeline_run.get_info()
 
+    @osbsapi
+    def get_builds_status(self, build_names=None,
+                          label_selector=None) -> Dict[str, PipelineRunStatus]:
+        """
+        Get status of many builds with a single list request, a few builds given
+        by names, without label_selector, are fetched one by one
+
+        :param build_names: list of str, None for all builds matching label_selector
+        :param label_selector: str, e.g. 'app=osbs', None for all builds
+        :return: dict, {build name: PipelineRunStatus with name, status, reason,
+                 start_time, completion_time and failed_tasks}, None for builds
+                 which don't exist
+        """
+        return list_pipeline_runs_status(self.os, pipeline_run_names=build_names,
+                                         label_selector=label_selector)
+
     @osbsapi
     def get_final_platforms(self, build_name):
         pipeline_run = PipelineRun(self.os, build_name)
@@ -427,9 +637,9 @@ class OSBS(object):
         return pipeline_run.has_not_finished()
 
     @osbsapi
-    def wait_for_build_to_finish(self, build_name):
+    def wait_for_build_to_finish(self, build_name, timeout=None, deadline=None):
         pipeline_run = PipelineRun(self.os, build_name)
-        return pipeline_run.wait_for_finish()
+        return pipeline_run.wait_for_finish(timeout=timeout, deadline=deadline)
 
     @osbsapi
     def build_was_cancelled(self, build_name):
@@ -461,6 +671,17 @@ class OSBS(object):
         pipeline_run = PipelineRun(self.os, build_name)
         return pipeline_run.get_logs(follow=follow, wait=wait)
 
+    @osbsapi
+    def save_build_logs(self, build_name, directory):
+        """
+        Write logs of all containers of the build to files in directory, see
+        PipelineRun.save_logs
+
+        :return: dict, {pipeline task name: {container: path}}
+        """
+        pipeline_run = PipelineRun(self.os, build_name)
+        return pipeline_run.save_logs(directory)
+
     @osbsapi
     def get_build_error_message(self, build_name):
         pipeline_run = PipelineRun(self.os, build_name)
@@ -0,0 +1,377 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+
+Load generator creating binary container pipeline runs
+
+Builds arrive at a configured rate and are created by a pool of workers with
+OSBS.create_binary_container_pipeline_run, each of them is then followed
+until it starts and finishes. Latencies of each phase of the builds are
+collected in histograms and written as a JSON report:
+
+    queue   - waiting for a free worker after arrival
+    clone   - getting repo info (cloning the git repo)
+    render  - creating user params and pipeline run data
+    post    - creating the pipeline run
+    start   - from creation until the pipeline run started
+    finish  - from creation until the pipeline run finished
+    total   - from arrival until the build is done
+
+With --metrics-file, timing spans and counters of the client (http requests,
+git, watches, ...) are also written in the Prometheus text format.
+"""
+from __future__ import print_function, absolute_import, unicode_literals
+
+import argparse
+import bisect
+import json
+import logging
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from osbs import set_logging
+from osbs.api import OSBS
+from osbs.conf import Configuration
+from osbs.constants import DEFAULT_CONFIGURATION_FILE, DEFAULT_CONF_BINARY_SECTION
+from osbs.exceptions import OsbsException
+from osbs.utils import metrics
+
+logger = logging.getLogger('osbs')
+
+# phases of a build, in the order they happen
+PHASES = ('queue', 'clone', 'render', 'post', 'start', 'finish', 'total')
+
+# phases timed by OSBS.create_binary_container_pipeline_run
+API_PHASES = {'repo_info': 'clone', 'render': 'render', 'create': 'post'}
+
+# upper bounds of histogram buckets in seconds
+HISTOGRAM_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30,
+                     60, 120, 300, 600, 1800, 3600)
+
+PERCENTILES = (50, 90, 95, 99)
+
+WAIT_NONE = 'none'
+WAIT_START = 'start'
+WAIT_FINISH = 'finish'
+
+
+class LatencyHistogram(object):
+    """
+    Thread-safe collection of latencies of a single phase
+    """
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        """
+        :param buckets: sorted upper bounds of buckets in seconds
+        """
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._values = []
+        self._lock = threading.Lock()
+
+    def add(self, seconds):
+        with self._lock:
+            self._values.append(seconds)
+            self._counts[bisect.bisect_left(self.buckets, seconds)] += 1
+
+    def percentile(self, percent):
+        """
+        :return: float, nearest-rank percentile, None without values
+        """
+        with self._lock:
+            values = sorted(self._values)
+        if not values:
+            return None
+        rank = max(1, int(-(-percent * len(values) // 100)))
+        return values[rank - 1]
+
+    def as_dict(self):
+        """
+        :return: dict with count, min, max, mean and percentiles in seconds, and
+                 cumulative counts of buckets, keyed by their upper bounds
+        """
+        with self._lock:
+            values = list(self._values)
+            counts = list(self._counts)
+
+        result = {'count': len(values), 'min': None, 'max': None, 'mean': None}
+        if values:
+            result.update(min=min(values), max=max(values), mean=sum(values) / len(values))
+        for percent in PERCENTILES:
+            result['p{}'.format(percent)] = self.percentile(percent)
+
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.buckets + ('+Inf',), counts):
+            cumulative += count
+            buckets.append({'le': bound, 'count': cumulative})
+        result['buckets'] = buckets
+        return result
+
+
+def arrival_offsets(builds, rate, poisson=False, rng=random):
+    """
+    Times when builds arrive
+
+    :param builds: int, number of builds
+    :param rate: float, builds per second, 0 for all builds at once
+    :param poisson: bool, exponentially distributed intervals instead of constant ones
+    :return: list of float, seconds since the start of the test
+    """
+    if not rate:
+        return [0.0] * builds
+    offsets = []
+    offset = 0.0
+    for _ in range(builds):
+        offsets.append(offset)
+        offset += rng.expovariate(rate) if poisson else 1.0 / rate
+    return offsets
+
+
+class LoadTest(object):
+    """
+    Create builds concurrently and collect latencies of their phases
+    """
+
+    def __init__(self, osbs, build_kwargs, builds=10, concurrency=10, rate=0,
+                 poisson=False, wait=WAIT_FINISH, timeout=None, cleanup=False):
+        """
+        :param osbs: OSBS instance
+        :param build_kwargs: dict, keyword arguments of create_binary_container_pipeline_run
+        :param builds: int, number of builds to create
+        :param concurrency: int, maximum number of builds handled at the same time
+        :param rate: float, builds arriving per second, 0 for all builds at once
+        :param poisson: bool, builds arrive randomly, with exponentially distributed intervals
+        :param wait: str, follow builds until they start, finish or not at all
+        :param timeout: float, maximum number of seconds to wait for each build to finish
+        :param cleanup: bool, remove pipeline runs when they're done
+        """
+        self.osbs = osbs
+        self.build_kwargs = build_kwargs
+        self.builds = builds
+        self.concurrency = concurrency
+        self.rate = rate
+        self.poisson = poisson
+        self.wait = wait
+        self.timeout = timeout
+        self.cleanup = cleanup
+
+        self.histograms = {phase: LatencyHistogram() for phase in PHASES}
+        self.records = []
+
+    def _run_build(self, index, arrival):
+        phases = {'queue': time.monotonic() - arrival}
+        record = {'index': index, 'pipeline_run': None, 'succeeded': None, 'error': None,
+                  'phases': phases}
+        timings = {}
+        try:
+            try:
+                pipeline_run = self.osbs.create_binary_container_pipeline_run(
+                    timings=timings, **self.build_kwargs)
+            finally:
+                for key, phase in API_PHASES.items():
+                    if key in timings:
+                        phases[phase] = timings[key]
+            record['pipeline_run'] = pipeline_run.pipeline_run_name
+            created = time.monotonic()
+
+            started = True
+            if self.wait in (WAIT_START, WAIT_FINISH):
+                started = pipeline_run.wait_for_start() is not None
+                if started:
+                    phases['start'] = time.monotonic() - created
+                else:
+                    record['error'] = 'pipeline run did not start'
+            if self.wait == WAIT_FINISH and started:
+                if pipeline_run.wait_for_finish(timeout=self.timeout):
+                    phases['finish'] = time.monotonic() - created
+                    record['succeeded'] = pipeline_run.has_succeeded()
+                else:
+                    record['error'] = 'timed out waiting for the pipeline run to finish'
+
+            if self.cleanup:
+                pipeline_run.remove_pipeline_run()
+        # not only OsbsException, PipelineRun methods don't wrap other exceptions,
+        # a failure of a single build must not abort the whole test
+        except Exception as ex:  # pylint: disable=broad-except
+            logger.error("build %d failed: %r", index, ex)
+            record['error'] = str(ex) or type(ex).__name__
+
+        phases['total'] = time.monotonic() - arrival
+        for phase, seconds in phases.items():
+            self.histograms[phase].add(seconds)
+        return record
+
+    def run(self):
+        """
+        :return: dict, report of the test
+        """
+        offsets = arrival_offsets(self.builds, self.rate, self.poisson)
+        logger.info("starting %d builds, %d at the same time", self.builds, self.concurrency)
+
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = []
+            for index, offset in enumerate(offsets):
+                delay = start + offset - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(executor.submit(self._run_build, index, time.monotonic()))
+            self.records = [future.result() for future in futures]
+        duration = time.monotonic() - start
+
+        return self.report(duration)
+
+    def report(self, duration):
+        errors = [record for record in self.records if record['error']]
+        done = len(self.records) - len(errors)
+        return {
+            'builds': len(self.records),
+            'errors': len(errors),
+            'succeeded': sum(1 for record in self.records if record['succeeded']),
+            'failed': sum(1 for record in self.records if record['succeeded'] is False),
+            'duration': duration,
+            'throughput': done / duration if duration else None,
+            'concurrency': self.concurrency,
+            'rate': self.rate,
+            'arrival': 'poisson' if self.poisson else 'constant',
+            'wait': self.wait,
+            'phases': {phase: histogram.as_dict()
+                       for phase, histogram in self.histograms.items()},
+            'http_pool': self.osbs.os.get_http_pool_stats(),
+            'rate_limiter': self.osbs.os.get_rate_limiter_stats(),
+        }
+
+
+def write_json(path, data, lines=False):
+    """
+    :param path: str, file path, '-' for stdout
+    :param lines: bool, data is a list written as one JSON document per line
+    """
+    f = sys.stdout if path == '-' else open(path, 'w')
+    try:
+        if lines:
+            for item in data:
+                f.write(json.dumps(item, sort_keys=True) + '\n')
+        else:
+            json.dump(data, f, indent=2, sort_keys=True)
+            f.write('\n')
+    finally:
+        if f is not sys.stdout:
+            f.close()
+
+
+def cli(argv=None):
+    parser = argparse.ArgumentParser(
+        description="OSBS load generator, creates binary container builds concurrently",
+        formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    exclusive_group = parser.add_mutually_exclusive_group()
+    exclusive_group.add_argument("--verbose", action="store_true", default=None)
+    exclusive_group.add_argument("-q", "--quiet", action="store_true")
+
+    parser.add_argument("--config", action='store', metavar="PATH",
+                        help="path to configuration file", default=DEFAULT_CONFIGURATION_FILE)
+    parser.add_argument("--instance", "-i", action='store', metavar="SECTION_NAME",
+                        help="section within config for requested instance",
+                        default=DEFAULT_CONF_BINARY_SECTION)
+    parser.add_argument("--openshift-url", action='store', metavar="URL",
+                        help="openshift URL, e.g. of the mock API server")
+    parser.add_argument("--namespace", help="name of namespace to create builds in")
+    parser.add_argument("--without-auth", action="store_false", dest="use_auth", default=None,
+                        help="don't use authentication")
+
+    parser.add_argument("-g", "--git-url", action='store', metavar="URL",
+                        help="URL to git repo")
+    parser.add_argument("--git-commit", action='store', help="checkout this commit")
+    parser.add_argument("-b", "--git-branch", action='store', help="name of git branch")
+    parser.add_argument("-u", "--user", action='store', help="prefix for image name")
+    parser.add_argument("-t", "--target", action='store', help="koji target name")
+    parser.add_argument("-c", "--component", action='store', help="override component name")
+    parser.add_argument("--no-scratch", action='store_false', dest='scratch',
+                        help="create regular builds instead of scratch builds")
+
+    parser.add_argument("-n", "--builds", type=int, default=10, metavar="N",
+                        help="number of builds to create")
+    parser.add_argument("--concurrency", type=int, default=10, metavar="N",
+                        help="maximum number of builds handled at the same time")
+    parser.add_argument("--rate", type=float, default=0, metavar="BUILDS_PER_SECOND",
+                        help="arrival rate of builds, 0 to start all of them at once")
+    parser.add_argument("--arrival", choices=('constant', 'poisson'), default='constant',
+                        help="distribution of intervals between arrivals")
+    parser.add_argument("--wait", choices=(WAIT_NONE, WAIT_START, WAIT_FINISH),
+                        default=WAIT_FINISH, help="follow builds until they start or finish")
+    parser.add_argument("--timeout", type=float, metavar="SECONDS",
+                        help="maximum time to wait for each build to finish")
+    parser.add_argument("--cleanup", action='store_true',
+                        help="remove pipeline runs when they are done")
+    parser.add_argument("--report", default='-', metavar="PATH",
+                        help="write JSON report to this file, '-' for stdout")
+    parser.add_argument("--records", metavar="PATH",
+                        help="write results of each build to this file, as JSON lines")
+    parser.add_argument("--metrics-file", metavar="PATH",
+                        help="write client metrics to this file, in the Prometheus text format")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = cli(argv)
+
+    if args.quiet:
+        set_logging(level=logging.WARNING)
+    elif args.verbose:
+        set_logging(level=logging.DEBUG)
+    else:
+        set_logging(level=logging.INFO)
+
+    try:
+        os_conf = Configuration(conf_file=args.config, conf_section=args.instance,
+                                cli_args=args)
+        osbs = OSBS(os_conf)
+    except OsbsException as ex:
+        logger.error("Configuration error: %s", ex)
+        return -1
+
+    build_kwargs = {
+        'git_uri': os_conf.get_git_uri(),
+        'git_ref': os_conf.get_git_ref(),
+        'git_branch': os_conf.get_git_branch(),
+        'user': os_conf.get_user(),
+        'target': os_conf.get_koji_target(),
+        'component': args.component,
+        'scratch': args.scratch,
+        'default_buildtime_limit': os_conf.get_default_buildtime_limit(),
+        'max_buildtime_limit': os_conf.get_max_buildtime_limit(),
+    }
+    load_test = LoadTest(osbs, build_kwargs, builds=args.builds,
+                         concurrency=args.concurrency, rate=args.rate,
+                         poisson=args.arrival == 'poisson', wait=args.wait,
+                         timeout=args.timeout, cleanup=args.cleanup)
+    metrics_sink = None
+    if args.metrics_file:
+        metrics_sink = metrics.PrometheusFileSink(args.metrics_file, interval=10)
+        metrics.add_sink(metrics_sink)
+    try:
+        report = load_test.run()
+    except KeyboardInterrupt:
+        print("Quitting on user request.")
+        return -1
+    finally:
+        if metrics_sink:
+            metrics.remove_sink(metrics_sink)
+            metrics_sink.flush()
+
+    write_json(args.report, report)
+    if args.records:
+        write_json(args.records, load_test.records, lines=True)
+    return 0 if not report['errors'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -10,7 +10,6 @@ import collections.abc
 
 import json
 import logging
-import pkg_resources
 
 import sys
 import argparse
@@ -228,11 +227,26 @@ def _display_pipeline_run_summary(build_metadata):
         print(line)
 
 
-def cli():
+def get_version():
+    # pkg_resources scans all installed distributions on import, use it only
+    # when importlib.metadata isn't available
+    try:
+        from importlib.metadata import version, PackageNotFoundError
+    except ImportError:  # Python < 3.8
+        import pkg_resources
+        try:
+            return pkg_resources.get_distribution("osbs-client").version
+        except pkg_resources.DistributionNotFound:
+            return "GIT"
+
     try:
-        version = pkg_resources.get_distribution("osbs-client").version
-    except pkg_resources.DistributionNotFound:
-        version = "GIT"
+        return version("osbs-client")
+    except PackageNotFoundError:
+        return "GIT"
+
+
+def cli():
+    version = get_version()
 
     parser = argparse.ArgumentParser(
         description="OpenShift Build Service client"
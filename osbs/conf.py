@@ -15,7 +15,10 @@ from six.moves import configparser
 from six.moves.urllib.parse import urljoin
 
 from osbs.constants import (DEFAULT_CONFIGURATION_FILE, GENERAL_CONFIGURATION_SECTION,
-                            DEFAULT_NAMESPACE)
+                            DEFAULT_NAMESPACE, HTTP_POOL_MAXSIZE, GIT_CACHE_MAX_SIZE_MB,
+                            REPO_INFO_CACHE_MAX_ENTRIES, REPO_INFO_CACHE_TTL,
+                            HTTP_CIRCUIT_BREAKER_THRESHOLD, HTTP_CIRCUIT_BREAKER_RESET,
+                            AIO_STREAM_WORKERS)
 from osbs import utils
 
 
@@ -225,6 +228,62 @@ class Configuration(object):
         return self._get_value("verify_ssl", self.conf_section, "verify_ssl",
                                default=True, is_bool_val=True)
 
+    def get_http_pool_maxsize(self):
+        return int(self._get_value("http_pool_maxsize", self.conf_section,
+                                   "http_pool_maxsize", default=HTTP_POOL_MAXSIZE))
+
+    def get_http_keep_alive(self):
+        return self._get_value("http_keep_alive", self.conf_section, "http_keep_alive",
+                               default=True, is_bool_val=True)
+
+    def get_http_circuit_breaker_threshold(self):
+        return int(self._get_value("http_circuit_breaker_threshold", self.conf_section,
+                                   "http_circuit_breaker_threshold",
+                                   default=HTTP_CIRCUIT_BREAKER_THRESHOLD))
+
+    def get_http_circuit_breaker_reset(self):
+        return int(self._get_value("http_circuit_breaker_reset", self.conf_section,
+                                   "http_circuit_breaker_reset",
+                                   default=HTTP_CIRCUIT_BREAKER_RESET))
+
+    def get_aio_stream_workers(self):
+        return int(self._get_value("aio_stream_workers", self.conf_section,
+                                   "aio_stream_workers", default=AIO_STREAM_WORKERS))
+
+    def get_api_qps(self):
+        val = self._get_value("api_qps", self.conf_section, "api_qps")
+        return float(val) if val is not None else None
+
+    def get_api_burst(self):
+        val = self._get_value("api_burst", self.conf_section, "api_burst")
+        return int(val) if val is not None else None
+
+    def get_use_informers(self):
+        return self._get_value("use_informers", self.conf_section, "use_informers",
+                               default=False, is_bool_val=True)
+
+    def get_git_cache_dir(self):
+        return self._get_value("git_cache_dir", self.conf_section, "git_cache_dir")
+
+    def get_git_cache_max_size_mb(self):
+        return int(self._get_value("git_cache_max_size_mb", self.conf_section,
+                                   "git_cache_max_size_mb", default=GIT_CACHE_MAX_SIZE_MB))
+
+    def get_use_repo_info_cache(self):
+        return self._get_value("use_repo_info_cache", self.conf_section, "use_repo_info_cache",
+                               default=False, is_bool_val=True)
+
+    def get_repo_info_cache_dir(self):
+        return self._get_value("repo_info_cache_dir", self.conf_section, "repo_info_cache_dir")
+
+    def get_repo_info_cache_size(self):
+        return int(self._get_value("repo_info_cache_size", self.conf_section,
+                                   "repo_info_cache_size", default=REPO_INFO_CACHE_MAX_ENTRIES))
+
+    def get_repo_info_cache_ttl(self):
+        return int(self._get_value("repo_info_cache_ttl", self.conf_section,
+                                   "repo_info_cache_ttl", default=REPO_INFO_CACHE_TTL))
+
     def get_use_auth(self):
         return self._get_value("use_auth", self.conf_section, "use_auth", is_bool_val=True)
 
@@ -53,8 +53,24 @@ HTTP_MAX_RETRIES = 8
 # how many seconds should request wait for in case non-critical error has occurred
 HTTP_BACKOFF_FACTOR = 4
 
-# Statuses which should trigger automatic retry
-HTTP_RETRIES_STATUS_FORCELIST = [408, 500, 502, 503, 504]
+# maximal number of seconds to wait between retries of a http request
+HTTP_BACKOFF_MAX = 60
+
+# number of seconds after which retries of a http request stop
+HTTP_RETRIES_DEADLINE = 300
+
+# Statuses which should trigger automatic retry, Retry-After is honoured for 429 and 503
+HTTP_RETRIES_STATUS_FORCELIST = [408, 429, 500, 502, 503, 504]
+
+# number of consecutive failed http requests after which requests to the
+# server fail immediately, 0 disables it, and number of seconds after which
+# a request is tried again
+HTTP_CIRCUIT_BREAKER_THRESHOLD = 0
+HTTP_CIRCUIT_BREAKER_RESET = 60
+
+# number of threads of an osbs.aio client reading long-lived streams, i.e. watches
+# and followed logs, each stream holds one while it waits for data
+AIO_STREAM_WORKERS = 64
 
 # HTTP methods that we should retry on
 HTTP_RETRIES_METHODS_WHITELIST = ['GET', 'PUT', 'POST', 'DELETE']
@@ -62,12 +78,23 @@ HTTP_RETRIES_METHODS_WHITELIST = ['GET', 'PUT', 'POST', 'DELETE']
 # requests timeout in seconds
 HTTP_REQUEST_TIMEOUT = 600
 
+# number of connection pools (one per host) kept by a http session
+HTTP_POOL_CONNECTIONS = 10
+
+# maximum number of connections kept open in each connection pool
+HTTP_POOL_MAXSIZE = 10
+
 # number of retries on openshift conflict
 OS_CONFLICT_MAX_RETRIES = 8
 
 # number of seconds to wait, before retrying on openshift conflict
 OS_CONFLICT_WAIT = 5
 
+# maximal number of seconds to wait between retries on openshift conflict,
+# and number of seconds after which the retries stop
+OS_CONFLICT_MAX_WAIT = 120
+OS_CONFLICT_DEADLINE = 600
+
 # number of retries on openshift not found
 OS_NOT_FOUND_MAX_RETRIES = 6
 
@@ -87,9 +114,26 @@ GIT_MAX_RETRIES = 3
 # backoff factor for git clone operations - exponential backoff in seconds
 GIT_BACKOFF_FACTOR = 60
 
+# maximal number of seconds to wait between git clone retries, and number
+# of seconds after which the retries stop
+GIT_BACKOFF_MAX = 600
+GIT_RETRY_DEADLINE = 1800
+
 # number of deepen operations to attempt if a requested commit is not
 # in the shallow depth of the original clone
 GIT_FETCH_RETRY = 9
 
+# maximum size of the git mirror cache in MiB
+GIT_CACHE_MAX_SIZE_MB = 10240
+
+# number of builds created at the same time by batch create, and number of them
+# cloning git repos at the same time
+BATCH_MAX_WORKERS = 10
+BATCH_MAX_GIT_WORKERS = 4
+
+# maximum number of entries and their lifetime in seconds in the RepoInfo cache
+REPO_INFO_CACHE_MAX_ENTRIES = 100
+REPO_INFO_CACHE_TTL = 86400
+
 USER_PARAMS_KIND_IMAGE_BUILDS = 'build_user_params'
 USER_PARAMS_KIND_SOURCE_CONTAINER_BUILDS = 'source_containers_user_params'
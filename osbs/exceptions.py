@@ -71,6 +71,14 @@ class OsbsNetworkException(OsbsException):
         self.status_code = status_code
 
 
+class OsbsCircuitOpenException(OsbsNetworkException):
+    """ Request wasn't sent, because previous requests to the server failed """
+    def __init__(self, url, message, retry_after, *args, **kwargs):
+        super(OsbsCircuitOpenException, self).__init__(url, message, '', *args, **kwargs)
+        # seconds until a request to the server is tried again
+        self.retry_after = retry_after
+
+
 class OsbsAuthException(OsbsException):
     pass
 
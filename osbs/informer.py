@@ -0,0 +1,295 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+Namespace-level watch cache, shared by all waiters of one resource type
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+from osbs.exceptions import OsbsException, OsbsResponseException
+
+
+logger = logging.getLogger(__name__)
+
+# Reconnect after 5 seconds when the watch stream fails
+INFORMER_RETRY_SECS = 5
+# Give up after 20 consecutive bad responses
+INFORMER_MAX_BAD_RESPONSES = 20
+# Number of objects fetched with a single list request
+INFORMER_LIST_LIMIT = 500
+# Ask server to close the watch stream periodically, so stop() is noticed
+INFORMER_WATCH_TIMEOUT_SECS = 300
+# Number of deleted object names remembered for waiters
+INFORMER_MAX_TOMBSTONES = 1000
+# Interval of checking the stop event of waiters
+INFORMER_STOP_POLL_SECS = 1
+
+
+class Informer(object):
+    """
+    Keep an in-memory copy of all objects of one resource type in the namespace
+
+    A single background thread lists the objects and then watches the whole
+    collection, starting from the resourceVersion of the list, so any number
+    of waiters share one long-lived watch stream. When the resourceVersion
+    expires (410 Gone), objects are listed again.
+    """
+
+    def __init__(self, os, api_path, api_version, resource_type):
+        """
+        :param os: Openshift instance
+        :param api_path: str, e.g. 'apis'
+        :param api_version: str, e.g. 'tekton.dev/v1beta1'
+        :param resource_type: str, e.g. 'pipelineruns'
+        """
+        self.os = os
+        self.api_path = api_path
+        self.api_version = api_version
+        self.resource_type = resource_type
+
+        self._objects = {}
+        self._deleted = OrderedDict()
+        self._resource_version = None
+        self._synced = False
+        self._error = None
+
+        self._condition = threading.Condition()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    @property
+    def resource_version(self):
+        return self._resource_version
+
+    def start(self):
+        """
+        Start the background thread, does nothing when it's already running
+        """
+        with self._condition:
+            self._stopped.clear()
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._error = None
+            self._thread = threading.Thread(
+                target=self._run,
+                name=f"osbs-informer-{self.resource_type}",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def stop(self, wait=False):
+        """
+        Stop the background thread, it exits after the current watch request ends
+
+        :param wait: bool, wait until the background thread exits
+        """
+        self._stopped.set()
+        thread = self._thread
+        if wait and thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def get(self, name):
+        """
+        Get cached object, waits for the initial list of objects
+
+        :param name: str, name of the object
+        :return: dict, object data or None when it doesn't exist
+        """
+        self.start()
+        with self._condition:
+            self._wait_for_sync()
+            return self._objects.get(name)
+
+    def wait_for(self, name, predicate, exists=None, timeout=None, stop=None):
+        """
+        Wait until the cached object satisfies the predicate
+
+        :param name: str, name of the object
+        :param predicate: callable, called with object data on each update of the object
+        :param exists: callable, asks the server whether object exists when it's not
+                       in the cache yet, when it returns false, waiting ends immediately
+        :param timeout: int, maximum number of seconds to wait, None to wait forever
+        :param stop: threading.Event, waiting ends when it's set
+        :return: dict, object data or None when object was removed, timeout expired
+                 or waiting was stopped
+        """
+        self.start()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        checked_existence = False
+
+        with self._condition:
+            while True:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    logger.debug("Timed out waiting for %s '%s'", self.resource_type, name)
+                    return None
+                if stop is not None:
+                    if stop.is_set():
+                        return None
+                    remaining = (INFORMER_STOP_POLL_SECS if remaining is None
+                                 else min(remaining, INFORMER_STOP_POLL_SECS))
+
+                if not self._wait_for_sync(remaining):
+                    continue
+
+                obj = self._objects.get(name)
+                if obj is not None:
+                    checked_existence = True
+                    if predicate(obj):
+                        return obj
+                elif name in self._deleted:
+                    logger.debug("%s '%s' was removed", self.resource_type, name)
+                    return None
+                elif not checked_existence and exists is not None:
+                    checked_existence = True
+                    # don't hold the lock while talking to the server
+                    self._condition.release()
+                    try:
+                        obj_exists = exists()
+                    finally:
+                        self._condition.acquire()
+                    if not obj_exists and name not in self._objects:
+                        return None
+                    continue
+
+                self._condition.wait(remaining)
+
+    def _wait_for_sync(self, timeout=None):
+        """
+        Must be called with the condition held
+
+        :return: bool, whether the cache is synced
+        """
+        self._condition.wait_for(lambda: self._synced or self._error is not None, timeout)
+        if self._error is not None:
+            raise self._error
+        return self._synced
+
+    def _list(self):
+        list_json = self.os.list_resource(self.api_path, self.api_version, self.resource_type,
+                                          limit=INFORMER_LIST_LIMIT)
+        objects = {obj['metadata']['name']: obj for obj in list_json['items']}
+
+        with self._condition:
+            for name in self._objects:
+                if name not in objects:
+                    self._add_tombstone(name)
+            self._objects = objects
+            self._resource_version = list_json['metadata'].get('resourceVersion')
+            self._synced = True
+            self._condition.notify_all()
+
+        logger.debug("Listed %d %s, resourceVersion %s",
+                     len(objects), self.resource_type, self._resource_version)
+
+    def _add_tombstone(self, name):
+        self._deleted[name] = True
+        self._deleted.move_to_end(name)
+        while len(self._deleted) > INFORMER_MAX_TOMBSTONES:
+            self._deleted.popitem(last=False)
+
+    def _handle_event(self, event):
+        """
+        Update the cache with a single watch event
+
+        :return: bool, False when the cache has to be listed again
+        """
+        event_type = event['type']
+        obj = event['object']
+
+        if event_type == 'ERROR':
+            # resourceVersion is too old, list objects again
+            if obj.get('code') == requests.codes.gone:
+                logger.debug("resourceVersion %s of %s expired",
+                             self._resource_version, self.resource_type)
+                return False
+            logger.warning("Watch of %s returned error: %s", self.resource_type, obj)
+            return True
+
+        resource_version = obj.get('metadata', {}).get('resourceVersion')
+        with self._condition:
+            if resource_version:
+                self._resource_version = resource_version
+            if event_type in ('ADDED', 'MODIFIED'):
+                name = obj['metadata']['name']
+                self._objects[name] = obj
+                self._deleted.pop(name, None)
+            elif event_type == 'DELETED':
+                name = obj['metadata']['name']
+                self._objects.pop(name, None)
+                self._add_tombstone(name)
+            # BOOKMARK events only move resourceVersion
+            self._condition.notify_all()
+        return True
+
+    def _watch(self):
+        """
+        Watch the collection from the last seen resourceVersion until the stream ends
+
+        :return: tuple (bool, bool), whether the cache is still valid
+                 and whether any event was received
+        """
+        received = False
+        for event in self.os.watch_events(self.api_path, self.api_version, self.resource_type,
+                                          resourceVersion=self._resource_version,
+                                          allowWatchBookmarks='true',
+                                          timeoutSeconds=INFORMER_WATCH_TIMEOUT_SECS):
+            received = True
+            if not self._handle_event(event):
+                return False, received
+            if self._stopped.is_set():
+                break
+        return True, received
+
+    def _run(self):
+        bad_responses = 0
+        synced = False
+        while not self._stopped.is_set():
+            try:
+                if not synced:
+                    self._list()
+                    synced = True
+                synced, received = self._watch()
+                bad_responses = 0
+                if synced and not received:
+                    # don't reconnect in a loop when server closes empty streams
+                    self._stopped.wait(INFORMER_RETRY_SECS)
+                continue
+
+            except OsbsResponseException as exc:
+                if exc.status_code == requests.codes.gone:
+                    synced = False
+                    continue
+                bad_responses += 1
+                if bad_responses > INFORMER_MAX_BAD_RESPONSES:
+                    self._fail(exc)
+                    return
+
+            except OsbsException as exc:
+                if not isinstance(exc.cause, (requests.ConnectionError, requests.Timeout)):
+                    self._fail(exc)
+                    return
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                pass
+            except Exception as exc:  # pylint: disable=broad-except
+                self._fail(exc)
+                return
+
+            logger.debug("Watch of %s failed, reconnecting in %ds",
+                         self.resource_type, INFORMER_RETRY_SECS)
+            self._stopped.wait(INFORMER_RETRY_SECS)
+
+    def _fail(self, exc):
+        logger.warning("Watch of %s stopped: %r", self.resource_type, exc)
+        with self._condition:
+            self._error = exc
+            self._synced = False
+            self._condition.notify_all()
@@ -15,22 +15,27 @@ import sys
 import logging
 import json
 import http
+import socket
+import threading
+import time
 
-from osbs.exceptions import OsbsException, OsbsNetworkException, OsbsResponseException
+from osbs.exceptions import (OsbsCircuitOpenException, OsbsException, OsbsNetworkException,
+                             OsbsResponseException)
 from osbs.constants import (
-    HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR, HTTP_RETRIES_STATUS_FORCELIST,
-    HTTP_RETRIES_METHODS_WHITELIST, HTTP_REQUEST_TIMEOUT)
+    HTTP_MAX_RETRIES, HTTP_BACKOFF_FACTOR, HTTP_BACKOFF_MAX, HTTP_RETRIES_DEADLINE,
+    HTTP_RETRIES_STATUS_FORCELIST, HTTP_RETRIES_METHODS_WHITELIST, HTTP_REQUEST_TIMEOUT,
+    HTTP_POOL_CONNECTIONS, HTTP_POOL_MAXSIZE, HTTP_CIRCUIT_BREAKER_THRESHOLD,
+    HTTP_CIRCUIT_BREAKER_RESET)
+from osbs.utils import metrics
+from osbs.utils.retry import CircuitBreaker, decorrelated_jitter
 
 import requests
 from requests.adapters import HTTPAdapter
 from requests.exceptions import HTTPError, RetryError, Timeout
 from requests.utils import guess_json_utf
-try:
-    from requests_kerberos import HTTPKerberosAuth
-except ImportError:
-    HTTPKerberosAuth = None
 
-from urllib3.exceptions import InsecureRequestWarning
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.exceptions import InsecureRequestWarning, MaxRetryError, ResponseError
 from urllib3.util import Retry
 from urllib3 import disable_warnings
 disable_warnings(InsecureRequestWarning)
@@ -38,9 +43,249 @@ disable_warnings(InsecureRequestWarning)
 logger = logging.getLogger(__name__)
 
 
+class HttpPoolStats(object):
+    """
+    Thread-safe counters describing how requests of a HttpSession use its connection pools
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+        self.in_flight = 0
+
+    def request_started(self):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+
+    def request_finished(self):
+        with self._lock:
+            self.in_flight -= 1
+
+    def connection_created(self):
+        with self._lock:
+            self.new_connections += 1
+
+    def as_dict(self):
+        """
+        :return: dict, number of requests, new connections, requests served by already
+                 open connections (hits) and requests which are currently in flight
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'new_connections': self.new_connections,
+                'hits': max(self.requests - self.new_connections, 0),
+                'in_flight': self.in_flight,
+            }
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """
+    HTTPAdapter which reports every newly opened connection to HttpPoolStats
+    """
+
+    def __init__(self, stats=None, **kwargs):
+        self.stats = stats
+        super(PooledHTTPAdapter, self).__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(PooledHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        stats = self.stats
+        if stats is None:
+            return
+
+        def counting_pool_class(pool_class):
+            class CountingConnection(pool_class.ConnectionCls):
+                def connect(self):
+                    stats.connection_created()
+                    return super(CountingConnection, self).connect()
+
+            class CountingPool(pool_class):
+                ConnectionCls = CountingConnection
+
+            return CountingPool
+
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': counting_pool_class(HTTPConnectionPool),
+            'https': counting_pool_class(HTTPSConnectionPool),
+        }
+
+
+class BackoffRetry(Retry):
+    """
+    urllib3 Retry with decorrelated jitter between retries and a deadline
+
+    The delay before each retry is chosen by decorrelated_jitter, capped by
+    max_backoff, unless the response has a Retry-After header (usually sent
+    with 429 and 503), which is honoured. Retries stop, as if they were
+    exhausted, when the next one would start more than deadline seconds after
+    the first failure of the request. Then, as with exhausted retries, the last
+    response is returned when raise_on_status is False, so the caller gets its
+    status code.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.deadline = kwargs.pop('deadline', None)
+        self.max_backoff = kwargs.pop('max_backoff', None)
+        # state of the request being retried, carried to new instances by new()
+        self._started = kwargs.pop('_started', None)
+        self._backoff = kwargs.pop('_backoff', 0)
+        super(BackoffRetry, self).__init__(*args, **kwargs)
+
+    def new(self, **kw):
+        kw.setdefault('deadline', self.deadline)
+        kw.setdefault('max_backoff', self.max_backoff)
+        kw.setdefault('_started', self._started)
+        kw.setdefault('_backoff', self._backoff)
+        return super(BackoffRetry, self).new(**kw)
+
+    def get_backoff_time(self):
+        return self._backoff
+
+    def increment(self, method=None, url=None, response=None, error=None, _pool=None,
+                  _stacktrace=None):
+        started = self._started or time.monotonic()
+        new_retry = super(BackoffRetry, self).increment(method, url, response, error, _pool,
+                                                        _stacktrace)
+        new_retry._started = started
+        new_retry._backoff = decorrelated_jitter(self.backoff_factor, self._backoff,
+                                                 self.max_backoff)
+        if self.deadline is None:
+            return new_retry
+
+        wait = None
+        if response is not None and self.respect_retry_after_header:
+            wait = new_retry.get_retry_after(response)
+        if wait is None:
+            wait = new_retry._backoff
+        if time.monotonic() + wait - started >= self.deadline:
+            logger.info("not retrying %s %s, deadline of %s seconds would be exceeded",
+                        method, url, self.deadline)
+            # the pool returns the response instead of raising, unless raise_on_status
+            if error is None and response is not None:
+                error = ResponseError(ResponseError.SPECIFIC_ERROR.format(
+                    status_code=response.status))
+            raise MaxRetryError(_pool, url, error or ResponseError('deadline exceeded'))
+        return new_retry
+
+
+def log_error_response_text_hook(resp, *args, **kwargs):
+    """requests hook to log error response"""
+    if 400 <= resp.status_code <= 599:
+        logger.debug('Error response from "%r": "%r"', resp.url, resp.text)
+
+
+def create_session(retries_enabled=True, pool_connections=HTTP_POOL_CONNECTIONS,
+                   pool_maxsize=HTTP_POOL_MAXSIZE, stats=None):
+    """
+    Create requests.Session with connection pools mounted for http and https
+
+    :param retries_enabled: bool, retry failed requests
+    :param pool_connections: int, number of connection pools (hosts) to keep
+    :param pool_maxsize: int, maximum number of connections kept open per pool
+    :param stats: HttpPoolStats, counters to update when new connections are opened
+    :return: requests.Session
+    """
+    session = requests.Session()
+    session.hooks['response'] = [log_error_response_text_hook]
+
+    adapter_kwargs = {
+        'stats': stats,
+        'pool_connections': pool_connections,
+        'pool_maxsize': pool_maxsize,
+    }
+    if retries_enabled:
+        adapter_kwargs['max_retries'] = BackoffRetry(
+            total=HTTP_MAX_RETRIES,
+            connect=HTTP_MAX_RETRIES,
+            read=HTTP_MAX_RETRIES,
+            backoff_factor=HTTP_BACKOFF_FACTOR,
+            max_backoff=HTTP_BACKOFF_MAX,
+            deadline=HTTP_RETRIES_DEADLINE,
+            status_forcelist=HTTP_RETRIES_STATUS_FORCELIST,
+            method_whitelist=HTTP_RETRIES_METHODS_WHITELIST,
+            raise_on_status=False,
+        )
+
+    session.mount('http://', PooledHTTPAdapter(**adapter_kwargs))
+    session.mount('https://', PooledHTTPAdapter(**adapter_kwargs))
+    return session
+
+
 class HttpSession(object):
-    def __init__(self, verbose=False):
+    """
+    Long-lived HTTP session; all requests made through one instance share its connection
+    pools, so repeated API calls reuse already established TCP/TLS connections.
+
+    When circuit_breaker_threshold is set, requests which fail even after retries,
+    or get a 5xx response, are counted by a circuit breaker; once it opens, requests
+    fail immediately with OsbsCircuitOpenException until the server is tried again.
+    """
+
+    def __init__(self, verbose=False, pool_connections=HTTP_POOL_CONNECTIONS,
+                 pool_maxsize=HTTP_POOL_MAXSIZE, keep_alive=True,
+                 circuit_breaker_threshold=HTTP_CIRCUIT_BREAKER_THRESHOLD,
+                 circuit_breaker_reset=HTTP_CIRCUIT_BREAKER_RESET):
+        """
+        :param verbose: bool, enable verbose logging
+        :param pool_connections: int, number of connection pools (hosts) to keep
+        :param pool_maxsize: int, maximum number of connections kept open per pool
+        :param keep_alive: bool, keep connections open for reuse by subsequent requests
+        :param circuit_breaker_threshold: int, consecutive failed requests after which
+                                          requests fail immediately, 0 (default) to disable
+        :param circuit_breaker_reset: int, seconds after which a request is tried again
+        """
         self.verbose = verbose
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.stats = HttpPoolStats()
+        self.circuit_breaker = CircuitBreaker(circuit_breaker_threshold, circuit_breaker_reset)
+        # requests.Session objects, keyed by retries_enabled
+        self._sessions = {}
+        self._sessions_lock = threading.Lock()
+
+    def _get_session(self, retries_enabled):
+        with self._sessions_lock:
+            session = self._sessions.get(retries_enabled)
+            if session is None:
+                session = create_session(retries_enabled=retries_enabled,
+                                         pool_connections=self.pool_connections,
+                                         pool_maxsize=self.pool_maxsize,
+                                         stats=self.stats)
+                self._sessions[retries_enabled] = session
+            return session
+
+    def get_pool_stats(self):
+        """
+        :return: dict, see HttpPoolStats.as_dict
+        """
+        return self.stats.as_dict()
+
+    def close(self):
+        """Close all pooled connections"""
+        with self._sessions_lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions = {}
+
+    def _record_status(self, status_code):
+        if status_code >= 500:
+            self.circuit_breaker.record_failure()
+        else:
+            self.circuit_breaker.record_success()
+
+    @staticmethod
+    def _record_metrics(response, content=None):
+        if not metrics.enabled():
+            return
+        retries = getattr(response.raw, 'retries', None)
+        if retries is not None and retries.history:
+            metrics.count('http_retries', len(retries.history))
+        if content is not None:
+            metrics.count('http_response_bytes', len(content))
 
     def get(self, url, **kwargs):
         return self.request(url, "get", **kwargs)
@@ -58,23 +303,52 @@ class HttpSession(object):
         return self.request(url, "delete", **kwargs)
 
     def request(self, url, *args, **kwargs):
-        try:
-            stream = HttpStream(url, *args, verbose=self.verbose, **kwargs)
-            if kwargs.get('stream', False):
-                return stream
-
-            with stream as s:
-                content = s.req.content
-                return HttpResponse(s.status_code, s.headers, content)
-        # Timeout will catch both ConnectTimout and ReadTimeout
-        except (RetryError, Timeout) as ex:
-            raise OsbsNetworkException(url, str(ex), '',
-                                       cause=ex, traceback=sys.exc_info()[2])
-        except HTTPError as ex:
-            raise OsbsNetworkException(url, str(ex), ex.response.status_code,
-                                       cause=ex, traceback=sys.exc_info()[2])
-        except Exception as ex:
-            raise OsbsException(cause=ex, traceback=sys.exc_info()[2])
+        session = self._get_session(kwargs.get('retries_enabled', True))
+        if not self.keep_alive:
+            headers = dict(kwargs.get('headers') or {})
+            headers.setdefault('Connection', 'close')
+            kwargs['headers'] = headers
+
+        if not self.circuit_breaker.allow_request():
+            metrics.count('http_circuit_open')
+            raise OsbsCircuitOpenException(
+                url, 'circuit breaker is open after {} consecutive failed requests'
+                .format(self.circuit_breaker.failures),
+                self.circuit_breaker.retry_after())
+
+        with metrics.span('http_request', method=args[0] if args else ''):
+            self.stats.request_started()
+            streaming = False
+            try:
+                if kwargs.get('stream', False):
+                    stream = HttpStream(url, *args, verbose=self.verbose, session=session,
+                                        on_close=self.stats.request_finished, **kwargs)
+                    self._record_status(stream.status_code)
+                    self._record_metrics(stream.req)
+                    streaming = True
+                    return stream
+
+                stream = HttpStream(url, *args, verbose=self.verbose, session=session, **kwargs)
+                with stream as s:
+                    content = s.req.content
+                    self._record_status(s.status_code)
+                    self._record_metrics(s.req, content)
+                    return HttpResponse(s.status_code, s.headers, content)
+            # Timeout will catch both ConnectTimout and ReadTimeout
+            except (RetryError, Timeout) as ex:
+                self.circuit_breaker.record_failure()
+                raise OsbsNetworkException(url, str(ex), '',
+                                           cause=ex, traceback=sys.exc_info()[2])
+            except HTTPError as ex:
+                raise OsbsNetworkException(url, str(ex), ex.response.status_code,
+                                           cause=ex, traceback=sys.exc_info()[2])
+            except Exception as ex:
+                if isinstance(ex, requests.exceptions.ConnectionError):
+                    self.circuit_breaker.record_failure()
+                raise OsbsException(cause=ex, traceback=sys.exc_info()[2])
+            finally:
+                if not streaming:
+                    self.stats.request_finished()
 
 
 class HttpStream(object):
@@ -87,39 +361,24 @@ class HttpStream(object):
     in the middle of reading the stream. Because it doesn't fit into our current API, the class also
     tries to free the resources when it finishes reading the http stream and also when it's garbage
     collected.
+
+    When session is not provided, a new requests.Session is created just for this request.
     """
 
     def __init__(self, url, method, data=None, kerberos_auth=False,
                  allow_redirects=True, verify_ssl=True, ca=None, use_json=False,
                  headers=None, stream=False, username=None, password=None,
-                 client_cert=None, client_key=None, verbose=False, retries_enabled=True):
-
-        def log_error_response_text_hook(resp, *args, **kwargs):
-            """requests hook to log error response"""
-            if 400 <= resp.status_code <= 599:
-                logger.debug('Error response from "%r": "%r"', resp.url, resp.text)
+                 client_cert=None, client_key=None, verbose=False, retries_enabled=True,
+                 session=None, on_close=None):
 
         self.finished = False  # have we read all data?
         self.closed = False    # have we destroyed curl resources?
+        self.interrupted = False  # did iter_lines end because the connection broke?
 
         self.status_code = 0
         self.headers = None
 
-        retry = Retry(
-            total=HTTP_MAX_RETRIES,
-            connect=HTTP_MAX_RETRIES,
-            read=HTTP_MAX_RETRIES,
-            backoff_factor=HTTP_BACKOFF_FACTOR,
-            status_forcelist=HTTP_RETRIES_STATUS_FORCELIST,
-            method_whitelist=HTTP_RETRIES_METHODS_WHITELIST,
-            raise_on_status=False,
-        )
-        self.session = requests.Session()
-        self.session.hooks['response'] = [log_error_response_text_hook]
-
-        if retries_enabled:
-            self.session.mount('http://', HTTPAdapter(max_retries=retry))
-            self.session.mount('https://', HTTPAdapter(max_retries=retry))
+        self.session = session or create_session(retries_enabled=retries_enabled)
 
         self.url = url
         headers = headers or {}
@@ -156,7 +415,10 @@ class HttpStream(object):
         args['allow_redirects'] = allow_redirects
 
         if kerberos_auth:
-            if not HTTPKerberosAuth:
+            # imported here, as it's slow to import and rarely used
+            try:
+                from requests_kerberos import HTTPKerberosAuth
+            except ImportError:
                 raise RuntimeError('Kerberos auth unavailable')
             args['auth'] = HTTPKerberosAuth()
 
@@ -170,12 +432,16 @@ class HttpStream(object):
 
         self.headers = self.req.headers
         self.status_code = self.req.status_code
+        self._on_close = on_close
 
     def _get_received_data(self):
         return self.req.text
 
-    def iter_chunks(self):
-        return self.req.iter_content(None)
+    def iter_chunks(self, chunk_size=None):
+        """
+        :param chunk_size: int, maximal size of chunks, None for chunks as they arrive
+        """
+        return self.req.iter_content(chunk_size)
 
     def iter_lines(self):
         kwargs = {
@@ -197,15 +463,38 @@ class HttpStream(object):
                 yield line
         except (requests.exceptions.ChunkedEncodingError,
                 http.client.IncompleteRead):
+            self.interrupted = True
             return
 
+    def abort(self):
+        """
+        Interrupt reading of the stream by another thread, which then gets the end
+        of the stream or an error and closes it
+
+        close() can't be used for that, it waits until the reading thread is done.
+        """
+        raw = getattr(getattr(self, 'req', None), 'raw', None)
+        sock = getattr(getattr(raw, '_connection', None), 'sock', None)
+        if sock is None:
+            return
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            # already closed
+            pass
+
     def close(self):
         # using getattr and hasattr because this may be called from __del__
         if not getattr(self, 'closed', True):
             logger.debug("cleaning up")
             if hasattr(self, 'req'):
+                # release the connection back to the session's pool
+                self.req.close()
                 del self.req
             self.closed = True
+            on_close = getattr(self, '_on_close', None)
+            if on_close:
+                on_close()
 
     def __del__(self):
         self.close()
@@ -224,13 +513,14 @@ class HttpResponse(object):
         self.content = content
 
     def json(self, check=True):
-        encoding = guess_json_utf(self.content)
-        text = self.content.decode(encoding)
         if check and self.status_code not in (0, requests.codes.OK, requests.codes.CREATED):
-            raise OsbsResponseException(text, self.status_code)
+            encoding = guess_json_utf(self.content)
+            raise OsbsResponseException(self.content.decode(encoding), self.status_code)
 
         try:
-            return json.loads(text)
+            # parse the content as it is, json detects its encoding itself,
+            # so no decoded copy of large documents is kept around
+            return json.loads(self.content)
         except ValueError:
             msg = '{}Headers {}\nContent {}'.format('HtttpResponse has corrupt json:\n',
                                                     self.headers, self.content)
@@ -115,7 +115,12 @@ class RepoConfiguration(object):
     Read configuration from repository.
     """
 
-    def __init__(self, dir_path='', depth=None, git_uri=None, git_branch=None, git_ref=None):
+    def __init__(self, dir_path='', depth=None, git_uri=None, git_branch=None, git_ref=None,
+                 container=None):
+        """
+        :param container: dict, already loaded and validated container.yaml, files
+                          in dir_path are not read when it's provided
+        """
         self.container = {}
         self.depth = depth or 0
         # Keep track of the repo metadata in the repo configuration
@@ -124,15 +129,18 @@ class RepoConfiguration(object):
         self.git_ref = git_ref
         self.dir_path = dir_path
 
-        if self._check_repo_file_exists_with_expected_filename(
-                expected_filename=REPO_CONTAINER_CONFIG,
-                possible_filename_typos=REPO_CONTAINER_CONFIG_POSSIBLE_TYPOS
-        ):
-            self._validate_container_config_file()
-        self._check_repo_file_exists_with_expected_filename(
-            expected_filename=REPO_CONTENT_SETS_FILE,
-            possible_filename_typos=REPO_CONTENT_SETS_FILE_POSSIBLE_TYPOS
-        )
+        if container is not None:
+            self.container = container
+        else:
+            if self._check_repo_file_exists_with_expected_filename(
+                    expected_filename=REPO_CONTAINER_CONFIG,
+                    possible_filename_typos=REPO_CONTAINER_CONFIG_POSSIBLE_TYPOS
+            ):
+                self._validate_container_config_file()
+            self._check_repo_file_exists_with_expected_filename(
+                expected_filename=REPO_CONTENT_SETS_FILE,
+                possible_filename_typos=REPO_CONTENT_SETS_FILE_POSSIBLE_TYPOS
+            )
 
         if 'autorebuild' in self.container:
             logger.user_warning("'autorebuild' config is deprecated in OSBS 2.0, this config will "
@@ -311,6 +319,17 @@ class AdditionalTagsConfig(object):
 
         return True
 
+    @classmethod
+    def from_tags(cls, tags, from_container_yaml):
+        """
+        Create config of already read and validated tags, without reading the repo
+        """
+        config = cls.__new__(cls)
+        config._tags = set(tags)
+        config._from_container_yaml = from_container_yaml
+        config._file_path = None
+        return config
+
     @property
     def tags(self):
         return list(self._tags)
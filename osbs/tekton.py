@@ -4,22 +4,33 @@ All rights reserved.
 This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
+import codecs
 import json
+import math
 import time
 import logging
 import base64
 import os
 import requests
 import copy
+import queue
+from collections import namedtuple
+import threading
+import weakref
+from contextlib import closing, contextmanager
 from typing import Dict, Tuple, Callable, Any
 
 
-from osbs.exceptions import OsbsResponseException, OsbsAuthException, OsbsException
+from osbs.exceptions import (OsbsResponseException, OsbsAuthException, OsbsException,
+                             OsbsCircuitOpenException)
 from osbs.constants import (DEFAULT_NAMESPACE, SERVICEACCOUNT_SECRET, SERVICEACCOUNT_TOKEN,
-                            SERVICEACCOUNT_CACRT)
+                            SERVICEACCOUNT_CACRT, HTTP_POOL_MAXSIZE,
+                            HTTP_CIRCUIT_BREAKER_THRESHOLD, HTTP_CIRCUIT_BREAKER_RESET)
 from osbs.osbs_http import HttpSession
+from osbs.informer import Informer
 from osbs.kerberos_ccache import kerberos_ccache_init
-from osbs.utils import retry_on_conflict
+from osbs.utils import metrics, retry_on_conflict
+from osbs.utils.rate_limit import RateLimiter
 from urllib.parse import urljoin, urlencode, urlparse, parse_qs
 from requests.utils import guess_json_utf
 
@@ -34,9 +45,139 @@ MAX_BAD_RESPONSES = 20
 WAIT_RETRY_SECS = 5
 WAIT_RETRY_HOURS = 5
 WAIT_RETRY = (WAIT_RETRY_HOURS * 3600) // WAIT_RETRY_SECS
+# When pipeline run can't be watched, poll it with interval doubling up to 1 minute
+WAIT_POLL_MAX_SECS = 60
 
 API_VERSION = "tekton.dev/v1beta1"
 
+# Number of objects fetched with a single list request
+LIST_LIMIT = 500
+# Number of pipeline run names in a single label selector
+LABEL_SELECTOR_MAX_VALUES = 50
+# Maximum number of pipeline runs fetched one by one, instead of listing the namespace
+STATUS_GET_MAX_NAMES = 20
+
+PipelineRunStatus = namedtuple('PipelineRunStatus', [
+    'name', 'status', 'reason', 'start_time', 'completion_time', 'failed_tasks',
+])
+
+# Buffer at most 1000 lines of each followed container,
+# check every second whether following was stopped when the buffer is full
+LOG_STREAM_BUFFER_SIZE = 1000
+LOG_STREAM_POLL_SECS = 1
+
+# size of chunks in which logs are read when they are written to files
+LOG_CHUNK_SIZE = 64 * 1024
+
+# seconds to wait before resuming an interrupted log stream, and number of
+# consecutive failed attempts, which didn't deliver any line, to give up after
+LOG_RESUME_WAIT_SECS = 1
+LOG_RESUME_MAX_RETRIES = 3
+
+
+def _log_timestamp_key(timestamp):
+    """
+    Comparable form of an RFC 3339 UTC timestamp with optional fraction of seconds,
+    as prefixed to log lines by the kubelet, which omits trailing zeros of the fraction
+
+    :return: str, None if timestamp is not a valid timestamp
+    """
+    if not timestamp.endswith('Z'):
+        return None
+    seconds, _, fraction = timestamp[:-1].partition('.')
+    if len(seconds) != 19 or (fraction and not fraction.isdigit()):
+        return None
+    return '{}.{:0<9}'.format(seconds, fraction)
+
+
+class LogCursor(object):
+    """
+    Position in a followed container log: timestamp of the last delivered line
+    and number of lines delivered with this timestamp, as more lines may
+    have the same timestamp
+
+    Store it with to_dict() and restore with from_dict() to resume following
+    the log later.
+    """
+
+    def __init__(self, timestamp=None, delivered=0):
+        """
+        :param timestamp: str, RFC 3339 timestamp of the last delivered line
+        :param delivered: int, number of delivered lines with this timestamp
+        """
+        self.timestamp = None
+        self.delivered = self._skip = 0
+        self._set_position(timestamp, delivered)
+
+    def _set_position(self, timestamp, delivered):
+        valid_timestamp = timestamp is None or (isinstance(timestamp, str) and
+                                                _log_timestamp_key(timestamp) is not None)
+        valid_delivered = (isinstance(delivered, int) and not isinstance(delivered, bool) and
+                           delivered >= 0)
+        if not (valid_timestamp and valid_delivered):
+            # following would fail on comparing lines with it, start over instead
+            logger.warning("Ignoring invalid log cursor: timestamp %r, delivered %r",
+                           timestamp, delivered)
+            timestamp, delivered = None, 0
+        self.timestamp = timestamp
+        self.delivered = delivered if timestamp is not None else 0
+        # lines with the last timestamp to drop after resuming
+        self._skip = self.delivered
+
+    @property
+    def since_time(self):
+        """
+        :return: str, value for the sinceTime parameter of a log request,
+                 the timestamp truncated to seconds; None at the start of the log
+        """
+        if self.timestamp is None:
+            return None
+        return self.timestamp.partition('.')[0].rstrip('Z') + 'Z'
+
+    def deliver(self, line):
+        """
+        Advance the cursor with a line read from a log requested with timestamps
+
+        :param line: str, '<timestamp> <message>'
+        :return: str, message, None if the line was delivered already
+        """
+        timestamp, _, message = line.partition(' ')
+        key = _log_timestamp_key(timestamp)
+        if key is None:
+            # not a timestamped line, can't be deduplicated
+            return line
+
+        if self.timestamp is not None:
+            last_key = _log_timestamp_key(self.timestamp)
+            if key < last_key:
+                return None
+            if key == last_key:
+                if self._skip:
+                    self._skip -= 1
+                    return None
+                self.delivered += 1
+                return message
+
+        self.timestamp = timestamp
+        self.delivered = 1
+        self._skip = 0
+        return message
+
+    def resume(self):
+        """Prepare for a new stream, which repeats lines since the cursor's timestamp"""
+        self._skip = self.delivered
+
+    def update(self, data):
+        """Move the cursor to a position returned by to_dict"""
+        self._set_position(data.get('timestamp'), data.get('delivered', 0))
+
+    def to_dict(self):
+        return {'timestamp': self.timestamp, 'delivered': self.delivered}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('timestamp'), data.get('delivered', 0))
+
 
 def check_response(response, log_level=logging.INFO):
     if response.status_code not in (
@@ -65,21 +206,59 @@ def check_response_json(response, cmd):
     return run_json
 
 
+def iter_watch_events(response):
+    """
+    Parse events from a watch stream, skipping malformed ones
+
+    :param response: streamed HttpResponse of a watch request
+    :return: generator of dicts with 'type' and 'object' keys
+    """
+    for line in response.iter_lines():
+        encoding = guess_json_utf(line)
+        try:
+            j = json.loads(line.decode(encoding))
+        except ValueError:
+            logger.warning("Cannot decode watch event: %s", line)
+            continue
+        if 'object' not in j:
+            logger.warning("Watch event has no 'object': %s", j)
+            continue
+        if 'type' not in j:
+            logger.warning("Watch event has no 'type': %s", j)
+            continue
+        yield j
+
+
 class Openshift(object):
     def __init__(self, openshift_api_url, openshift_oauth_url,
                  k8s_api_url=None,
                  verbose=False, username=None, password=None, use_kerberos=False,
                  kerberos_keytab=None, kerberos_principal=None, kerberos_ccache=None,
                  client_cert=None, client_key=None, verify_ssl=True, use_auth=None,
-                 token=None, namespace=DEFAULT_NAMESPACE):
+                 token=None, namespace=DEFAULT_NAMESPACE, http_pool_maxsize=HTTP_POOL_MAXSIZE,
+                 http_keep_alive=True, use_informers=False, api_qps=None, api_burst=None,
+                 http_circuit_breaker_threshold=HTTP_CIRCUIT_BREAKER_THRESHOLD,
+                 http_circuit_breaker_reset=HTTP_CIRCUIT_BREAKER_RESET):
         self.os_api_url = openshift_api_url
         self.k8s_api_url = k8s_api_url
         self._os_oauth_url = openshift_oauth_url
         self.namespace = namespace
         self.verbose = verbose
         self.verify_ssl = verify_ssl
-        self._con = HttpSession(verbose=self.verbose)
+        # one pooled session shared by all requests of this instance
+        self._con = HttpSession(verbose=self.verbose, pool_maxsize=http_pool_maxsize,
+                                keep_alive=http_keep_alive,
+                                circuit_breaker_threshold=http_circuit_breaker_threshold,
+                                circuit_breaker_reset=http_circuit_breaker_reset)
         self.retries_enabled = True
+        # client-side limit of the rate of requests sent by this instance
+        self._rate_limiter = RateLimiter(api_qps, api_burst) if api_qps else None
+
+        # wait for objects using namespace-level watch caches instead of
+        # opening a watch per object
+        self.use_informers = use_informers
+        self._informers = {}
+        self._informers_lock = threading.Lock()
 
         # auth stuff
         self.use_kerberos = use_kerberos
@@ -133,6 +312,25 @@ class Openshift(object):
     def os_oauth_url(self):
         return self._os_oauth_url
 
+    def get_http_pool_stats(self):
+        """
+        Statistics of the connection pool shared by requests of this instance
+
+        :return: dict with 'requests', 'new_connections', 'hits' and 'in_flight' counters
+        """
+        return self._con.get_pool_stats()
+
+    def get_rate_limiter_stats(self):
+        """
+        Statistics of the client-side rate limiter shared by requests of this instance
+
+        :return: dict with 'requests', 'throttled', 'wait_seconds' and 'max_wait_seconds',
+                 None when requests are not rate limited
+        """
+        if self._rate_limiter is None:
+            return None
+        return self._rate_limiter.get_stats()
+
     def _build_k8s_url(self, url, _prepend_namespace=True, **query):
         if _prepend_namespace:
             url = "namespaces/%s/%s" % (self.namespace, url)
@@ -174,6 +372,10 @@ class Openshift(object):
         if self.verify_ssl and self.ca is not None:
             kwargs["ca"] = self.ca
 
+        # all requests go through here, wait until the rate limit allows this one
+        if self._rate_limiter is not None:
+            self._rate_limiter.acquire()
+
         return headers, kwargs
 
     def post(self, url, with_auth=True, **kwargs):
@@ -299,57 +501,173 @@ class Openshift(object):
 
         return result
 
+    def list_resource(self, api_path, api_version, resource_type, limit=None, **query):
+        """
+        List objects of given resource type in the namespace, following pagination
+
+        :param limit: int, maximum number of objects fetched with a single request
+        :param query: additional query parameters, e.g. labelSelector
+        :return: dict, list object with 'items' from all pages and 'metadata'
+                 of the last page
+        """
+        if limit:
+            query['limit'] = limit
+
+        items = []
+        while True:
+            url = self.build_url(api_path, api_version, resource_type, **query)
+            response = self.get(url)
+            check_response(response)
+            list_json = response.json()
+            items.extend(list_json.get('items') or [])
+
+            metadata = list_json.get('metadata') or {}
+            continue_token = metadata.get('continue')
+            if not continue_token:
+                break
+            query['continue'] = continue_token
+
+        return {'items': items, 'metadata': metadata}
+
+    def watch_events(self, api_path, api_version, resource_type, resource_name=None,
+                     _multiplexer=None, **query):
+        """
+        Open a single watch stream and yield its events until the server closes it
+
+        :param resource_name: str, name of the object to watch, None to watch
+                              all objects of the resource type in the namespace
+        :param _multiplexer: _StreamStopper which interrupts the stream when it stops
+        :param query: additional query parameters, e.g. resourceVersion
+        :return: generator of watch events, dicts with 'type' and 'object' keys
+        """
+        watch_path = f"watch/namespaces/{self.namespace}/{resource_type}/"
+        if resource_name:
+            watch_path += f"{resource_name}/"
+        query = {key: value for key, value in query.items() if value is not None}
+        watch_url = self.build_url(
+            api_path, api_version, watch_path, _prepend_namespace=False, **query
+        )
+
+        metrics.count('watch_streams', resource_type=resource_type)
+        response = self.get(watch_url, stream=True, headers={'Connection': 'close'})
+        try:
+            if _multiplexer is not None:
+                _multiplexer.track(response)
+            check_response(response)
+            for event in iter_watch_events(response):
+                metrics.count('watch_events', resource_type=resource_type, type=event['type'])
+                yield event
+        finally:
+            response.close()
+
+    def get_informer(self, api_path, api_version, resource_type):
+        """
+        Get the namespace-level watch cache of the resource type, shared by all callers
+
+        :return: Informer, already started
+        """
+        key = (api_path, api_version, resource_type)
+        with self._informers_lock:
+            informer = self._informers.get(key)
+            if informer is None:
+                informer = Informer(self, api_path, api_version, resource_type)
+                self._informers[key] = informer
+        informer.start()
+        return informer
+
+    def stop_informers(self, wait=False):
+        """
+        Stop all watch caches
+
+        :param wait: bool, wait until their background threads exit
+        """
+        with self._informers_lock:
+            informers = list(self._informers.values())
+            self._informers.clear()
+        for informer in informers:
+            informer.stop(wait=wait)
+
     def watch_resource(self, api_path, api_version, resource_type, resource_name,
-                       **request_args):
+                       _multiplexer=None, **request_args):
         """
         Watch for changes in openshift object and return it's json representation
         after each update to the object
+
+        The object is fetched once to get the baseline, then objects from watch events
+        are returned directly. On reconnect, watching resumes from the last seen
+        resourceVersion; the object is fetched again only when it has expired.
+        Empty dict is returned when the object was removed or couldn't be watched.
+
+        :param _multiplexer: _StreamStopper which interrupts watching when it stops
         """
         def log_and_sleep():
             logger.debug("Connection closed, reconnecting in %ds", WATCH_RETRY_SECS)
-            time.sleep(WATCH_RETRY_SECS)
+            _sleep(WATCH_RETRY_SECS, _multiplexer)
 
-        watch_path = f"watch/namespaces/{self.namespace}/{resource_type}/{resource_name}/"
-        watch_url = self.build_url(
-            api_path, api_version, watch_path, _prepend_namespace=False, **request_args
-        )
         get_url = self.build_url(api_path, api_version,
                                  f"{resource_type}/{resource_name}")
 
+        resource_version = None
         bad_responses = 0
-        for _ in range(WATCH_RETRY):
-            logger.debug("Watching for updates for %s, %s", resource_type, resource_name)
+        for attempt in range(WATCH_RETRY):
+            if attempt:
+                metrics.count('watch_reconnects', resource_type=resource_type)
             try:
-                response = self.get(watch_url, stream=True,
-                                    headers={'Connection': 'close'})
-                check_response(response)
-
-                for line in response.iter_lines():
-                    encoding = guess_json_utf(line)
-                    try:
-                        j = json.loads(line.decode(encoding))
-                    except ValueError:
-                        logger.warning("Cannot decode watch event: %s", line)
-                        continue
-                    if 'object' not in j:
-                        logger.warning("Watch event has no 'object': %s", j)
-                        continue
-                    if 'type' not in j:
-                        logger.warning("Watch event has no 'type': %s", j)
+                if resource_version is None:
+                    logger.debug("retrieving baseline version of object %s", resource_name)
+                    metrics.count('watch_baseline_fetches', resource_type=resource_type)
+                    response = self.get(get_url)
+                    if response.status_code == requests.codes.not_found:
+                        # resource might have been already removed, so yield None
+                        # and check if resource still exists
+                        yield {}
+                        log_and_sleep()
                         continue
+                    check_response(response)
+                    obj = response.json()
+                    resource_version = obj.get('metadata', {}).get('resourceVersion', '')
+                    yield obj
+
+                logger.debug("Watching for updates for %s, %s from resourceVersion %s",
+                             resource_type, resource_name, resource_version)
+                with closing(self.watch_events(api_path, api_version, resource_type,
+                                               resource_name, _multiplexer=_multiplexer,
+                                               resourceVersion=resource_version or None,
+                                               **request_args)) as events:
+                    for event in events:
+                        obj = event['object']
+                        if event['type'] == 'ERROR':
+                            if obj.get('code') == requests.codes.gone:
+                                logger.debug("resourceVersion %s of %s expired",
+                                             resource_version, resource_name)
+                                resource_version = None
+                                break
+                            logger.warning("Watch of %s returned error: %s",
+                                           resource_name, obj)
+                            continue
 
-                    # Avoid races. We've already asked the server to tell us
-                    # about changes to the object, but now ask for a fresh
-                    # copy of the object as well. This is to catch the
-                    # situation where the object changed before the call to
-                    # this method, or in between retries in this method.
-                    logger.debug("retrieving fresh version of object %s", resource_name)
-                    fresh_response = self.get(get_url)
-                    check_response(fresh_response)
-                    yield fresh_response.json()
+                        resource_version = obj.get('metadata', {}).get(
+                            'resourceVersion', resource_version)
+                        if event['type'] == 'DELETED':
+                            yield {}
+                        elif event['type'] in ('ADDED', 'MODIFIED'):
+                            yield obj
+
+                if resource_version is None:
+                    # baseline expired, fetch the object again right away
+                    continue
+
+            except OsbsCircuitOpenException as exc:
+                # the server failed repeatedly, watch again once requests are let through
+                logger.debug("Can't watch %s, %s", resource_name, exc.message)
+                _sleep(max(exc.retry_after, WATCH_RETRY_SECS), _multiplexer)
+                continue
 
             # we're already retrying, so there's no need to panic just because of a bad response
             except OsbsResponseException as exc:
+                if exc.status_code == requests.codes.gone:
+                    resource_version = None
+                    continue
                 bad_responses += 1
                 if bad_responses > MAX_BAD_RESPONSES:
                     raise exc
@@ -372,6 +690,365 @@ class Openshift(object):
             log_and_sleep()
 
 
+def _task_run_failed(status, reason, has_completion_time):
+    return status == 'False' and reason != 'TaskRunCancelled' and has_completion_time
+
+
+def list_pipeline_runs_status(os, pipeline_run_names=None, label_selector=None):
+    """
+    Get status of many pipeline runs with a single paginated list request
+
+    A few pipeline runs given by names, without label_selector, are fetched one by
+    one instead, to not list all pipeline runs of a busy namespace.
+    Task runs are listed only for failed pipeline runs, to find their failed tasks.
+
+    :param os: Openshift instance
+    :param pipeline_run_names: list of str, names of pipeline runs,
+                               None for all pipeline runs matching label_selector
+    :param label_selector: str, e.g. 'app=osbs', None for all pipeline runs
+    :return: dict, {pipeline run name: PipelineRunStatus}, status is None for names
+             of pipeline runs which don't exist
+    """
+    if (pipeline_run_names is not None and not label_selector and
+            len(pipeline_run_names) <= STATUS_GET_MAX_NAMES):
+        pipeline_runs = [PipelineRun(os, name).get_info() for name in pipeline_run_names]
+        pipeline_runs = [pipeline_run for pipeline_run in pipeline_runs if pipeline_run]
+    else:
+        query = {}
+        if label_selector:
+            query['labelSelector'] = label_selector
+        pipeline_runs = os.list_resource('apis', API_VERSION, 'pipelineruns',
+                                         limit=LIST_LIMIT, **query)['items']
+
+    if pipeline_run_names is not None:
+        wanted = set(pipeline_run_names)
+        pipeline_runs = [pipeline_run for pipeline_run in pipeline_runs
+                         if pipeline_run['metadata']['name'] in wanted]
+
+    statuses = {}
+    failed = []
+    for pipeline_run in pipeline_runs:
+        name = pipeline_run['metadata']['name']
+        run_status = pipeline_run.get('status', {})
+        conditions = run_status.get('conditions') or [{}]
+        status = conditions[0].get('status')
+        statuses[name] = PipelineRunStatus(
+            name=name,
+            status=status,
+            reason=conditions[0].get('reason'),
+            start_time=run_status.get('startTime'),
+            completion_time=run_status.get('completionTime'),
+            failed_tasks=[],
+        )
+        if status == 'False':
+            failed.append(name)
+
+    for i in range(0, len(failed), LABEL_SELECTOR_MAX_VALUES):
+        names = ','.join(failed[i:i + LABEL_SELECTOR_MAX_VALUES])
+        task_runs = os.list_resource('apis', API_VERSION, 'taskruns', limit=LIST_LIMIT,
+                                     labelSelector=f"tekton.dev/pipelineRun in ({names})")
+        for task_run in task_runs['items']:
+            labels = task_run['metadata'].get('labels', {})
+            conditions = task_run.get('status', {}).get('conditions')
+            if not conditions:
+                continue
+            if _task_run_failed(conditions[0].get('status'), conditions[0].get('reason'),
+                                'completionTime' in task_run['status']):
+                statuses[labels['tekton.dev/pipelineRun']].failed_tasks.append(
+                    labels['tekton.dev/pipelineTask'])
+
+    if pipeline_run_names is not None:
+        return {name: statuses.get(name) for name in pipeline_run_names}
+    return statuses
+
+
+class _LogsStopped(Exception):
+    """
+    Raised in a thread of a stopped _StreamStopper, e.g. _LogMultiplexer, to end reading
+    its stream
+    """
+
+
+def _sleep(secs, multiplexer=None):
+    """
+    time.sleep, ended early by _LogsStopped when the given _StreamStopper stops
+    """
+    if multiplexer is None:
+        time.sleep(secs)
+    else:
+        multiplexer.wait(secs)
+
+
+def _wait_for_cached(informer, name, predicate, exists, multiplexer=None):
+    """
+    Informer.wait_for, ended by _LogsStopped when the given _StreamStopper stops
+    """
+    stop = multiplexer.stopped if multiplexer is not None else None
+    obj = informer.wait_for(name, predicate, exists=exists, stop=stop)
+    if obj is None and stop is not None and stop.is_set():
+        raise _LogsStopped()
+    return obj
+
+
+class _StreamStopper(object):
+    """
+    Stop threads reading streams: streamed responses registered by track() are
+    interrupted and waits given the stopper end
+
+    Methods reading streams take it as their multiplexer argument, so readers
+    which aren't a _LogMultiplexer can be stopped too, e.g. by osbs.aio.
+    """
+
+    def __init__(self):
+        self.stopped = threading.Event()
+        # streamed responses opened by the threads, closed ones are dropped
+        self._streams = weakref.WeakSet()
+        self._streams_lock = threading.Lock()
+
+    def track(self, response):
+        """
+        Interrupt the streamed response when stopped
+
+        :raises _LogsStopped: if it stopped already
+        """
+        with self._streams_lock:
+            if self.stopped.is_set():
+                response.abort()
+                raise _LogsStopped()
+            self._streams.add(response)
+
+    def wait(self, secs):
+        """
+        :raises _LogsStopped: when stopped before secs pass
+        """
+        if self.stopped.wait(secs):
+            raise _LogsStopped()
+
+    def stop(self):
+        with self._streams_lock:
+            self.stopped.set()
+            streams = list(self._streams)
+        for response in streams:
+            response.abort()
+
+
+class _LogMultiplexer(_StreamStopper):
+    """
+    Read any number of log streams at the same time, each in its own thread,
+    and yield their lines in order of arrival
+
+    Each stream buffers at most buffer_size lines which weren't consumed yet.
+    A stream may add other streams while it's running, iteration ends when
+    all streams have ended.
+
+    When iteration stops early (the generator is closed), the threads are stopped,
+    see _StreamStopper, so they exit and don't keep connections open.
+    """
+    _STREAM_END = object()
+
+    def __init__(self, buffer_size=LOG_STREAM_BUFFER_SIZE):
+        super().__init__()
+        self._buffer_size = buffer_size
+        self._lines = queue.Queue()
+        self._running = 0
+        self._running_lock = threading.Lock()
+
+    def add(self, key, get_lines, *args):
+        """
+        Start reading a stream in a new thread
+
+        :param key: tuple, yielded with each line of the stream
+        :param get_lines: callable, called in the thread with args,
+                          returns iterable of lines
+        """
+        with self._running_lock:
+            self._running += 1
+        thread = threading.Thread(target=self._read, args=(key, get_lines, args), daemon=True,
+                                  name=f"osbs-logs-{'-'.join(key)}")
+        thread.start()
+
+    def _read(self, key, get_lines, args):
+        free_slots = threading.Semaphore(self._buffer_size)
+        try:
+            for line in get_lines(*args):
+                while not free_slots.acquire(timeout=LOG_STREAM_POLL_SECS):
+                    if self.stopped.is_set():
+                        return
+                if self.stopped.is_set():
+                    return
+                self._lines.put((key, line, free_slots))
+        except _LogsStopped:
+            pass
+        except Exception as exc:  # pylint: disable=broad-except
+            # errors of interrupted streams are expected
+            if not self.stopped.is_set():
+                self._lines.put((key, exc, None))
+        finally:
+            self._lines.put(self._STREAM_END)
+
+    def __iter__(self):
+        try:
+            while True:
+                with self._running_lock:
+                    if not self._running:
+                        return
+                item = self._lines.get()
+                if item is self._STREAM_END:
+                    with self._running_lock:
+                        self._running -= 1
+                    continue
+
+                key, line, free_slots = item
+                if free_slots is None:
+                    raise line
+                free_slots.release()
+                yield key + (line,)
+        finally:
+            self.stop()
+
+
+def _wait_end(timeout, deadline):
+    """
+    :param timeout: float, maximum number of seconds to wait, WAIT_RETRY_HOURS when None
+    :param deadline: float, time.time() timestamp when waiting ends at the latest
+    :return: float, time.time() timestamp when waiting ends
+    """
+    end = time.time() + (WAIT_RETRY_HOURS * 3600 if timeout is None else timeout)
+    if deadline is not None:
+        end = min(end, deadline)
+    return end
+
+
+def _poll_intervals(end):
+    """
+    Seconds to sleep between polls, growing exponentially from WAIT_RETRY_SECS
+    to WAIT_POLL_MAX_SECS, until end passes
+
+    :param end: float, time.time() timestamp when waiting ends
+    """
+    interval = WAIT_RETRY_SECS
+    while True:
+        remaining = end - time.time()
+        if remaining <= 0:
+            return
+        yield min(interval, remaining)
+        interval = min(interval * 2, WAIT_POLL_MAX_SECS)
+
+
+class _FinishWatch(object):
+    """
+    State of watching a pipeline run until it finishes, the requests are made by
+    PipelineRun._watch_for_finish and by its osbs.aio counterpart
+
+    Streams which end before the pipeline run finished are reopened after
+    WATCH_RETRY_SECS; after WATCH_RETRY consecutive streams without any event,
+    OsbsException is raised. When the watched resourceVersion is too old, the
+    pipeline run is fetched again and watched from its resourceVersion.
+    """
+
+    def __init__(self, pipeline_run, end, resource_version):
+        """
+        :param pipeline_run: PipelineRun, the watched pipeline run
+        :param end: float, time.time() timestamp when waiting ends
+        :param resource_version: str, resourceVersion of the last fetched pipeline run
+        """
+        self.pipeline_run = pipeline_run
+        self.end = end
+        self.resource_version = resource_version
+        # the pipeline run has to be fetched again before watching it
+        self.need_baseline = False
+        self._received = False
+        self._empty_streams = 0
+
+    def remaining(self):
+        return self.end - time.time()
+
+    def set_baseline(self, pipeline_run):
+        """
+        :param pipeline_run: dict, fetched pipeline run data
+        :return: bool, whether the pipeline run has finished
+        """
+        self.need_baseline = False
+        if self.pipeline_run._has_finished(pipeline_run):
+            return True
+        self.resource_version = pipeline_run.get('metadata', {}).get('resourceVersion')
+        return False
+
+    def start_stream(self):
+        """
+        :return: dict, query of the watch request
+        """
+        logger.info("Waiting for pipeline run '%s' to finish",
+                    self.pipeline_run.pipeline_run_name)
+        self._received = False
+        return {'resourceVersion': self.resource_version,
+                'timeoutSeconds': math.ceil(self.remaining())}
+
+    def handle_event(self, event):
+        """
+        The stream has to be closed when need_baseline is set
+
+        :param event: dict, watch event
+        :return: bool, whether the pipeline run has finished
+        """
+        obj = event['object']
+        if event['type'] == 'ERROR':
+            if obj.get('code') == requests.codes.gone:
+                self.need_baseline = True
+                return False
+            raise OsbsException(f"Watch of pipeline run "
+                                f"'{self.pipeline_run.pipeline_run_name}' "
+                                f"failed: {obj.get('message')}")
+        self._received = True
+        if event['type'] == 'DELETED':
+            return self.pipeline_run._has_finished({})
+
+        self.resource_version = obj.get('metadata', {}).get('resourceVersion',
+                                                            self.resource_version)
+        return self.pipeline_run._has_finished(obj)
+
+    def history_expired(self, exc):
+        """
+        :param exc: OsbsResponseException, error of the watch request
+        :return: bool, whether the pipeline run has to be fetched again,
+                 otherwise the error should be raised
+        """
+        if exc.status_code != requests.codes.gone:
+            return False
+        self.need_baseline = True
+        return True
+
+    def stream_ended(self):
+        """
+        :return: float, seconds to sleep before the next stream,
+                 None when the pipeline run has to be fetched first
+        """
+        self._empty_streams = 0 if self._received else self._empty_streams + 1
+        if self._empty_streams >= WATCH_RETRY:
+            raise OsbsException(f"Watch of pipeline run '{self.pipeline_run.pipeline_run_name}' "
+                                f"ended {self._empty_streams} times without any event")
+        if self.need_baseline:
+            return None
+        # don't reconnect in a busy loop when the server keeps closing streams
+        sleep_secs = min(WATCH_RETRY_SECS, max(self.remaining(), 0))
+        logger.debug("Watch of pipeline run '%s' ended, reconnecting in %.0fs",
+                     self.pipeline_run.pipeline_run_name, sleep_secs)
+        return sleep_secs
+
+
+class _SnapshotState(threading.local):
+    """
+    State of PipelineRun.snapshot() contexts, kept per thread, as a single PipelineRun
+    may be used from many threads at once, e.g. by osbs.aio
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.data = None
+        self.task_runs = None
+        self.depth = 0
+
+
 class PipelineRun():
     def __init__(self, os, pipeline_run_name, pipeline_run_data=None):
         self.os = os
@@ -386,12 +1063,52 @@ class PipelineRun():
             "metadata": {"name": self.pipeline_run_name},
             "spec": {},
         }
+        self._snapshot = _SnapshotState()
 
     @property
     def data(self):
-        # always get fresh info
+        # inside snapshot() return the fetched document, otherwise always get fresh info
+        if self._snapshot.depth:
+            return self._snapshot.data
         return self.get_info()
 
+    def refresh(self):
+        """
+        Fetch the pipeline run and use it as the snapshot for the current snapshot() context
+
+        :return: dict, pipeline run data, None when the pipeline run doesn't exist
+        """
+        self._snapshot.data = self.get_info()
+        self._snapshot.task_runs = None
+        return self._snapshot.data
+
+    @contextmanager
+    def snapshot(self):
+        """
+        Context in which all status properties and methods are computed from a single
+        fetched pipeline run document instead of fetching it on every access.
+
+        The document is fetched when entering the outermost context, nested contexts
+        reuse it. Call refresh() to get fresh data while inside the context.
+
+            with pipeline_run.snapshot():
+                if pipeline_run.has_not_finished():
+                    ...
+                reason = pipeline_run.status_reason
+
+        :return: dict, pipeline run data, None when the pipeline run doesn't exist
+        """
+        if not self._snapshot.depth:
+            self.refresh()
+        self._snapshot.depth += 1
+        try:
+            yield self._snapshot.data
+        finally:
+            self._snapshot.depth -= 1
+            if not self._snapshot.depth:
+                self._snapshot.data = None
+                self._snapshot.task_runs = None
+
     @property
     def pipeline_run_url(self):
         if self._pipeline_run_url is None:
@@ -466,16 +1183,78 @@ class PipelineRun():
 
         return check_response_json(response, 'get_info')
 
+    def _list_task_runs(self):
+        """
+        Fetch all task runs of this pipeline run with a single list request,
+        the result is reused while inside snapshot()
+
+        :return: dict, {task run name: task run data}
+        """
+        if self._snapshot.depth and self._snapshot.task_runs is not None:
+            return self._snapshot.task_runs
+
+        task_runs_list = self.os.list_resource(
+            self.api_path,
+            self.api_version,
+            "taskruns",
+            labelSelector=f"tekton.dev/pipelineRun={self.pipeline_run_name}",
+        )
+        task_runs = {
+            task_run['metadata']['name']: task_run for task_run in task_runs_list['items']
+        }
+
+        if self._snapshot.depth:
+            self._snapshot.task_runs = task_runs
+        return task_runs
+
+    def _get_child_task_runs(self, child_references=None):
+        """
+        Get task runs data for child references of the pipeline run
+
+        :param child_references: list, child references to get task runs for,
+                                 defaults to child references of the pipeline run
+        :return: list of task runs data, ordered as child references
+        """
+        if child_references is None:
+            child_references = self.child_references
+        if not child_references:
+            return []
+
+        listed_task_runs = self._list_task_runs()
+        task_runs = []
+        for task_run in child_references:
+            task_info = listed_task_runs.get(task_run['name'])
+            if task_info is None:
+                # task run may be missing in the list when it was just created
+                task_info = TaskRun(os=self.os, task_run_name=task_run['name']).get_info()
+            task_runs.append(task_info)
+
+        return task_runs
+
+    def get_task_runs(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch all task runs of this pipeline run
+
+        :return: dict, {pipeline task name: task run data}
+        """
+        with self.snapshot():
+            return {
+                task_info['metadata']['labels']['tekton.dev/pipelineTask']: task_info
+                for task_info in self._get_child_task_runs()
+            }
+
     def get_task_results(self):
+        with self.snapshot():
+            return self._get_task_results()
+
+    def _get_task_results(self):
         data = self.data
         task_results = {}
 
         if not data:
             return task_results
 
-        for task_run in self.child_references:
-            task_info = TaskRun(os=self.os, task_run_name=task_run['name']).get_info()
-
+        for task_info in self._get_child_task_runs():
             task_name = task_info['metadata']['labels']['tekton.dev/pipelineTask']
             results = {}
 
@@ -490,6 +1269,10 @@ class PipelineRun():
         return task_results
 
     def get_error_message(self):
+        with self.snapshot():
+            return self._get_error_message()
+
+    def _get_error_message(self):
         data = self.data
 
         if not data:
@@ -497,7 +1280,7 @@ class PipelineRun():
 
         plugin_errors = None
         annotations_str = None
-        task_results = self.get_task_results()
+        task_results = self._get_task_results()
 
         for task_name in ('binary-container-exit', 'source-container-exit'):
             if task_name not in task_results:
@@ -521,9 +1304,7 @@ class PipelineRun():
 
         pipeline_error = data['status']['conditions'][0].get('message')
 
-        for task_run in self.child_references:
-            task_info = TaskRun(os=self.os, task_run_name=task_run['name']).get_info()
-
+        for task_info in self._get_child_task_runs():
             task_name = task_info['metadata']['labels']['tekton.dev/pipelineTask']
             got_task_error = False
             if task_info['status']['conditions'][0]['reason'] in ['Succeeded', 'None']:
@@ -563,35 +1344,37 @@ class PipelineRun():
         return err_message
 
     def get_final_platforms(self):
-        data = self.data
-
-        if not data:
-            return None
+        with self.snapshot() as data:
+            if not data:
+                return None
 
-        task_results = self.get_task_results()
+            task_results = self._get_task_results()
 
-        if 'binary-container-prebuild' not in task_results:
-            return None
+            if 'binary-container-prebuild' not in task_results:
+                return None
 
-        if 'platforms_result' in task_results['binary-container-prebuild']:
-            platforms = json.loads(task_results['binary-container-prebuild']['platforms_result'])
-            return platforms['platforms']
+            prebuild_results = task_results['binary-container-prebuild']
+            if 'platforms_result' in prebuild_results:
+                platforms = json.loads(prebuild_results['platforms_result'])
+                return platforms['platforms']
 
-        return None
+            return None
 
     def has_succeeded(self):
-        status_reason = self.status_reason
-        logger.info("Pipeline run info: '%s'", self.data)
-        # tekton: completed means succeeded with a skipped task
-        return status_reason in ['Succeeded', 'Completed']
+        with self.snapshot() as data:
+            status_reason = self.status_reason
+            logger.info("Pipeline run info: '%s'", data)
+            # tekton: completed means succeeded with a skipped task
+            return status_reason in ['Succeeded', 'Completed']
 
     def has_not_finished(self):
-        data = self.data
-        if not data:
-            logger.info("Pipeline run removed '%s'", self.pipeline_run_name)
-            return False
+        with self.snapshot() as data:
+            if not data:
+                logger.info("Pipeline run removed '%s'", self.pipeline_run_name)
+                return False
 
-        return self.status_status == 'Unknown' and self.status_reason != 'PipelineRunCancelled'
+            return (self.status_status == 'Unknown' and
+                    self.status_reason != 'PipelineRunCancelled')
 
     def was_cancelled(self):
         return self.status_reason == 'PipelineRunCancelled'
@@ -602,12 +1385,7 @@ class PipelineRun():
 
         See table in https://tekton.dev/docs/pipelines/taskruns/#monitoring-execution-status
         """
-        return self._any_task_run_in_state(
-            'failed',
-            lambda status, reason, has_completion_time: (
-                status == 'False' and reason != 'TaskRunCancelled' and has_completion_time
-            ),
-        )
+        return self._any_task_run_in_state('failed', _task_run_failed)
 
     def any_task_was_cancelled(self) -> bool:
         """
@@ -646,26 +1424,114 @@ class PipelineRun():
 
             return False
 
-        task_runs = []
-        for task_run in self.child_references:
-            task_info = TaskRun(os=self.os, task_run_name=task_run['name']).get_info()
-            task_runs.append(task_info)
+        with self.snapshot():
+            task_runs = self._get_child_task_runs()
 
         return any(matches_state(tr) for tr in task_runs)
 
-    def wait_for_finish(self):
+    def wait_for_finish(self, timeout=None, deadline=None):
         """
         use this method after reading logs finished, to ensure that pipeline run finished,
         as pipeline run status doesn't change immediately when logs finished
+
+        The pipeline run is watched, so waiting ends as soon as it finishes, is cancelled
+        or removed. When it can't be watched, it's polled with growing intervals.
+
+        :param timeout: float, maximum number of seconds to wait, 5 hours by default
+        :param deadline: float, time.time() timestamp when waiting ends at the latest
+        :return: bool, False when waiting timed out
         """
-        for _ in range(WAIT_RETRY):
-            if self.has_not_finished():
-                logger.info("Waiting for pipeline run '%s' to finish, sleep for %ss",
-                            self.pipeline_run_name, WAIT_RETRY_SECS)
-                time.sleep(WAIT_RETRY_SECS)
-            else:
-                logger.info("Pipeline run '%s' finished", self.pipeline_run_name)
-                break
+        end = _wait_end(timeout, deadline)
+
+        with self.snapshot() as pipeline_run:
+            if not self.has_not_finished():
+                self._log_wait_result(True)
+                return True
+            resource_version = pipeline_run['metadata'].get('resourceVersion')
+
+        if self.os.use_informers:
+            informer = self.os.get_informer(self.api_path, self.api_version, "pipelineruns")
+            pipeline_run = informer.wait_for(self.pipeline_run_name, self._has_finished,
+                                             exists=lambda: bool(self.get_info()),
+                                             timeout=max(end - time.time(), 0))
+            finished = pipeline_run is not None or not self.get_info()
+        else:
+            try:
+                finished = self._watch_for_finish(end, resource_version)
+            except (OsbsException, requests.exceptions.RequestException) as exc:
+                logger.info("Can't watch pipeline run '%s', polling it instead: %r",
+                            self.pipeline_run_name, exc)
+                finished = self._poll_for_finish(end)
+
+        self._log_wait_result(finished)
+        return finished
+
+    def _log_wait_result(self, finished):
+        if finished:
+            logger.info("Pipeline run '%s' finished", self.pipeline_run_name)
+        else:
+            logger.warning("Timed out waiting for pipeline run '%s' to finish",
+                           self.pipeline_run_name)
+
+    def _has_finished(self, pipeline_run):
+        """
+        :param pipeline_run: dict, pipeline run data, empty when it was removed
+        """
+        if not pipeline_run:
+            logger.info("Pipeline run removed '%s'", self.pipeline_run_name)
+            return True
+        try:
+            status = pipeline_run['status']['conditions'][0]['status']
+            reason = pipeline_run['status']['conditions'][0]['reason']
+        except (KeyError, IndexError):
+            return False
+        return status != 'Unknown' or reason == 'PipelineRunCancelled'
+
+    def _watch_for_finish(self, end, resource_version):
+        """
+        Watch the pipeline run from the given resourceVersion until it finishes,
+        see _FinishWatch
+
+        :param end: float, time.time() timestamp when waiting ends
+        :param resource_version: str, resourceVersion of the last fetched pipeline run
+        :return: bool, False when waiting timed out
+        """
+        watch = _FinishWatch(self, end, resource_version)
+        while watch.remaining() > 0:
+            if watch.need_baseline and watch.set_baseline(self.get_info()):
+                return True
+            try:
+                for event in self.os.watch_events(self.api_path, self.api_version,
+                                                  "pipelineruns", self.pipeline_run_name,
+                                                  **watch.start_stream()):
+                    if watch.handle_event(event):
+                        return True
+                    if watch.need_baseline:
+                        break
+            except OsbsResponseException as exc:
+                if not watch.history_expired(exc):
+                    raise
+            sleep_secs = watch.stream_ended()
+            if sleep_secs is not None:
+                time.sleep(sleep_secs)
+        return False
+
+    def _poll_for_finish(self, end):
+        """
+        Poll the pipeline run with exponentially growing intervals until it finishes
+
+        :param end: float, time.time() timestamp when waiting ends
+        :return: bool, False when waiting timed out
+        """
+        intervals = _poll_intervals(end)
+        while self.has_not_finished():
+            sleep_secs = next(intervals, None)
+            if sleep_secs is None:
+                return False
+            logger.info("Waiting for pipeline run '%s' to finish, sleep for %ss",
+                        self.pipeline_run_name, sleep_secs)
+            time.sleep(sleep_secs)
+        return True
 
     @property
     def status_reason(self):
@@ -728,6 +1594,14 @@ class PipelineRun():
         https://tekton.dev/docs/pipelines/pipelineruns/#monitoring-execution-status
         """
         logger.info("Waiting for pipeline run '%s' to start", self.pipeline_run_name)
+        if self.os.use_informers:
+            informer = self.os.get_informer(self.api_path, self.api_version, "pipelineruns")
+            pipeline_run = informer.wait_for(self.pipeline_run_name, self._has_started,
+                                             exists=lambda: bool(self.get_info()))
+            if not pipeline_run:
+                logger.info("Pipeline run '%s' does not exist", self.pipeline_run_name)
+            return pipeline_run
+
         for pipeline_run in self.os.watch_resource(
                 self.api_path,
                 self.api_version,
@@ -739,30 +1613,36 @@ class PipelineRun():
                 logger.info("Pipeline run '%s' does not exist", self.pipeline_run_name)
                 return
 
-            try:
-                status = pipeline_run['status']['conditions'][0]['status']
-                reason = pipeline_run['status']['conditions'][0]['reason']
-            except KeyError:
-                logger.debug(
-                    "Pipeline run '%s' does not have any status yet",
-                    self.pipeline_run_name)
-                continue
-            # pipeline run finished successfully or failed, or is still running
-            if status in ['True', 'False'] or (status == 'Unknown' and reason == 'Running'):
-                logger.info("Pipeline run '%s' started", self.pipeline_run_name)
+            if self._has_started(pipeline_run):
                 return pipeline_run
-            else:
-                # (Unknown, Started), (Unknown, PipelineRunCancelled)
-                logger.debug("Waiting for pipeline run, current status %s, reason %s",
-                             status, reason)
 
-    def wait_for_taskruns(self):
+    def _has_started(self, pipeline_run):
+        try:
+            status = pipeline_run['status']['conditions'][0]['status']
+            reason = pipeline_run['status']['conditions'][0]['reason']
+        except KeyError:
+            logger.debug(
+                "Pipeline run '%s' does not have any status yet",
+                self.pipeline_run_name)
+            return False
+        # pipeline run finished successfully or failed, or is still running
+        if status in ['True', 'False'] or (status == 'Unknown' and reason == 'Running'):
+            logger.info("Pipeline run '%s' started", self.pipeline_run_name)
+            return True
+        # (Unknown, Started), (Unknown, PipelineRunCancelled)
+        logger.debug("Waiting for pipeline run, current status %s, reason %s",
+                     status, reason)
+        return False
+
+    def wait_for_taskruns(self, _multiplexer=None):
         """
         This generator method watches new task runs in a pipeline run
         and yields newly started task runs.
         The reason we have to watch for changes is that at the start, the pipeline run
         does not have information about all of its task runs, especially when there are multiple
         sequential tasks.
+
+        :param _multiplexer: _StreamStopper which interrupts watching when it stops
         """
         watched_task_runs = set()
         for pipeline_run in self.os.watch_resource(
@@ -770,6 +1650,7 @@ class PipelineRun():
                 self.api_version,
                 resource_type="pipelineruns",
                 resource_name=self.pipeline_run_name,
+                _multiplexer=_multiplexer,
         ):
             # failed because connection or timeout and pipeline was removed
             if not pipeline_run and not self.data:
@@ -777,24 +1658,30 @@ class PipelineRun():
                 return []
 
             try:
-                child_references = self.data['status']['childReferences']
+                child_references = pipeline_run['status']['childReferences']
             except KeyError:
                 logger.debug(
                     "Pipeline run '%s' does not have any task runs yet",
                     self.pipeline_run_name)
                 continue
             current_task_runs = []
+            new_task_runs = [
+                task_run for task_run in child_references
+                if task_run['kind'] == 'TaskRun' and task_run['name'] not in watched_task_runs
+            ]
+            # newer tekton versions provide pipeline task name in child references,
+            # fetch all task runs at once only when it's missing
+            if all('pipelineTaskName' in task_run for task_run in new_task_runs):
+                task_names = [task_run['pipelineTaskName'] for task_run in new_task_runs]
+            else:
+                task_names = [
+                    task_info['metadata']['labels']['tekton.dev/pipelineTask']
+                    for task_info in self._get_child_task_runs(new_task_runs)
+                ]
 
-            for task_run in child_references:
-                if task_run['kind'] != 'TaskRun':
-                    continue
-                task_run_name = task_run['name']
-                task_info = TaskRun(os=self.os, task_run_name=task_run_name).get_info()
-                task_name = task_info['metadata']['labels']['tekton.dev/pipelineTask']
-
-                if task_run_name not in watched_task_runs:
-                    watched_task_runs.add(task_run_name)
-                    current_task_runs.append((task_name, task_run_name))
+            for task_run, task_name in zip(new_task_runs, task_names):
+                watched_task_runs.add(task_run['name'])
+                current_task_runs.append((task_name, task_run['name']))
 
             yield current_task_runs
 
@@ -808,41 +1695,107 @@ class PipelineRun():
                 return
 
     def _get_logs(self):
+        with self.snapshot():
+            return self._get_snapshot_logs()
+
+    def _get_snapshot_logs(self):
         logs = {}
         pipeline_run = self.data
 
         if not pipeline_run:
             return None
 
-        for task_run in self.child_references:
-
-            task_run_object = TaskRun(os=self.os, task_run_name=task_run['name'])
-            task_info = task_run_object.get_info()
+        for task_info in self._get_child_task_runs():
+            task_run_object = TaskRun(os=self.os, task_run_name=task_info['metadata']['name'])
             pipeline_task_name = task_info['metadata']['labels']['tekton.dev/pipelineTask']
 
-            logs[pipeline_task_name] = task_run_object.get_logs()
+            logs[pipeline_task_name] = task_run_object.get_pod_logs(task_info)
 
         return logs
 
-    def _get_logs_stream(self):
+    def save_logs(self, directory):
+        """
+        Write logs of all containers of all task runs to files in directory,
+        named <pipeline task name>-<container>.log; logs are streamed to the
+        files, so they don't have to fit in memory
+
+        :param directory: str, existing directory
+        :return: dict, {pipeline task name: {container: path}}, None when
+                 the pipeline run doesn't exist
+        """
+        with self.snapshot():
+            if not self.data:
+                return None
+            task_runs = self._get_child_task_runs()
+
+        paths = {}
+        for task_info in task_runs:
+            pipeline_task_name = task_info['metadata']['labels']['tekton.dev/pipelineTask']
+            task_run = TaskRun(os=self.os, task_run_name=task_info['metadata']['name'])
+            pod = task_run.get_pod(task_info)
+            task_paths = paths.setdefault(pipeline_task_name, {})
+            for container in pod.containers:
+                path = os.path.join(directory, f"{pipeline_task_name}-{container}.log")
+                with open(path, 'wb') as f:
+                    pod.write_logs(f, container)
+                task_paths[container] = path
+
+        return paths
+
+    def follow_logs(self, buffer_size=LOG_STREAM_BUFFER_SIZE, cursors=None):
+        """
+        Follow logs of all containers of all task runs at the same time
+
+        Each container is streamed in its own thread, so a container waiting for
+        output doesn't hold back the others. Lines of a container keep their order,
+        lines of different containers are yielded as they arrive.
+
+        With cursors, following continues where it left off: the LogCursor of
+        each container is updated when its line is yielded, so the dict can be
+        stored (see LogCursor.to_dict) and passed again, e.g. after a restart of
+        the monitoring process, to skip lines yielded already.
+
+        :param buffer_size: int, maximum number of lines buffered for each container
+        :param cursors: dict, {(pipeline task name, container): LogCursor}, missing
+                        cursors are added
+        :return: generator of (pipeline task name, container, line)
+        """
         self.wait_for_start()
-        streaming_task_runs = {}
-        for task_runs in self.wait_for_taskruns():
-            for pipeline_task_name, task_run_name in task_runs:
-                streaming_task_runs[pipeline_task_name] = (TaskRun(os=self.os,
-                                                                   task_run_name=task_run_name)
-                                                           .get_logs(follow=True, wait=True))
-            while streaming_task_runs:
-                tasks = list(streaming_task_runs.items())
-                for pipeline_task_name, task_run in tasks:
-                    try:
-                        if not task_run:
-                            del streaming_task_runs[pipeline_task_name]
-                            continue
+        logs = _LogMultiplexer(buffer_size)
+        cursors = cursors if cursors is not None else {}
+
+        def follow_container(pod, container, cursor):
+            # the stream runs ahead of yielded lines, it uses its own cursor
+            # and passes its position along with each line
+            cursor = LogCursor.from_dict(cursor.to_dict())
+            for line in pod._stream_logs(container, cursor, logs):
+                yield line, cursor.to_dict()
+
+        def follow_task_run(pipeline_task_name, task_run_name):
+            task_run = TaskRun(os=self.os, task_run_name=task_run_name)
+            pod = task_run.wait_for_pod(_multiplexer=logs)
+            if pod:
+                for container in pod.containers:
+                    cursor = cursors.setdefault((pipeline_task_name, container), LogCursor())
+                    logs.add((pipeline_task_name, container), follow_container,
+                             pod, container, cursor)
+            return ()
+
+        def follow_task_runs():
+            for task_runs in self.wait_for_taskruns(_multiplexer=logs):
+                for pipeline_task_name, task_run_name in task_runs:
+                    logs.add((pipeline_task_name,), follow_task_run,
+                             pipeline_task_name, task_run_name)
+            return ()
+
+        logs.add((self.pipeline_run_name,), follow_task_runs)
+        for pipeline_task_name, container, (line, position) in logs:
+            cursors[(pipeline_task_name, container)].update(position)
+            yield pipeline_task_name, container, line
 
-                        yield pipeline_task_name, next(task_run)
-                    except StopIteration:
-                        del streaming_task_runs[pipeline_task_name]
+    def _get_logs_stream(self):
+        for pipeline_task_name, _, line in self.follow_logs():
+            yield pipeline_task_name, line
 
     def get_logs(self, follow=False, wait=False):
         if wait or follow:
@@ -879,40 +1832,86 @@ class TaskRun():
         if not task_run and not self.get_info():
             return
 
+        return self.get_pod_logs(task_run, follow=follow, wait=wait)
+
+    def get_pod_logs(self, task_run, follow=False, wait=False):
+        """
+        Get logs of the pod of the task run
+
+        :param task_run: dict, already fetched task run data
+        """
+        return self.get_pod(task_run).get_logs(follow=follow, wait=wait)
+
+    def get_pod(self, task_run):
+        """
+        :param task_run: dict, already fetched task run data
+        :return: Pod of the task run with containers of its steps
+        """
         pod_name = task_run['status']['podName']
         containers = [step['container'] for step in task_run['status']['steps']]
-        pod = Pod(os=self.os, pod_name=pod_name, containers=containers)
-        return pod.get_logs(follow=follow, wait=wait)
+        return Pod(os=self.os, pod_name=pod_name, containers=containers)
 
-    def wait_for_start(self):
+    def wait_for_pod(self, _multiplexer=None):
+        """
+        Wait for the task run and its pod to start
+
+        :param _multiplexer: _StreamStopper which interrupts waiting when it stops
+        :return: Pod of the task run, None when the task run or pod doesn't exist
+        """
+        task_run = self.wait_for_start(_multiplexer=_multiplexer) or self.get_info()
+        if not task_run:
+            return None
+
+        pod = self.get_pod(task_run)
+        if not pod.wait_for_start(_multiplexer=_multiplexer) and not pod.get_info():
+            return None
+        return pod
+
+    def wait_for_start(self, _multiplexer=None):
         """
         https://tekton.dev/docs/pipelines/taskruns/#monitoring-execution-status
+
+        :param _multiplexer: _StreamStopper which interrupts waiting when it stops
         """
         logger.info("Waiting for task run '%s' to start", self.task_run_name)
+        if self.os.use_informers:
+            informer = self.os.get_informer(self.api_path, self.api_version, "taskruns")
+            task_run = _wait_for_cached(informer, self.task_run_name, self._has_started,
+                                        exists=lambda: bool(self.get_info()),
+                                        multiplexer=_multiplexer)
+            if not task_run:
+                logger.info("Task run '%s' does not exist", self.task_run_name)
+            return task_run
+
         for task_run in self.os.watch_resource(
                 self.api_path,
                 self.api_version,
                 resource_type="taskruns",
                 resource_name=self.task_run_name,
+                _multiplexer=_multiplexer,
         ):
             # failed because connection or timeout and task was removed
             if not task_run and not self.get_info():
                 logger.info("Task run '%s' does not exist", self.task_run_name)
                 return
 
-            try:
-                status = task_run['status']['conditions'][0]['status']
-                reason = task_run['status']['conditions'][0]['reason']
-            except KeyError:
-                logger.debug("Task run '%s' does not have any status yet", self.task_run_name)
-                continue
-            # task run finished successfully or failed
-            if status in ['True', 'False'] or (status == 'Unknown' and reason == 'Running'):
-                logger.info("Task run '%s' started", self.task_run_name)
+            if self._has_started(task_run):
                 return task_run
-            else:
-                # (Unknown, Started), (Unknown, Pending), (Unknown, TaskRunCancelled)
-                logger.debug("Waiting for task run, current status: %s, reason %s", status, reason)
+
+    def _has_started(self, task_run):
+        try:
+            status = task_run['status']['conditions'][0]['status']
+            reason = task_run['status']['conditions'][0]['reason']
+        except KeyError:
+            logger.debug("Task run '%s' does not have any status yet", self.task_run_name)
+            return False
+        # task run finished successfully or failed
+        if status in ['True', 'False'] or (status == 'Unknown' and reason == 'Running'):
+            logger.info("Task run '%s' started", self.task_run_name)
+            return True
+        # (Unknown, Started), (Unknown, Pending), (Unknown, TaskRunCancelled)
+        logger.debug("Waiting for task run, current status: %s, reason %s", status, reason)
+        return False
 
 
 class Pod():
@@ -940,9 +1939,17 @@ class Pod():
             self.api_version,
             f"pods/{self.pod_name}/log"
         )
-        r = self.os.get(url)
-        check_response(r)
-        return r.content.decode('utf-8')
+        return self._read_log(url)
+
+    def _read_log(self, url):
+        """
+        Read the whole log from its chunks, without buffering the response once more
+
+        :return: str
+        """
+        with self.os.get(url, stream=True) as response:
+            check_response(response)
+            return ''.join(codecs.iterdecode(response.iter_chunks(LOG_CHUNK_SIZE), 'utf-8'))
 
     def _get_logs(self):
         logs = {}
@@ -955,19 +1962,54 @@ class Pod():
                 f"pods/{self.pod_name}/log",
                 **kwargs
             )
-            r = self.os.get(url)
-            check_response(r)
-            logs[container] = r.content.decode('utf-8')
+            logs[container] = self._read_log(url)
         return logs
 
+    def iter_log_chunks(self, container=None, chunk_size=LOG_CHUNK_SIZE):
+        """
+        Read the log of a container in chunks, without keeping all of it in memory
+
+        :param container: str, container name, may be omitted for pods with a single container
+        :param chunk_size: int, maximal size of chunks
+        :return: generator of bytes
+        """
+        kwargs = {'container': container} if container else {}
+        url = self.os.build_url(
+            self.api_path,
+            self.api_version,
+            f"pods/{self.pod_name}/log",
+            **kwargs
+        )
+        with self.os.get(url, stream=True) as response:
+            check_response(response)
+            yield from response.iter_chunks(chunk_size)
+
+    def write_logs(self, sink, container=None):
+        """
+        Write the log of a container to a file object as it's read
+
+        :param sink: binary file object, or anything else with a write(bytes) method
+        :param container: str, container name, may be omitted for pods with a single container
+        :return: int, number of bytes written
+        """
+        written = 0
+        for chunk in self.iter_log_chunks(container):
+            sink.write(chunk)
+            written += len(chunk)
+        return written
+
     def _get_logs_stream(self):
         pod = self.wait_for_start()
 
         if not pod and not self.get_info():
             return
 
+        # containers are followed at the same time, each in its own thread
+        logs = _LogMultiplexer()
         for container in self.containers:
-            yield from self._stream_logs(container)
+            logs.add((container,), self._stream_logs, container, None, logs)
+        for _, line in logs:
+            yield line
 
     def get_logs(self, follow=False, wait=False):
         if follow or wait:
@@ -977,35 +2019,81 @@ class Pod():
         else:
             return self._get_logs_no_container()
 
-    def _stream_logs(self, container):
-        kwargs = {'follow': True}
-        if container:
-            kwargs['container'] = container
+    def _container_finished(self, container, interrupted=True):
+        """
+        The state of the container is taken from the informer cache when informers
+        are used. Otherwise the pod is fetched only when the log stream was
+        interrupted, a log stream which ended properly means the container terminated.
 
-        # If connection is closed within this many seconds, give up:
-        min_idle_timeout = 60
+        :param interrupted: bool, whether the log stream ended by a broken connection
+        :return: bool, True when the container terminated, or the pod or
+                 container status doesn't exist, so no more logs will come
+        """
+        if self.os.use_informers:
+            informer = self.os.get_informer(self.api_path, self.api_version, "pods")
+            pod = informer.get(self.pod_name)
+        elif not interrupted:
+            return True
+        else:
+            pod = self.get_info()
+        if not pod:
+            return True
+        statuses = pod.get('status', {}).get('containerStatuses', [])
+        for status in statuses:
+            if status.get('name') == container:
+                return 'terminated' in status.get('state', {})
+        return True
 
-        # Stream logs, but be careful of the connection closing
-        # due to idle timeout. In that case, try again until the
-        # call returns more quickly than a reasonable timeout
-        # would be set to.
+    def _stream_logs(self, container, cursor=None, multiplexer=None):
+        """
+        Follow the log of a container, resuming after disconnects
+
+        Lines are requested with timestamps; after a disconnect, the log is
+        requested again since the timestamp of the last delivered line and
+        lines delivered already are dropped. Following ends when the stream
+        ends and the container has terminated.
+
+        :param container: str, container name
+        :param cursor: LogCursor, position to continue from, it's updated as
+                       lines are delivered, so it can be stored and used to
+                       resume following later, e.g. by another process
+        :param multiplexer: _StreamStopper, e.g. the _LogMultiplexer reading the stream,
+                            it interrupts the stream and waits when it stops
+        :return: generator of log lines
+        """
+        cursor = cursor if cursor is not None else LogCursor()
+        failures = 0
         while True:
-            connected = time.time()
+            cursor.resume()
+            kwargs = {'follow': True, 'timestamps': 'true'}
+            if container:
+                kwargs['container'] = container
+            if cursor.since_time:
+                kwargs['sinceTime'] = cursor.since_time
             url = self.os.build_url(
                 self.api_path,
                 self.api_version,
                 f"pods/{self.pod_name}/log",
                 **kwargs
             )
+            ended = False
+            interrupted = True
             try:
-                logger.debug('Streaming logs for container %s', container)
-                response = self.os.get(url, stream=True,
-                                       headers={'Connection': 'close'})
-                check_response(response)
-
-                for line in response.iter_lines():
-                    connected = time.time()
-                    yield line.decode('utf-8')
+                logger.debug('Streaming logs for container %s since %s', container,
+                             cursor.since_time)
+                with self.os.get(url, stream=True,
+                                 headers={'Connection': 'close'}) as response:
+                    if multiplexer is not None:
+                        multiplexer.track(response)
+                    check_response(response)
+
+                    for line in response.iter_lines():
+                        line = cursor.deliver(line.decode('utf-8'))
+                        if line is not None:
+                            failures = 0
+                            yield line
+                ended = True
+                interrupted = response.interrupted
             # NOTE1: If self.get causes ChunkedEncodingError, ConnectionError,
             # or IncompleteRead to be raised, they'll be wrapped in
             # OsbsNetworkException or OsbsException
@@ -1015,6 +2103,11 @@ class Pod():
             # check_response(). In this case, exception will be
             # wrapped in OsbsException or OsbsNetworkException,
             # inspect cause to detect ConnectionError.
+            except OsbsCircuitOpenException as exc:
+                # no request was sent, so it's not a failed attempt
+                logger.debug("Can't follow logs of container %s, %s", container, exc.message)
+                _sleep(max(exc.retry_after, LOG_RESUME_WAIT_SECS), multiplexer)
+                continue
             except OsbsException as exc:
                 if (not isinstance(exc.cause, requests.ConnectionError) and
                         not isinstance(exc.cause, requests.Timeout)):
@@ -1024,34 +2117,57 @@ class Pod():
             except requests.exceptions.Timeout:
                 pass
 
-            idle = time.time() - connected
-            logger.debug("Connection closed after %ds", idle)
-            if idle < min_idle_timeout:
-                # Finish output
+            if multiplexer is not None and multiplexer.stopped.is_set():
                 return
-
-            since = int(idle - 1)
-            logger.debug("Fetching logs starting from %ds ago", since)
-            kwargs['sinceSeconds'] = since
-
-    def wait_for_start(self):
+            # a stream of a terminated container ends after its last line,
+            # when it was interrupted, resume to get the rest of the log
+            if ended and self._container_finished(container, interrupted):
+                return
+            if not ended:
+                failures += 1
+                if failures > LOG_RESUME_MAX_RETRIES:
+                    logger.warning("Giving up following logs of container %s after %d "
+                                   "failed attempts", container, failures)
+                    return
+            logger.debug("Log stream of container %s closed, resuming", container)
+            metrics.count('log_stream_reconnects')
+            _sleep(LOG_RESUME_WAIT_SECS, multiplexer)
+
+    def wait_for_start(self, _multiplexer=None):
+        """
+        :param _multiplexer: _StreamStopper which interrupts waiting when it stops
+        """
         logger.info("Waiting for pod to start '%s'", self.pod_name)
+        if self.os.use_informers:
+            informer = self.os.get_informer(self.api_path, self.api_version, "pods")
+            pod = _wait_for_cached(informer, self.pod_name, self._has_started,
+                                   exists=lambda: bool(self.get_info()),
+                                   multiplexer=_multiplexer)
+            if not pod:
+                logger.info("Pod '%s' does not exist", self.pod_name)
+            return pod
+
         for pod in self.os.watch_resource(
-                self.api_path, self.api_version, resource_type="pods", resource_name=self.pod_name
+                self.api_path, self.api_version, resource_type="pods", resource_name=self.pod_name,
+                _multiplexer=_multiplexer,
         ):
             # failed because connection or timeout and pod was removed
             if not pod and not self.get_info():
                 logger.info("Pod '%s' does not exist", self.pod_name)
                 return
 
-            try:
-                status = pod['status']['phase']
-            except KeyError:
-                logger.debug("Pod '%s' does not have any status yet", self.pod_name)
-                continue
-            if status in ['Running', 'Succeeded', 'Failed']:
-                logger.info("Pod '%s' started", self.pod_name)
+            if self._has_started(pod):
                 return pod
-            else:
-                # unknown or pending
-                logger.debug("Waiting for pod, current state: %s", status)
+
+    def _has_started(self, pod):
+        try:
+            status = pod['status']['phase']
+        except KeyError:
+            logger.debug("Pod '%s' does not have any status yet", self.pod_name)
+            return False
+        if status in ['Running', 'Succeeded', 'Failed']:
+            logger.info("Pod '%s' started", self.pod_name)
+            return True
+        # unknown or pending
+        logger.debug("Waiting for pod, current state: %s", status)
+        return False
@@ -23,17 +23,20 @@ from collections import namedtuple
 from datetime import datetime
 from hashlib import sha256
 from osbs.repo_utils import RepoConfiguration, RepoInfo, AdditionalTagsConfig
-from osbs.constants import (OS_CONFLICT_MAX_RETRIES, OS_CONFLICT_WAIT,
-                            GIT_MAX_RETRIES, GIT_BACKOFF_FACTOR, GIT_FETCH_RETRY,
+from osbs.constants import (OS_CONFLICT_MAX_RETRIES, OS_CONFLICT_WAIT, OS_CONFLICT_MAX_WAIT,
+                            OS_CONFLICT_DEADLINE, GIT_MAX_RETRIES, GIT_BACKOFF_FACTOR,
+                            GIT_BACKOFF_MAX, GIT_RETRY_DEADLINE, GIT_FETCH_RETRY,
                             USER_WARNING_LEVEL, USER_WARNING_LEVEL_NAME, RAND_DIGITS)
 
 # This was moved to a separate file - import here for external API compatibility
 from osbs.utils.labels import Labels  # noqa: F401
+from osbs.utils import metrics
+from osbs.utils.git_cache import COMMIT_ID_RE
+from osbs.utils.retry import Backoff
 
 from six.moves import http_client
 from six.moves.urllib.parse import urlparse
 
-from dockerfile_parse import DockerfileParser
 from osbs.exceptions import (OsbsException, OsbsResponseException,
                              OsbsValidationException, OsbsCommitNotFound, OsbsLocallyModified)
 
@@ -71,7 +74,7 @@ class RegistryURI(object):
 
 @contextlib.contextmanager
 def checkout_git_repo(git_url, target_dir=None, commit=None, retry_times=GIT_MAX_RETRIES,
-                      branch=None, depth=None):
+                      branch=None, depth=None, git_cache=None, metadata_only=False):
     """
     clone provided git repo to target_dir, optionally checkout provided commit
     yield the ClonedRepoData and delete the repo when finished
@@ -82,30 +85,43 @@ def checkout_git_repo(git_url, target_dir=None, commit=None, retry_times=GIT_MAX
     :param retry_times: int, number of retries for git clone
     :param branch: str, optional branch of the commit, required if depth is provided
     :param depth: int, optional expected depth
+    :param git_cache: GitMirrorCache, optional cache to clone the repo from
+    :param metadata_only: bool, check out only files in the top-level directory
     :return: str, int, commit ID of HEAD
     """
     tmpdir = tempfile.mkdtemp()
     target_dir = target_dir or os.path.join(tmpdir, "repo")
     try:
-        yield clone_git_repo(git_url, target_dir, commit, retry_times, branch, depth)
+        yield clone_git_repo(git_url, target_dir, commit, retry_times, branch, depth,
+                             git_cache=git_cache, metadata_only=metadata_only)
     finally:
         shutil.rmtree(tmpdir)
 
 
+@metrics.instrumented('git_clone')
 def clone_git_repo(git_url, target_dir=None, commit=None, retry_times=GIT_MAX_RETRIES, branch=None,
-                   depth=None):
+                   depth=None, git_cache=None, metadata_only=False, timings=None):
     """
     clone provided git repo to target_dir, optionally checkout provided commit
 
+    With metadata_only, only files in the top-level directory of the repo
+    (Dockerfile, container.yaml, ...) are checked out, using sparse checkout,
+    and a partial clone without any blobs is requested, so that only blobs
+    of the checked out files are downloaded.
+
     :param git_url: str, git repo to clone
     :param target_dir: str, filesystem path where the repo should be cloned
     :param commit: str, commit to checkout, SHA-1 or ref
     :param retry_times: int, number of retries for git clone
     :param branch: str, optional branch of the commit, required if depth is provided
     :param depth: int, optional expected depth
+    :param git_cache: GitMirrorCache, optional cache to clone the repo from,
+                      depth is ignored when cloning from the cache
+    :param metadata_only: bool, check out only files in the top-level directory
+    :param timings: dict, optional, seconds spent in each git step are added to it
     :return: str, int, commit ID of HEAD
     """
-    retry_delay = GIT_BACKOFF_FACTOR
+    backoff = Backoff(GIT_BACKOFF_FACTOR, max_delay=GIT_BACKOFF_MAX, deadline=GIT_RETRY_DEADLINE)
     target_dir = target_dir or os.path.join(tempfile.mkdtemp(), "repo")
     commit = commit or "master"
     logger.info("cloning git repo '%s'", git_url)
@@ -120,6 +136,8 @@ def clone_git_repo(git_url, target_dir=None, commit=None, retry_times=GIT_MAX_RE
     elif depth:
         logger.warning("branch not provided for %s, depth setting ignored", git_url)
         depth = None
+    if metadata_only:
+        cmd += ["--filter=blob:none", "--sparse"]
 
     cmd += [git_url, target_dir]
 
@@ -128,19 +146,25 @@ def clone_git_repo(git_url, target_dir=None, commit=None, retry_times=GIT_MAX_RE
     repo_depth = None
     for counter in range(retry_times + 1):
         try:
-            # we are using check_output, even though we aren't using
-            # the return value, but we will get 'output' in exception
-            subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+            with _timed('clone', timings):
+                if git_cache:
+                    git_cache.clone(git_url, target_dir, commit=commit, branch=branch,
+                                    sparse=metadata_only)
+                else:
+                    # we are using check_output, even though we aren't using
+                    # the return value, but we will get 'output' in exception
+                    subprocess.check_output(cmd, stderr=subprocess.STDOUT)
             try:
-                repo_commit, repo_depth = reset_git_repo(target_dir, commit, depth)
+                repo_commit, repo_depth = reset_git_repo(target_dir, commit, depth,
+                                                         timings=timings)
             except OsbsCommitNotFound as exc:
                 raise OsbsCommitNotFound("Commit {} is not reachable in branch {}, reason: {}"
                                          .format(commit, branch, exc))
             break
         except subprocess.CalledProcessError as exc:
-            if counter != retry_times:
+            if counter != retry_times and backoff.sleep():
                 logger.info("retrying command '%s':\n '%s'", cmd, exc.output)
-                time.sleep(retry_delay * (2 ** counter))
+                metrics.count('git_clone_retries')
             else:
                 raise OsbsException("Unable to clone git repo '%s' "
                                     "branch '%s'" % (git_url, branch),
@@ -149,54 +173,124 @@ def clone_git_repo(git_url, target_dir=None, commit=None, retry_times=GIT_MAX_RE
     return ClonedRepoData(target_dir, repo_commit, repo_depth)
 
 
-def reset_git_repo(target_dir, git_reference, retry_depth=None):
+@contextlib.contextmanager
+def _timed(step, timings):
+    """
+    Log how long the step took and add it to timings, if provided
+    """
+    start = time.monotonic()
+    try:
+        with metrics.span('git_step', step=step):
+            yield
+    finally:
+        elapsed = time.monotonic() - start
+        logger.debug("git step '%s' took %.3fs", step, elapsed)
+        if timings is not None:
+            timings[step] = timings.get(step, 0) + elapsed
+
+
+def _resolve_commit(target_dir, git_reference, in_head=False):
+    """
+    Get SHA-1 of git_reference, None if it's not in the repo
+
+    :param in_head: bool, require the commit to be reachable from HEAD
+    """
+    cmd = ['git', 'rev-parse', '--verify', '--quiet', git_reference + '^{commit}']
+    try:
+        commit_id = subprocess.check_output(cmd, cwd=target_dir,
+                                            universal_newlines=True).strip()
+    except subprocess.CalledProcessError:
+        return None
+    if in_head:
+        cmd = ['git', 'merge-base', '--is-ancestor', commit_id, 'HEAD']
+        if subprocess.call(cmd, cwd=target_dir) != 0:
+            return None
+    return commit_id
+
+
+def _deepen_to_commit(target_dir, git_reference, depth, timings=None):
+    """
+    Fetch history of a shallow clone until it contains git_reference
+
+    When git_reference is a SHA-1, the commit alone is fetched first, to get its
+    date, and history since that date is fetched with a single 'git fetch
+    --shallow-since'. If that's not enough, e.g. the server doesn't allow
+    fetching commits by SHA-1 or commit dates aren't monotonic, depth is doubled
+    up to GIT_FETCH_RETRY times.
+
+    :return: str, SHA-1 of git_reference, None if not found in the branch
+    """
+    if COMMIT_ID_RE.match(git_reference):
+        try:
+            with _timed('fetch_commit', timings):
+                cmd = ['git', 'fetch', '--depth', '1', 'origin', git_reference]
+                subprocess.check_output(cmd, cwd=target_dir, stderr=subprocess.STDOUT)
+            cmd = ['git', 'show', '-s', '--format=%cI', git_reference]
+            commit_date = subprocess.check_output(cmd, cwd=target_dir,
+                                                  universal_newlines=True).strip()
+            with _timed('fetch_shallow_since', timings):
+                cmd = ['git', 'fetch', '--shallow-since', commit_date]
+                logger.debug("Fetching history up to commit %s with '%s'", git_reference, cmd)
+                subprocess.check_output(cmd, cwd=target_dir, stderr=subprocess.STDOUT)
+        except subprocess.CalledProcessError as exc:
+            logger.debug("Couldn't fetch history up to commit %s: %s", git_reference,
+                         exc.output)
+        else:
+            commit_id = _resolve_commit(target_dir, git_reference, in_head=True)
+            if commit_id:
+                return commit_id
+
+    deepen = depth
+    for _ in range(GIT_FETCH_RETRY):
+        deepen *= 2
+        cmd = ["git", "fetch", "--depth", str(deepen)]
+        logger.debug("Couldn't find commit %s, increasing depth with '%s'", git_reference,
+                     cmd)
+        with _timed('fetch_deepen', timings):
+            subprocess.check_call(cmd, cwd=target_dir)
+        # commit fetched by SHA-1 above may not be in the branch
+        commit_id = _resolve_commit(target_dir, git_reference, in_head=True)
+        if commit_id:
+            return commit_id
+    return None
+
+
+@metrics.instrumented('git_reset')
+def reset_git_repo(target_dir, git_reference, retry_depth=None, timings=None):
     """
     hard reset git clone in target_dir to given git_reference
     :param target_dir: str, filesystem path where the repo is cloned
     :param git_reference: str, any valid git reference
     :param retry_depth: int, if the repo was cloned with --shallow, this is the expected
                         depth of the commit
+    :param timings: dict, optional, seconds spent in each step are added to it
     :return: str and int, commit ID of HEAD and commit depth of git_reference
     """
-    deepen = retry_depth or 0
-    base_commit_depth = 0
-    cmd = ["git", "status"]
+    cmd = ["git", "status", "--porcelain"]
     logger.debug("Checking if the repo is modified locally: '%s'", cmd)
-    output = subprocess.check_output(cmd, cwd=target_dir, stderr=subprocess.STDOUT)
-    if "nothing to commit" not in str(output):
+    with _timed('status', timings):
+        output = subprocess.check_output(cmd, cwd=target_dir, stderr=subprocess.STDOUT)
+    if output.strip():
         raise OsbsLocallyModified("'{}' source is locally modified: '{}'".format(target_dir,
                                                                                  output))
-    for _ in range(GIT_FETCH_RETRY):
-        try:
-            if not deepen:
-                cmd = ['git', 'rev-list', '--count', git_reference]
-                base_commit_depth = int(subprocess.check_output(cmd, cwd=target_dir)) - 1
-            cmd = ["git", "reset", "--hard", git_reference]
-            logger.debug("Resetting current HEAD: '%s'", cmd)
-            subprocess.check_call(cmd, cwd=target_dir)
-            break
-        except subprocess.CalledProcessError:
-            if not deepen:
-                raise OsbsCommitNotFound('cannot find commit {} in repo {}'.format(
-                                         git_reference, target_dir))
-            deepen *= 2
-            cmd = ["git", "fetch", "--depth", str(deepen)]
-            subprocess.check_call(cmd, cwd=target_dir)
-            logger.debug("Couldn't find commit %s, increasing depth with '%s'", git_reference,
-                         cmd)
-    else:
-        raise OsbsCommitNotFound('cannot find commit {} in repo {}'.format(
-                                  git_reference, target_dir))
 
     logger.debug("getting SHA-1 of provided ref '%s'", git_reference)
-    commit_id = get_commit_id(target_dir)
+    with _timed('resolve', timings):
+        commit_id = _resolve_commit(target_dir, git_reference)
+    if not commit_id and retry_depth:
+        commit_id = _deepen_to_commit(target_dir, git_reference, retry_depth, timings)
+    if not commit_id:
+        raise OsbsCommitNotFound('cannot find commit {} in repo {}'.format(
+                                  git_reference, target_dir))
     logger.info("commit ID = %s", commit_id)
 
-    final_commit_depth = None
-    if not deepen:
-        cmd = ['git', 'rev-list', '--count', 'HEAD']
-        final_commit_depth = int(subprocess.check_output(cmd, cwd=target_dir)) - base_commit_depth
+    cmd = ["git", "reset", "--hard", commit_id]
+    logger.debug("Resetting current HEAD: '%s'", cmd)
+    with _timed('reset', timings):
+        subprocess.check_call(cmd, cwd=target_dir)
 
+    # without a shallow clone, the depth is counted from git_reference itself
+    final_commit_depth = None if retry_depth else 1
     return commit_id, final_commit_depth
 
 
@@ -206,17 +300,38 @@ def get_commit_id(repo_dir: str) -> str:
     return commit_id
 
 
-def get_repo_info(git_uri, git_ref, git_branch=None, depth=None):
-    with checkout_git_repo(git_uri, commit=git_ref, branch=git_branch,
-                           depth=depth) as code_dir_info:
+def get_repo_info(git_uri, git_ref, git_branch=None, depth=None, git_cache=None,
+                  repo_info_cache=None):
+    """
+    Clone the repo and read its Dockerfile and configuration
+
+    :param repo_info_cache: RepoInfoCache, optional, used when git_ref is a SHA-1,
+                            so the repo is cloned only once for each commit
+    """
+    # imported here, it's not needed for most uses of osbs.utils
+    from dockerfile_parse import DockerfileParser
+
+    if repo_info_cache and COMMIT_ID_RE.match(git_ref):
+        repo_info = repo_info_cache.get(git_uri, git_ref, git_branch=git_branch, depth=depth)
+        if repo_info:
+            logger.info("using cached repo info of '%s' at %s", git_uri, git_ref)
+            return repo_info
+    else:
+        repo_info_cache = None
+
+    # all files needed for RepoInfo are in the top-level directory
+    with checkout_git_repo(git_uri, commit=git_ref, branch=git_branch, depth=depth,
+                           git_cache=git_cache, metadata_only=True) as code_dir_info:
         code_dir = code_dir_info.repo_path
-        depth = code_dir_info.commit_depth
+        commit_depth = code_dir_info.commit_depth
         dfp = DockerfileParser(os.path.join(code_dir), cache_content=True)
         config = RepoConfiguration(git_uri=git_uri, git_ref=git_ref, git_branch=git_branch,
-                                   dir_path=code_dir, depth=depth)
+                                   dir_path=code_dir, depth=commit_depth)
         tags_config = AdditionalTagsConfig(dir_path=code_dir,
                                            tags=config.container.get('tags', set()))
     repo_info = RepoInfo(dfp, config, tags_config)
+    if repo_info_cache:
+        repo_info_cache.put(git_uri, git_ref, repo_info, git_branch=git_branch, depth=depth)
     return repo_info
 
 
@@ -349,23 +464,39 @@ def user_warning_log_handler(self, message):
 
 class RetryFunc(object):
     def __init__(self, exception_type, should_retry_cb=None,
-                 retry_times=OS_CONFLICT_MAX_RETRIES, retry_delay=OS_CONFLICT_WAIT):
+                 retry_times=OS_CONFLICT_MAX_RETRIES, retry_delay=OS_CONFLICT_WAIT,
+                 max_delay=OS_CONFLICT_MAX_WAIT, deadline=OS_CONFLICT_DEADLINE, jitter=True):
+        """
+        :param exception_type: exception class to retry on
+        :param should_retry_cb: callable, decides whether to retry on the exception
+        :param retry_times: int, number of retries
+        :param retry_delay: float, delay before the first retry in seconds
+        :param max_delay: float, maximal delay between retries in seconds
+        :param deadline: float, time budget for all retries of a call in seconds, or None
+        :param jitter: bool, randomize delays, see Backoff
+        """
         self.exception_type = exception_type
         self.should_retry_cb = should_retry_cb or (lambda ex: True)
 
         self.retry_times = retry_times
         self.retry_delay = retry_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.jitter = jitter
 
     def go(self, func, *args, **kwargs):
+        backoff = Backoff(self.retry_delay, max_delay=self.max_delay, deadline=self.deadline,
+                          jitter=self.jitter)
         for counter in range(self.retry_times + 1):
             try:
                 return func(*args, **kwargs)
             except self.exception_type as ex:
-                if self.should_retry_cb(ex) and counter != self.retry_times:
-                    logger.info("retrying on exception: %s", ex.message)
-                    logger.debug("attempt %d to call %s", counter + 1, func.__name__)
-                    time.sleep(self.retry_delay * (2 ** counter))
-                else:
+                if not self.should_retry_cb(ex) or counter == self.retry_times:
+                    raise
+                logger.info("retrying on exception: %s", ex.message)
+                logger.debug("attempt %d to call %s", counter + 1, func.__name__)
+                if not backoff.sleep():
+                    logger.info("deadline for retries of %s exceeded", func.__name__)
                     raise
 
 
@@ -0,0 +1,157 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import contextlib
+import fcntl
+import logging
+import os
+import re
+import shutil
+import subprocess
+from hashlib import sha256
+
+from osbs.constants import GIT_CACHE_MAX_SIZE_MB
+
+logger = logging.getLogger(__name__)
+
+COMMIT_ID_RE = re.compile(r'^[0-9a-f]{40}$')
+
+
+class GitMirrorCache(object):
+    """
+    Persistent cache of bare mirrors of git repositories, keyed by git URI
+
+    Each mirror is updated with 'git fetch' only when the requested commit
+    is not already in it, checkouts are local clones of the mirror, so repeat
+    checkouts of the same repo don't clone it over the network again.
+
+    Mirrors are locked with flock() while used, so the cache can be shared
+    by threads and processes. When the cache grows over max_size, least
+    recently used mirrors which aren't locked are removed.
+    """
+
+    def __init__(self, cache_dir, max_size=GIT_CACHE_MAX_SIZE_MB * 1024 * 1024):
+        """
+        :param cache_dir: str, directory with the mirrors, created if missing
+        :param max_size: int, maximum size of all mirrors in bytes
+        """
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def mirror_path(self, git_url):
+        return os.path.join(self.cache_dir,
+                            sha256(git_url.encode('utf-8')).hexdigest() + '.git')
+
+    @contextlib.contextmanager
+    def _lock(self, mirror_path, blocking=True):
+        """
+        Lock mirror_path, yield whether the lock was acquired
+        """
+        with open(mirror_path + '.lock', 'a') as lock_file:
+            flags = fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @staticmethod
+    def _has_commit(mirror_path, commit, branch=None):
+        """
+        Check whether commit (SHA-1) is in the mirror, and in branch if provided
+        """
+        if not commit or not COMMIT_ID_RE.match(commit):
+            return False
+        if branch:
+            cmd = ['git', 'merge-base', '--is-ancestor', commit, 'refs/heads/' + branch]
+        else:
+            cmd = ['git', 'cat-file', '-e', commit + '^{commit}']
+        return subprocess.call(cmd, cwd=mirror_path, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL) == 0
+
+    def _update(self, git_url, mirror_path, commit=None, branch=None):
+        if not os.path.isdir(mirror_path):
+            cmd = ['git', 'clone', '--mirror', git_url, mirror_path]
+            logger.info("creating mirror of git repo '%s'", git_url)
+        elif self._has_commit(mirror_path, commit, branch):
+            logger.debug("commit %s of '%s' found in mirror", commit, git_url)
+            return
+        else:
+            cmd = ['git', '-C', mirror_path, 'fetch', '--prune', 'origin']
+            logger.info("updating mirror of git repo '%s'", git_url)
+
+        logger.debug("running '%s'", cmd)
+        subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+
+    def clone(self, git_url, target_dir, commit=None, branch=None, sparse=False):
+        """
+        Update the mirror of git_url and clone it to target_dir
+
+        :param git_url: str, git repo to clone
+        :param target_dir: str, filesystem path where the repo should be cloned
+        :param commit: str, commit which has to be in the clone, SHA-1 or ref
+        :param branch: str, optional branch to clone
+        :param sparse: bool, check out only files in the top-level directory
+        """
+        mirror_path = self.mirror_path(git_url)
+        with self._lock(mirror_path):
+            self._update(git_url, mirror_path, commit, branch)
+            # mark as recently used
+            os.utime(mirror_path)
+
+            # a local clone hardlinks objects, so it doesn't depend on the mirror
+            # once cloned, and the mirror may be evicted while the clone is used
+            cmd = ['git', 'clone']
+            if branch:
+                cmd += ['-b', branch, '--single-branch']
+            if sparse:
+                cmd += ['--sparse']
+            cmd += [mirror_path, target_dir]
+            logger.debug("cloning '%s'", cmd)
+            subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+            subprocess.check_call(['git', 'remote', 'set-url', 'origin', git_url],
+                                  cwd=target_dir)
+
+        self.evict()
+
+    @staticmethod
+    def _size(path):
+        size = 0
+        for dirpath, _, filenames in os.walk(path):
+            for filename in filenames:
+                try:
+                    size += os.lstat(os.path.join(dirpath, filename)).st_size
+                except OSError:
+                    pass
+        return size
+
+    def evict(self):
+        """
+        Remove least recently used mirrors until the cache fits into max_size
+        """
+        mirrors = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith('.git') and os.path.isdir(path):
+                mirrors.append((os.stat(path).st_mtime, path, self._size(path)))
+
+        total_size = sum(size for _, _, size in mirrors)
+        for _, path, size in sorted(mirrors):
+            if total_size <= self.max_size:
+                break
+            with self._lock(path, blocking=False) as locked:
+                if not locked:
+                    logger.debug("mirror '%s' is in use, not removing it", path)
+                    continue
+                logger.info("removing git mirror '%s' from cache", path)
+                shutil.rmtree(path)
+            total_size -= size
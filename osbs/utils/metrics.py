@@ -0,0 +1,292 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+
+timing spans and counters of http requests, git, yaml, templates and watches
+
+Instrumented code reports spans (how long an operation took) and counters
+(retries, bytes, reconnects, ...) here; they're passed to all registered
+sinks. Without sinks, which is the default, spans and counters return right
+away, so instrumentation costs a function call.
+
+    from osbs.utils import metrics
+
+    sink = metrics.PrometheusFileSink('/var/lib/node_exporter/osbs.prom')
+    metrics.add_sink(sink)
+    ...
+    sink.flush()
+"""
+import contextlib
+import functools
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+SPAN = 'span'
+COUNT = 'count'
+
+# upper bounds of histogram buckets of spans in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+# kind is SPAN or COUNT, value is seconds of spans or increment of counters,
+# error tells whether the operation of the span raised an exception
+MetricEvent = namedtuple('MetricEvent', ['kind', 'name', 'value', 'labels', 'error'])
+
+# registered sinks, replaced as a whole, so it can be read without locking
+_sinks = ()
+_sinks_lock = threading.Lock()
+
+_NULL_SPAN = contextlib.nullcontext()
+
+
+def add_sink(sink):
+    global _sinks
+    with _sinks_lock:
+        if sink not in _sinks:
+            _sinks = _sinks + (sink,)
+
+
+def remove_sink(sink):
+    global _sinks
+    with _sinks_lock:
+        _sinks = tuple(s for s in _sinks if s is not sink)
+
+
+def get_sinks():
+    return _sinks
+
+
+def enabled():
+    """
+    :return: bool, whether any sink is registered, use it to skip computing
+             values of counters when nobody listens
+    """
+    return bool(_sinks)
+
+
+def _emit(method, *args):
+    for sink in _sinks:
+        try:
+            getattr(sink, method)(*args)
+        except Exception:  # pylint: disable=broad-except
+            logger.warning("metrics sink %r failed", sink, exc_info=True)
+
+
+class _Span(object):
+    __slots__ = ('name', 'labels', '_start')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self._start = None
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _emit('record_span', self.name, time.perf_counter() - self._start, self.labels,
+              exc_type is not None)
+
+
+def span(name, **labels):
+    """
+    Context manager timing the operation inside it
+
+    :param name: str, name of the operation, e.g. 'http_request'
+    :param labels: str values describing the operation, e.g. method='get'
+    """
+    if not _sinks:
+        return _NULL_SPAN
+    return _Span(name, labels)
+
+
+def count(name, value=1, **labels):
+    """
+    Increment a counter
+
+    :param name: str, name of the counter, e.g. 'http_retries'
+    :param value: number to add
+    :param labels: str values describing the counted events
+    """
+    if not _sinks:
+        return
+    _emit('record_count', name, value, labels)
+
+
+def instrumented(name):
+    """
+    Decorator timing each call of the function as a span
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _sinks:
+                return func(*args, **kwargs)
+            with _Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class MetricsSink(object):
+    """
+    Base class of sinks, they may be called from many threads at the same time
+    """
+
+    def record_span(self, name, seconds, labels, error):
+        pass
+
+    def record_count(self, name, value, labels):
+        pass
+
+    def flush(self):
+        pass
+
+
+class LoggingSink(MetricsSink):
+    """
+    Log each span and counter
+    """
+
+    def __init__(self, log=None, level=logging.DEBUG):
+        self.log = log or logger
+        self.level = level
+
+    def record_span(self, name, seconds, labels, error):
+        self.log.log(self.level, "span %s %s took %.6fs%s", name, labels, seconds,
+                     ' (failed)' if error else '')
+
+    def record_count(self, name, value, labels):
+        self.log.log(self.level, "count %s %s +%s", name, labels, value)
+
+
+class CallbackSink(MetricsSink):
+    """
+    Pass each span and counter to a callable as MetricEvent
+    """
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def record_span(self, name, seconds, labels, error):
+        self.callback(MetricEvent(SPAN, name, seconds, labels, error))
+
+    def record_count(self, name, value, labels):
+        self.callback(MetricEvent(COUNT, name, value, labels, False))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, str(value).replace('\\', '\\\\').replace('"', '\\"')
+                         .replace('\n', '\\n'))
+        for key, value in sorted(labels)
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+class PrometheusFileSink(MetricsSink):
+    """
+    Aggregate spans into histograms and counters into totals, and write them
+    to a file in the Prometheus text exposition format, e.g. for the textfile
+    collector of node_exporter
+
+    Spans named <name> become histogram <prefix>_<name>_seconds and counter
+    <prefix>_<name>_errors_total, counters named <name> become <prefix>_<name>_total.
+    The file is replaced atomically by flush(), which is also called on new
+    events once interval seconds passed since the last write.
+    """
+
+    def __init__(self, path, prefix='osbs', buckets=DEFAULT_BUCKETS, interval=None):
+        """
+        :param path: str, path of the file
+        :param prefix: str, prefix of metric names
+        :param buckets: sorted upper bounds of histogram buckets in seconds
+        :param interval: float, write the file at most every interval seconds as events
+                         come, None to write it only on flush()
+        """
+        self.path = path
+        self.prefix = prefix
+        self.buckets = tuple(buckets)
+        self.interval = interval
+        # {name: {labels: [bucket counts..., count, sum]}}
+        self._histograms = {}
+        # {name: {labels: total}}
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._written = time.monotonic()
+
+    def record_span(self, name, seconds, labels, error):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            values = series.get(key)
+            if values is None:
+                values = series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    values[i] += 1
+            values[-2] += 1
+            values[-1] += seconds
+            if error:
+                errors = self._counters.setdefault(name + '_errors', {})
+                errors[key] = errors.get(key, 0) + 1
+        self._maybe_flush()
+
+    def record_count(self, name, value, labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+        self._maybe_flush()
+
+    def _maybe_flush(self):
+        if self.interval is not None and time.monotonic() - self._written >= self.interval:
+            self.flush()
+
+    def render(self):
+        """
+        :return: str, metrics in the Prometheus text exposition format
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                metric = '{}_{}_seconds'.format(self.prefix, name)
+                lines.append('# TYPE {} histogram'.format(metric))
+                for key, values in sorted(series.items()):
+                    for bound, bucket_count in zip(self.buckets + ('+Inf',),
+                                                   values[:len(self.buckets)] + [values[-2]]):
+                        lines.append('{}_bucket{} {}'.format(
+                            metric, _format_labels(key + (('le', bound),)), bucket_count))
+                    lines.append('{}_sum{} {}'.format(metric, _format_labels(key), values[-1]))
+                    lines.append('{}_count{} {}'.format(metric, _format_labels(key), values[-2]))
+            for name, series in sorted(self._counters.items()):
+                metric = '{}_{}_total'.format(self.prefix, name)
+                lines.append('# TYPE {} counter'.format(metric))
+                for key, total in sorted(series.items()):
+                    lines.append('{}{} {}'.format(metric, _format_labels(key), total))
+        return ''.join(line + '\n' for line in lines)
+
+    def flush(self):
+        content = self.render()
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(content)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        self._written = time.monotonic()
@@ -0,0 +1,82 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import logging
+import math
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter(object):
+    """
+    Thread-safe token bucket limiting the rate of requests
+
+    The bucket holds up to burst tokens and is refilled with qps tokens per
+    second; each request takes one token. When the bucket is empty, the token
+    is reserved ahead and the request waits until it becomes available, so
+    waiting requests are served in the order they came.
+    """
+
+    def __init__(self, qps, burst=None):
+        """
+        :param qps: float, sustained number of requests per second
+        :param burst: int, number of requests allowed at once, qps rounded up by default
+        """
+        if qps <= 0:
+            raise ValueError('qps must be positive, got {}'.format(qps))
+        self.qps = qps
+        self.burst = max(1, burst or int(math.ceil(qps)))
+        self._tokens = float(self.burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.requests = 0
+        self.throttled = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.qps)
+            self._last = now
+            self._tokens -= 1
+            wait = max(0.0, -self._tokens / self.qps)
+
+            self.requests += 1
+            if wait:
+                self.throttled += 1
+                self.wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+            return wait
+
+    def acquire(self):
+        """
+        Wait until a request may be sent
+
+        :return: float, seconds waited
+        """
+        wait = self._reserve()
+        if wait:
+            logger.debug("throttling request for %.3f seconds", wait)
+            time.sleep(wait)
+        return wait
+
+    def get_stats(self):
+        """
+        :return: dict, number of requests, number of throttled requests, total
+                 and maximal seconds requests waited
+        """
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'wait_seconds': self.wait_seconds,
+                'max_wait_seconds': self.max_wait_seconds,
+            }
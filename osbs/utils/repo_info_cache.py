@@ -0,0 +1,210 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from hashlib import sha256
+
+from osbs.constants import REPO_INFO_CACHE_MAX_ENTRIES, REPO_INFO_CACHE_TTL
+from osbs.repo_utils import AdditionalTagsConfig, RepoConfiguration, RepoInfo
+
+logger = logging.getLogger(__name__)
+
+
+class _ParsedDockerfile(object):
+    """
+    Labels and base image of a Dockerfile, used in place of DockerfileParser
+    by cached RepoInfo objects
+    """
+
+    def __init__(self, labels, baseimage, dockerfile_path):
+        self.labels = labels
+        self.baseimage = baseimage
+        self.dockerfile_path = dockerfile_path
+
+
+def _dump_repo_info(repo_info):
+    """
+    :return: str, JSON with everything RepoInfo provides, None if it can't be cached
+    """
+    dockerfile = None
+    df_parser = repo_info.dockerfile_parser
+    if df_parser is not None:
+        try:
+            dockerfile = {'labels': df_parser.labels, 'baseimage': df_parser.baseimage,
+                          'path': df_parser.dockerfile_path}
+        except IOError:
+            # the error is reported when labels of the RepoInfo are used
+            return None
+    config = repo_info.configuration
+    data = {
+        'git_uri': config.git_uri,
+        'git_ref': config.git_ref,
+        'git_branch': config.git_branch,
+        'depth': config.depth,
+        'container': config.container,
+        'dockerfile': dockerfile,
+        'additional_tags': sorted(repo_info.additional_tags.tags),
+        'tags_from_container_yaml': repo_info.additional_tags.from_container_yaml,
+    }
+    try:
+        return json.dumps(data)
+    except (TypeError, ValueError) as exc:
+        logger.warning("can't cache repo info of '%s': %s", config.git_uri, exc)
+        return None
+
+
+def _load_repo_info(text):
+    """
+    :return: RepoInfo, created from JSON produced by _dump_repo_info
+    """
+    data = json.loads(text)
+    config = RepoConfiguration(git_uri=data['git_uri'], git_ref=data['git_ref'],
+                               git_branch=data['git_branch'], depth=data['depth'],
+                               container=data['container'])
+    dockerfile = data['dockerfile']
+    df_parser = None
+    if dockerfile is not None:
+        df_parser = _ParsedDockerfile(dockerfile['labels'], dockerfile['baseimage'],
+                                      dockerfile['path'])
+    additional_tags = AdditionalTagsConfig.from_tags(data['additional_tags'],
+                                                     data['tags_from_container_yaml'])
+    return RepoInfo(df_parser, config, additional_tags)
+
+
+class RepoInfoCache(object):
+    """
+    Cache of RepoInfo objects, keyed by git URI and commit SHA-1
+
+    RepoInfo is a pure function of the repository tree at a commit (and of the
+    requested branch and depth, which are part of the key), so a cached RepoInfo
+    can be used instead of cloning the repo again.
+
+    Entries are kept in memory and, if cache_dir is provided, stored on disk as
+    JSON, so they can be shared by processes. Both tiers keep at most max_entries
+    entries, entries older than ttl seconds are not used.
+
+    Note that warnings logged while parsing the repo configuration, e.g. about
+    deprecated options, are logged only when the entry is created.
+    """
+
+    def __init__(self, cache_dir=None, max_entries=REPO_INFO_CACHE_MAX_ENTRIES,
+                 ttl=REPO_INFO_CACHE_TTL):
+        """
+        :param cache_dir: str, directory for the on-disk tier, None to keep
+                          entries only in memory
+        :param max_entries: int, maximum number of entries in each tier
+        :param ttl: int, seconds for which an entry is valid
+        """
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def _key(git_uri, commit_id, git_branch, depth):
+        key = json.dumps([git_uri, commit_id, git_branch, depth])
+        return sha256(key.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def get(self, git_uri, commit_id, git_branch=None, depth=None):
+        """
+        :return: new RepoInfo created from the cached entry, None if not cached
+        """
+        key = self._key(git_uri, commit_id, git_branch, depth)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and now - entry[0] < self.ttl:
+                self._entries.move_to_end(key)
+                return _load_repo_info(entry[1])
+            self._entries.pop(key, None)
+
+        if not self.cache_dir:
+            return None
+        created, text, repo_info = self._load(key, now)
+        if repo_info is None:
+            return None
+        self._remember(key, created, text)
+        return repo_info
+
+    def put(self, git_uri, commit_id, repo_info, git_branch=None, depth=None):
+        key = self._key(git_uri, commit_id, git_branch, depth)
+        text = _dump_repo_info(repo_info)
+        if text is None:
+            return
+        self._remember(key, time.time(), text)
+        if self.cache_dir:
+            self._store(key, text)
+
+    def _remember(self, key, created, text):
+        with self._lock:
+            self._entries[key] = (created, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _load(self, key, now):
+        path = self._path(key)
+        try:
+            created = os.stat(path).st_mtime
+            if now - created >= self.ttl:
+                os.unlink(path)
+                return None, None, None
+            with open(path) as f:
+                text = f.read()
+            return created, text, _load_repo_info(text)
+        except FileNotFoundError:
+            return None, None, None
+        except Exception as exc:
+            logger.warning("removing unreadable repo info cache entry %s: %s", path, exc)
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None, None, None
+
+    def _store(self, key, text):
+        # write to a temporary file first, other processes may read the entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as f:
+                f.write(text)
+            os.replace(tmp_path, self._path(key))
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith('.json'):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                entries.append((os.stat(path).st_mtime, path))
+            except FileNotFoundError:
+                continue
+
+        entries.sort()
+        for _, path in entries[:max(0, len(entries) - self.max_entries)]:
+            logger.debug("removing repo info cache entry %s", path)
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,178 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+
+backoff and circuit breaking shared by http requests, openshift conflicts and git clones
+"""
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def decorrelated_jitter(base_delay, previous_delay, max_delay=None):
+    """
+    Delay before the next retry, chosen randomly between base_delay and three
+    times the previous delay (or base_delay for the first retry), so that
+    clients which failed at the same time don't retry at the same time
+
+    :param base_delay: float, minimal delay in seconds
+    :param previous_delay: float, delay before the previous retry, 0 for the first retry
+    :param max_delay: float, optional maximal delay in seconds
+    :return: float, seconds
+    """
+    delay = random.uniform(base_delay, max(base_delay, previous_delay) * 3)
+    if max_delay is not None:
+        delay = min(delay, max_delay)
+    return delay
+
+
+class Backoff(object):
+    """
+    Delays between retries of a single call
+
+    With jitter, delays are decorrelated (see decorrelated_jitter), otherwise
+    they grow exponentially from base_delay. Delays are capped by max_delay
+    and, if deadline is provided, retrying stops once the next retry would
+    start after deadline seconds since the Backoff was created.
+    """
+
+    def __init__(self, base_delay, max_delay=None, deadline=None, jitter=True):
+        """
+        :param base_delay: float, delay before the first retry in seconds
+        :param max_delay: float, optional maximal delay in seconds
+        :param deadline: float, optional time budget for all retries of the call in seconds
+        :param jitter: bool, randomize delays
+        """
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.attempts = 0
+        self._delay = 0
+        self._deadline = None if deadline is None else time.monotonic() + deadline
+
+    def remaining(self):
+        """
+        :return: float, seconds left until the deadline, None without deadline
+        """
+        if self._deadline is None:
+            return None
+        return self._deadline - time.monotonic()
+
+    def next_delay(self):
+        """
+        :return: float, seconds to wait before the next retry, None if the
+                 deadline doesn't allow another retry
+        """
+        if self.jitter:
+            delay = decorrelated_jitter(self.base_delay, self._delay, self.max_delay)
+        else:
+            delay = self.base_delay * (2 ** self.attempts)
+            if self.max_delay is not None:
+                delay = min(delay, self.max_delay)
+
+        remaining = self.remaining()
+        if remaining is not None and delay >= remaining:
+            return None
+
+        self.attempts += 1
+        self._delay = delay
+        return delay
+
+    def sleep(self):
+        """
+        Wait before the next retry
+
+        :return: bool, False if the deadline doesn't allow another retry
+        """
+        delay = self.next_delay()
+        if delay is None:
+            return False
+        logger.debug("waiting %.1f seconds before retry %d", delay, self.attempts)
+        time.sleep(delay)
+        return True
+
+
+class CircuitBreaker(object):
+    """
+    Thread-safe circuit breaker
+
+    After failure_threshold consecutive failures, the circuit opens and calls
+    should be rejected without contacting the failing service. After
+    reset_timeout seconds, a single trial call is allowed: its success closes
+    the circuit, its failure opens it again.
+
+    Callers report the outcome of each allowed call by record_success or
+    record_failure.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        """
+        :param failure_threshold: int, consecutive failures opening the circuit,
+                                  0 to never open it
+        :param reset_timeout: float, seconds after which a trial call is allowed
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._state = self.CLOSED
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def allow_request(self):
+        """
+        :return: bool, whether the call may proceed
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+            now = time.monotonic()
+            if now - self._opened_at >= self.reset_timeout:
+                # let a single call through to find out if the service recovered,
+                # another one is let through if it doesn't report its result in time
+                self._state = self.HALF_OPEN
+                self._opened_at = now
+                return True
+            return False
+
+    def retry_after(self):
+        """
+        :return: float, seconds until a trial call is allowed, 0 when calls are allowed
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return 0
+            return max(self._opened_at + self.reset_timeout - time.monotonic(), 0)
+
+    def record_success(self):
+        with self._lock:
+            if self._state != self.CLOSED:
+                logger.info("circuit breaker closed")
+            self._state = self.CLOSED
+            self.failures = 0
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._state == self.HALF_OPEN or (
+                    self._state == self.CLOSED and
+                    0 < self.failure_threshold <= self.failures):
+                logger.warning("circuit breaker opened after %d consecutive failures",
+                               self.failures)
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
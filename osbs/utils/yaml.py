@@ -9,18 +9,31 @@ of the BSD license. See the LICENSE file for details.
 
 from __future__ import absolute_import, unicode_literals
 
-from pkg_resources import resource_stream
 from osbs.exceptions import OsbsValidationException
+from osbs.utils import metrics
 
 import codecs
+import functools
+import importlib
 import json
-import jsonschema
 import logging
-import yaml
+import os
+import threading
+from collections import OrderedDict
+
+# jsonschema, yaml and importlib.resources are imported only when needed,
+# importing them noticeably slows down startup of the CLI
 
 
 logger = logging.getLogger(__name__)
 
+# Number of validators of schemas passed to validate_with_schema kept in memory
+SCHEMA_VALIDATORS_MAX = 32
+
+# {id(schema): (schema, validator)}, the schema is referenced, so its id isn't reused
+_schema_validators = OrderedDict()
+_schema_validators_lock = threading.Lock()
+
 
 def read_yaml_from_file_path(file_path, schema, package=None):
     """
@@ -39,13 +52,46 @@ def read_yaml(yaml_data, schema, package=None):
     :param schema: string, file path to the JSON schema
     :package: string, package name containing the schema
     """
-    data = yaml.safe_load(yaml_data)
-    package = package or 'osbs'
-    schema = load_schema(package, schema)
-    validate_with_schema(data, schema)
+    import yaml
+
+    if metrics.enabled() and isinstance(yaml_data, (str, bytes)):
+        metrics.count('yaml_bytes', len(yaml_data), schema=schema)
+    with metrics.span('read_yaml', schema=schema):
+        data = yaml.safe_load(yaml_data)
+        package = package or 'osbs'
+        validator = get_schema_validator(package, schema)
+        _validate(validator, data)
     return data
 
 
+@functools.lru_cache(maxsize=None)
+def get_schema_validator(package, schema):
+    """
+    Load and check the schema, memoized, so it's done once per process
+
+    :package: string, package name containing the schema
+    :param schema: string, file path to the JSON schema
+    :return: jsonschema.Draft4Validator
+    """
+    import jsonschema
+
+    schema = load_schema(package, schema)
+    _check_schema(schema)
+    return jsonschema.Draft4Validator(schema=schema)
+
+
+def _open_resource(package, resource):
+    """
+    Open resource file of package for reading in binary mode
+    """
+    module = importlib.import_module(package)
+    try:
+        from importlib.resources import files
+    except ImportError:  # Python < 3.9
+        return open(os.path.join(os.path.dirname(module.__file__), resource), 'rb')
+    return files(module).joinpath(resource).open('rb')
+
+
 def load_schema(package, schema):
     """
     :package: string, package name containing the schema
@@ -53,7 +99,7 @@ def load_schema(package, schema):
     """
     # Read schema from file
     try:
-        resource = resource_stream(package, schema)
+        resource = _open_resource(package, schema)
         schema = codecs.getreader('utf-8')(resource)
     except ImportError:
         logger.error('Unable to find package %s', package)
@@ -64,7 +110,8 @@ def load_schema(package, schema):
 
     # Load schema into Dict
     try:
-        schema = json.load(schema)
+        with schema:
+            schema = json.load(schema)
     except ValueError:
         logger.error('unable to decode JSON schema, cannot validate')
         raise
@@ -74,15 +121,52 @@ def load_schema(package, schema):
 def validate_with_schema(data, schema):
     """
     :param data: dict, data to be validated
-    :param schema: dict, schema to validate with
+    :param schema: dict, schema to validate with, it's checked once and its validator
+                   is reused while the same object is passed, so don't modify it
     """
+    _validate(_get_validator_for(schema), data)
+
+
+def _get_validator_for(schema):
+    """
+    Validator of the schema object, cached by its identity
+
+    :param schema: dict, JSON schema
+    :return: jsonschema.Draft4Validator
+    """
+    import jsonschema
+
+    key = id(schema)
+    with _schema_validators_lock:
+        cached = _schema_validators.get(key)
+        if cached is not None:
+            _schema_validators.move_to_end(key)
+            return cached[1]
+
+    _check_schema(schema)
     validator = jsonschema.Draft4Validator(schema=schema)
+    with _schema_validators_lock:
+        _schema_validators[key] = (schema, validator)
+        while len(_schema_validators) > SCHEMA_VALIDATORS_MAX:
+            _schema_validators.popitem(last=False)
+    return validator
+
+
+def _check_schema(schema):
+    import jsonschema
+
     try:
         jsonschema.Draft4Validator.check_schema(schema)
-        validator.validate(data)
     except jsonschema.SchemaError:
         logger.error('invalid schema, cannot validate')
         raise
+
+
+def _validate(validator, data):
+    import jsonschema
+
+    try:
+        validator.validate(data)
     except jsonschema.ValidationError as exc:
         logger.debug("schema validation error: %s", exc)
         exc_message = get_error_message(exc)
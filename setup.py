@@ -31,7 +31,8 @@ setup(
     license="BSD",
     packages=find_packages(exclude=["*.tests", "*.tests.*", "tests.*", "tests"]),
     entry_points={
-          'console_scripts': ['osbs=osbs.cli.main:main'],
+          'console_scripts': ['osbs=osbs.cli.main:main',
+                              'osbs-loadtest=osbs.cli.loadtest:main'],
     },
     install_requires=_get_requirements('requirements.txt'),
     package_data={'osbs': ['schemas/*.json']},
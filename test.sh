@@ -74,7 +74,11 @@ function setup_osbs() {
 case ${ACTION} in
 "test")
   setup_osbs
-  TEST_CMD="coverage run --source=osbs -m pytest tests -ra --color=auto --html=__pytest_reports/osbs-unit-tests.html --self-contained-html"
+  TEST_CMD="coverage run --source=osbs -m pytest tests -ra --color=auto --benchmark-skip --html=__pytest_reports/osbs-unit-tests.html --self-contained-html"
+  ;;
+"benchmark")
+  setup_osbs
+  TEST_CMD="${PYTHON} -m pytest tests/benchmarks --benchmark-only --benchmark-autosave"
   ;;
 "pylint")
   setup_osbs
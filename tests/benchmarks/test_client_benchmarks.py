@@ -0,0 +1,263 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+
+Benchmarks of client hot paths, requires pytest-benchmark
+
+Run and store results of the current commit:
+
+    pytest tests/benchmarks --benchmark-only --benchmark-autosave
+
+and compare them with the results stored for earlier commits:
+
+    pytest-benchmark compare
+    pytest tests/benchmarks --benchmark-only --benchmark-compare --benchmark-compare-fail=mean:10%
+"""
+import itertools
+import json
+from textwrap import dedent
+
+import pytest
+import responses
+from flexmock import flexmock
+
+from osbs.api import _load_pipeline_from_template
+from osbs.build.user_params import BuildUserParams, load_user_params_from_json
+from osbs.conf import Configuration
+from osbs.osbs_http import HttpResponse
+from osbs.repo_utils import RepoConfiguration, RepoInfo
+from osbs.tekton import API_VERSION, Openshift, PipelineRun, Pod
+from osbs.utils import metrics
+from osbs.utils.yaml import read_yaml
+from tests.constants import (TEST_GIT_URI, TEST_OCP_NAMESPACE, TEST_PIPELINE_RUN_TEMPLATE,
+                             TEST_USER)
+
+pytest.importorskip('pytest_benchmark')
+
+PIPELINE_RUN_NAME = 'benchmark-pipeline-run'
+POD_NAME = 'benchmark-pod'
+CONTAINER = 'step-build'
+API_URL = 'https://openshift.testing/'
+TEKTON_URL = f'{API_URL}apis/{API_VERSION}'
+PIPELINE_RUN_URL = f'{TEKTON_URL}/namespaces/{TEST_OCP_NAMESPACE}/pipelineruns/{PIPELINE_RUN_NAME}' # noqa E501
+PIPELINE_RUN_WATCH_URL = f'{TEKTON_URL}/watch/namespaces/{TEST_OCP_NAMESPACE}/pipelineruns/{PIPELINE_RUN_NAME}/' # noqa E501
+POD_URL = f'{API_URL}api/v1/namespaces/{TEST_OCP_NAMESPACE}/pods/{POD_NAME}'
+
+TASK_RUNS = 200
+WATCH_EVENTS = 500
+LOG_LINES = 10000
+
+CONTAINER_YAML = dedent("""\
+    platforms:
+      only: [x86_64, ppc64le, s390x, aarch64]
+      not: [armhfp]
+    compose:
+      packages: [pkg-a, pkg-b, pkg-c]
+      pulp_repos: true
+      signing_intent: release
+    image_build_method: imagebuilder
+    autorebuild:
+      from_latest: true
+      add_timestamp_to_release: true
+    tags: [latest, '{version}', '{version}-{release}']
+    remote_sources:
+    """) + ''.join(
+    f"  - name: source-{i}\n"
+    f"    remote_source:\n"
+    f"      repo: https://git.example.com/team/repo-{i}.git\n"
+    f"      ref: b55c00f45ec3dfee0c766cea3d395d6e21cc2e5a\n"
+    f"      pkg_managers: [gomod, npm]\n"
+    for i in range(50)
+)
+
+
+def make_task_run(i):
+    failed = i % 10 == 0
+    return {
+        'metadata': {
+            'name': f'{PIPELINE_RUN_NAME}-task-{i}',
+            'labels': {'tekton.dev/pipelineRun': PIPELINE_RUN_NAME,
+                       'tekton.dev/pipelineTask': f'task-{i}'},
+        },
+        'status': {
+            'podName': f'{PIPELINE_RUN_NAME}-task-{i}-pod',
+            'conditions': [{
+                'type': 'Succeeded',
+                'status': 'False' if failed else 'True',
+                'reason': 'Failed' if failed else 'Succeeded',
+                'message': f'task-{i} failed' if failed else 'All Steps have completed',
+            }],
+            'completionTime': '2022-01-01T00:10:00Z',
+            'steps': [{
+                'name': f'step-{j}',
+                'container': f'step-step-{j}',
+                'terminated': {
+                    'exitCode': 1 if failed and j == 2 else 0,
+                    'message': json.dumps([{'key': 'task_result',
+                                            'value': f'step-{j} of task-{i} failed'}]),
+                },
+            } for j in range(3)],
+            'taskResults': [{'name': f'result-{j}', 'value': 'x' * 100} for j in range(5)],
+        },
+    }
+
+
+def make_pipeline_run(task_runs=TASK_RUNS):
+    return {
+        'apiVersion': API_VERSION,
+        'kind': 'PipelineRun',
+        'metadata': {'name': PIPELINE_RUN_NAME, 'namespace': TEST_OCP_NAMESPACE,
+                     'resourceVersion': '1', 'labels': {'app': 'osbs'}},
+        'spec': {
+            'pipelineRef': {'name': 'binary-container'},
+            'params': [{'name': 'user-params', 'value': json.dumps({'key': 'v' * 10000})}],
+        },
+        'status': {
+            'conditions': [{'type': 'Succeeded', 'status': 'False', 'reason': 'Failed',
+                            'message': 'Tasks Completed: 200 (Failed: 20)'}],
+            'startTime': '2022-01-01T00:00:00Z',
+            'completionTime': '2022-01-01T00:10:00Z',
+            'childReferences': [{'kind': 'TaskRun', 'name': f'{PIPELINE_RUN_NAME}-task-{i}',
+                                 'pipelineTaskName': f'task-{i}'}
+                                for i in range(task_runs)],
+            'pipelineSpec': {
+                'tasks': [{'name': f'task-{i}', 'taskRef': {'name': 'build'},
+                           'params': [{'name': f'param-{j}', 'value': 'x' * 50}
+                                      for j in range(10)]}
+                          for i in range(task_runs)],
+            },
+        },
+    }
+
+
+@pytest.fixture
+def openshift():
+    return Openshift(openshift_api_url=API_URL,
+                     openshift_oauth_url=f'{API_URL}oauth/authorize',
+                     namespace=TEST_OCP_NAMESPACE)
+
+
+def test_response_json(benchmark):
+    content = json.dumps(make_pipeline_run()).encode('utf-8')
+    response = HttpResponse(200, {}, content)
+
+    pipeline_run = benchmark(response.json)
+    assert len(pipeline_run['status']['childReferences']) == TASK_RUNS
+
+
+@responses.activate
+def test_watch_resource(benchmark, openshift):
+    pipeline_run = make_pipeline_run(task_runs=10)
+    events = []
+    for i in range(WATCH_EVENTS):
+        obj = dict(pipeline_run, metadata=dict(pipeline_run['metadata'],
+                                               resourceVersion=str(i + 2)))
+        events.append(json.dumps({'type': 'MODIFIED', 'object': obj}))
+    responses.add(responses.GET, PIPELINE_RUN_URL, json=pipeline_run)
+    responses.add(responses.GET, PIPELINE_RUN_WATCH_URL, body='\n'.join(events) + '\n')
+
+    def watch():
+        # the baseline and all events of a single watch stream
+        objects = openshift.watch_resource('apis', API_VERSION, 'pipelineruns',
+                                           PIPELINE_RUN_NAME)
+        return list(itertools.islice(objects, WATCH_EVENTS + 1))
+
+    objects = benchmark(watch)
+    assert objects[-1]['metadata']['resourceVersion'] == str(WATCH_EVENTS + 1)
+
+
+@pytest.fixture
+def failed_pipeline_run(openshift):
+    pipeline_run = PipelineRun(openshift, PIPELINE_RUN_NAME)
+    task_runs = [make_task_run(i) for i in range(TASK_RUNS)]
+    flexmock(pipeline_run).should_receive('get_info').and_return(make_pipeline_run())
+    (flexmock(openshift)
+        .should_receive('list_resource')
+        .and_return({'items': task_runs, 'metadata': {}}))
+    return pipeline_run
+
+
+def test_get_error_message(benchmark, failed_pipeline_run):
+    message = benchmark(failed_pipeline_run.get_error_message)
+    assert message.count('Error in task-') == TASK_RUNS // 10
+
+
+def test_get_task_results(benchmark, failed_pipeline_run):
+    results = benchmark(failed_pipeline_run.get_task_results)
+    assert len(results) == TASK_RUNS
+
+
+@responses.activate
+def test_stream_logs(benchmark, openshift):
+    log = ''.join(f'2022-01-01T00:{i // 6000:02d}:{i // 100 % 60:02d}.{i % 100:02d}Z '
+                  f'line {i} of the build log\n'
+                  for i in range(LOG_LINES))
+    responses.add(responses.GET,
+                  f'{POD_URL}/log?follow=True&timestamps=true&container={CONTAINER}',
+                  body=log)
+    responses.add(responses.GET, POD_URL, json={
+        'metadata': {'name': POD_NAME},
+        'status': {'containerStatuses': [{'name': CONTAINER, 'state': {'terminated': {}}}]},
+    })
+    pod = Pod(openshift, POD_NAME, containers=[CONTAINER])
+
+    lines = benchmark(lambda: list(pod._stream_logs(CONTAINER)))
+    assert len(lines) == LOG_LINES
+
+
+def make_user_params():
+    return BuildUserParams.make_params(
+        base_image='base_image',
+        build_conf=Configuration(build_from='image:buildroot:latest'),
+        component='component',
+        koji_target='target',
+        name_label='name_label',
+        platforms=['x86_64', 'ppc64le', 's390x', 'aarch64'],
+        repo_info=RepoInfo(configuration=RepoConfiguration(git_uri=TEST_GIT_URI)),
+        user=TEST_USER,
+    )
+
+
+def test_make_user_params(benchmark):
+    user_params = benchmark(make_user_params)
+    assert user_params.git_uri == TEST_GIT_URI
+
+
+def test_user_params_to_json(benchmark):
+    user_params = make_user_params()
+    assert json.loads(benchmark(user_params.to_json))['git_uri'] == TEST_GIT_URI
+
+
+def test_load_user_params_from_json(benchmark):
+    user_params_json = make_user_params().to_json()
+    user_params = benchmark(load_user_params_from_json, user_params_json)
+    assert user_params.git_uri == TEST_GIT_URI
+
+
+def test_read_container_yaml(benchmark):
+    data = benchmark(read_yaml, CONTAINER_YAML, 'schemas/container.json')
+    assert len(data['remote_sources']) == 50
+
+
+def test_load_pipeline_from_template(benchmark):
+    substitutions = {
+        'osbs_pipeline_run_name': PIPELINE_RUN_NAME,
+        'osbs_namespace': TEST_OCP_NAMESPACE,
+        'osbs_user_params_json': make_user_params().to_json(),
+    }
+    pipeline_run = benchmark(_load_pipeline_from_template, TEST_PIPELINE_RUN_TEMPLATE,
+                             substitutions)
+    assert pipeline_run['metadata']['name'] == PIPELINE_RUN_NAME
+
+
+def test_disabled_metrics_span(benchmark):
+    def instrumented():
+        with metrics.span('operation', label='value'):
+            metrics.count('counter')
+
+    assert not metrics.enabled()
+    benchmark(instrumented)
@@ -0,0 +1,175 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import json
+import os
+import random
+import subprocess
+from textwrap import dedent
+
+import pytest
+from flexmock import flexmock
+
+from osbs.api import OSBS
+from osbs.cli import loadtest
+from osbs.cli.loadtest import (LatencyHistogram, LoadTest, arrival_offsets, main,
+                               WAIT_FINISH, WAIT_NONE)
+from osbs.conf import Configuration
+from osbs.utils import metrics
+from tests.constants import TEST_OCP_NAMESPACE, TEST_PIPELINE_RUN_TEMPLATE, TEST_USER
+from tests.mock_openshift import MockOpenShift
+
+GIT_BRANCH = 'main'
+
+
+@pytest.fixture
+def git_repo(tmpdir):
+    path = str(tmpdir.mkdir('repo'))
+    with open(os.path.join(path, 'Dockerfile'), 'w') as f:
+        f.write(dedent("""\
+            FROM fedora:latest
+            LABEL name=fedora/load-test com.redhat.component=load-test version=1.0
+            """))
+    env = dict(os.environ, GIT_AUTHOR_NAME='test', GIT_AUTHOR_EMAIL='test@example.com',
+               GIT_COMMITTER_NAME='test', GIT_COMMITTER_EMAIL='test@example.com')
+    for cmd in (['git', 'init', '-q', '-b', GIT_BRANCH],
+                ['git', 'add', 'Dockerfile'],
+                ['git', 'commit', '-q', '-m', 'Dockerfile']):
+        subprocess.check_call(cmd, cwd=path, env=env)
+    commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=path,
+                                     universal_newlines=True).strip()
+    return path, commit
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram(buckets=(1, 10))
+    assert histogram.as_dict()['p50'] is None
+
+    for seconds in (0.5, 2, 3, 20):
+        histogram.add(seconds)
+    result = histogram.as_dict()
+    assert result['count'] == 4
+    assert (result['min'], result['max'], result['mean']) == (0.5, 20, 6.375)
+    assert (result['p50'], result['p90'], result['p99']) == (2, 20, 20)
+    assert result['buckets'] == [{'le': 1, 'count': 1}, {'le': 10, 'count': 3},
+                                 {'le': '+Inf', 'count': 4}]
+
+
+def test_arrival_offsets():
+    assert arrival_offsets(3, 0) == [0, 0, 0]
+    assert arrival_offsets(3, 2) == [0, 0.5, 1]
+
+    offsets = arrival_offsets(100, 10, poisson=True, rng=random.Random(1))
+    assert offsets == sorted(offsets)
+    assert len(set(offsets)) == 100
+
+
+def test_load_test(git_repo):
+    git_uri, commit = git_repo
+    with MockOpenShift(namespace=TEST_OCP_NAMESPACE, simulate=True) as server:
+        os_conf = Configuration(conf_file=None, openshift_url=server.url,
+                                namespace=TEST_OCP_NAMESPACE, use_auth=False,
+                                pipeline_run_path=TEST_PIPELINE_RUN_TEMPLATE,
+                                reactor_config_map='rcm')
+        build_kwargs = {
+            'git_uri': git_uri,
+            'git_ref': commit,
+            'git_branch': GIT_BRANCH,
+            'user': TEST_USER,
+            'scratch': True,
+            'default_buildtime_limit': 10800,
+            'max_buildtime_limit': 21600,
+        }
+        load_test = LoadTest(OSBS(os_conf), build_kwargs, builds=3, concurrency=2, rate=20,
+                             wait=WAIT_FINISH, timeout=30, cleanup=True)
+        report = load_test.run()
+
+        assert server.list('pipelineruns') == []
+
+    assert (report['builds'], report['errors'], report['succeeded']) == (3, 0, 3)
+    for phase in ('queue', 'clone', 'render', 'post', 'start', 'finish', 'total'):
+        assert report['phases'][phase]['count'] == 3
+    assert report['http_pool']['requests'] > 0
+    assert sorted(record['index'] for record in load_test.records) == [0, 1, 2]
+    json.dumps(report)
+
+
+def test_load_test_build_errors():
+    class FakePipelineRun(object):
+        def __init__(self, name):
+            self.pipeline_run_name = name
+
+        def wait_for_start(self):
+            if self.pipeline_run_name == 'broken':
+                raise KeyError('status')
+            if self.pipeline_run_name == 'removed':
+                return None
+            return {}
+
+        def wait_for_finish(self, timeout=None):
+            return True
+
+        def has_succeeded(self):
+            return True
+
+    names = iter(['broken', 'removed', 'ok'])
+    osbs = flexmock(os=flexmock(get_http_pool_stats=dict, get_rate_limiter_stats=dict))
+    (osbs.should_receive('create_binary_container_pipeline_run')
+        .replace_with(lambda **kwargs: FakePipelineRun(next(names))))
+
+    load_test = LoadTest(osbs, {}, builds=3, concurrency=1, wait=WAIT_FINISH)
+    report = load_test.run()
+
+    assert (report['builds'], report['errors'], report['succeeded']) == (3, 2, 1)
+    assert [record['error'] for record in load_test.records] == [
+        "'status'", 'pipeline run did not start', None]
+    assert report['phases']['start']['count'] == 1
+    assert report['phases']['finish']['count'] == 1
+    assert report['phases']['total']['count'] == 3
+
+
+def test_main(git_repo, mock_openshift, tmpdir):
+    # keep logging configuration of other tests
+    flexmock(loadtest).should_receive('set_logging')
+    git_uri, commit = git_repo
+    config = tmpdir.join('osbs.conf')
+    config.write(dedent("""\
+        [default_binary]
+        openshift_url = {url}
+        namespace = {namespace}
+        use_auth = false
+        pipeline_run_path = {pipeline_run_path}
+        reactor_config_map = rcm
+        """.format(url=mock_openshift.url, namespace=TEST_OCP_NAMESPACE,
+                   pipeline_run_path=TEST_PIPELINE_RUN_TEMPLATE)))
+    report_path = str(tmpdir.join('report.json'))
+    records_path = str(tmpdir.join('records.jsonl'))
+    metrics_path = str(tmpdir.join('osbs.prom'))
+
+    mock_openshift.inject_error(409)
+    assert main(['--config', str(config), '-g', git_uri, '--git-commit', commit,
+                 '-b', GIT_BRANCH, '-u', TEST_USER, '-n', '2', '--concurrency', '1',
+                 '--wait', WAIT_NONE, '-q',
+                 '--report', report_path, '--records', records_path,
+                 '--metrics-file', metrics_path]) == 1
+
+    with open(report_path) as f:
+        report = json.load(f)
+    assert (report['builds'], report['errors']) == (2, 1)
+    assert report['phases']['post']['count'] == 2
+    assert report['phases']['start']['count'] == 0
+
+    with open(records_path) as f:
+        records = [json.loads(line) for line in f]
+    assert [bool(record['error']) for record in records] == [True, False]
+    assert len(mock_openshift.list('pipelineruns')) == 1
+
+    with open(metrics_path) as f:
+        exposition = f.read()
+    assert 'osbs_git_clone_seconds_count 2' in exposition
+    assert 'osbs_http_request_seconds_count{method="post"} 2' in exposition
+    assert not metrics.get_sinks()
@@ -7,13 +7,15 @@ of the BSD license. See the LICENSE file for details.
 """
 import json
 import os
+import subprocess
+import sys
 import time
 from textwrap import dedent
 
 from flexmock import flexmock
 import pytest
 
-from osbs.cli.main import print_output
+from osbs.cli.main import print_output, get_version
 from osbs.tekton import PipelineRun
 
 
@@ -129,6 +131,7 @@ def test_print_output_failure(tmpdir, capsys, get_logs_failed, build_not_finishe
 
     ppln_run.should_receive('get_logs').and_return(get_logs())
     ppln_run.should_receive('has_not_finished').and_return(build_not_finished)
+    ppln_run.should_receive('wait_for_finish').and_return(not build_not_finished)
 
     if get_logs_failed and build_not_finished:
         ppln_run.should_receive('cancel_pipeline_run').once()
@@ -169,3 +172,34 @@ def test_print_output_failure(tmpdir, capsys, get_logs_failed, build_not_finishe
     with open(export_metadata_file, 'r') as f:
         metadata = json.load(f)
     assert metadata == expected_metadata
+
+
+def test_get_version():
+    assert get_version()
+
+
+def test_startup_imports(record_property):
+    """Test that modules which are slow to import aren't imported on CLI startup
+
+    Startup time of 'osbs build --help' is recorded in the test report
+    """
+    code = dedent("""\
+        import sys
+        from osbs.cli.main import main
+        sys.argv = ['osbs', 'build', '--help']
+        try:
+            main()
+        except SystemExit:
+            pass
+        print(' '.join(sys.modules), file=sys.stderr)
+        """)
+    start = time.monotonic()
+    result = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                            stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    record_property('startup_seconds', time.monotonic() - start)
+
+    assert 'usage:' in result.stdout
+    modules = result.stderr.split()
+    for module in ('pkg_resources', 'jsonschema', 'yaml', 'dockerfile_parse',
+                   'requests_kerberos'):
+        assert module not in modules
@@ -11,6 +11,7 @@ import pytest
 from osbs.conf import Configuration
 from osbs.api import OSBS
 from tests.constants import TEST_PIPELINE_RUN_TEMPLATE, TEST_OCP_NAMESPACE, TEST_OCP_URL
+from tests.mock_openshift import MockOpenShift
 from tempfile import NamedTemporaryFile
 
 
@@ -48,3 +49,9 @@ reactor_config_map = rcm
         osbs = OSBS(dummy_config)
 
     return osbs
+
+
+@pytest.fixture
+def mock_openshift():
+    with MockOpenShift(namespace=TEST_OCP_NAMESPACE) as server:
+        yield server
@@ -0,0 +1,707 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+
+In-process fake of the OpenShift/Tekton API used by osbs-client
+
+MockOpenShift serves pipelineruns and taskruns (tekton.dev/v1beta1) and pods (v1)
+over real HTTP, so clients are exercised with the same protocol as against a
+cluster: get, list (label selectors, limit and continue), create, merge patch
+and delete of objects, chunked watch streams of objects and collections
+(resourceVersion, timeoutSeconds, bookmarks, 410 Gone after compact()) and
+container logs (timestamps, sinceTime, chunked follow until the container
+terminates).
+
+Every request can be delayed by a configurable latency and answered with an
+injected error, either queued by inject_error() or randomly with error_rate.
+With simulate=True, created pipeline runs are run by a fake controller,
+which creates their task runs and pods, writes logs and finishes them.
+
+    with MockOpenShift(simulate=True) as server:
+        os = server.openshift()
+        ...
+
+It can also be run as a standalone server, e.g. for osbs-loadtest:
+
+    python -m tests.mock_openshift --port 8080 --simulate --step-delay 5
+"""
+import argparse
+import copy
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from osbs.constants import DEFAULT_NAMESPACE
+from osbs.tekton import Openshift
+
+TEKTON_API = 'apis/tekton.dev/v1beta1'
+CORE_API = 'api/v1'
+RESOURCES = {
+    'pipelineruns': (TEKTON_API, 'PipelineRun'),
+    'taskruns': (TEKTON_API, 'TaskRun'),
+    'pods': (CORE_API, 'Pod'),
+}
+
+PATH_RE = re.compile(
+    r'^/(?P<api>apis/tekton\.dev/v1beta1|api/v1)/(?P<watch>watch/)?'
+    r'namespaces/(?P<namespace>[^/]+)/(?P<resource_type>[a-z]+)'
+    r'(?:/(?P<name>[^/]+))?(?P<log>/log)?/?$'
+)
+
+# seconds a waiting watch or log stream sleeps before checking whether the server stops
+POLL_SECS = 0.1
+
+
+def now_timestamp():
+    """
+    :return: str, current time in the RFC 3339 format used by the kubelet for log lines
+    """
+    now = datetime.now(timezone.utc)
+    fraction = '{:06d}'.format(now.microsecond).rstrip('0')
+    return now.strftime('%Y-%m-%dT%H:%M:%S') + ('.' + fraction if fraction else '') + 'Z'
+
+
+def merge_patch(target, patch):
+    """
+    Apply JSON merge patch (RFC 7386)
+    """
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = merge_patch(result.get(key), value)
+    return result
+
+
+def match_labels(obj, label_selector):
+    """
+    Match equality (key=value) and set (key in (a,b)) requirements of a label selector
+    """
+    if not label_selector:
+        return True
+    labels = obj.get('metadata', {}).get('labels') or {}
+    for requirement in re.findall(r'[^,(]+(?:\([^)]*\))?', label_selector):
+        requirement = requirement.strip()
+        set_match = re.match(r'^(\S+)\s+in\s+\((.*)\)$', requirement)
+        if set_match:
+            key, values = set_match.groups()
+            if labels.get(key) not in {value.strip() for value in values.split(',')}:
+                return False
+        else:
+            key, _, value = requirement.partition('=')
+            if labels.get(key.strip()) != value.strip().lstrip('='):
+                return False
+    return True
+
+
+def status_json(code, reason, message=''):
+    return {'kind': 'Status', 'apiVersion': 'v1', 'status': 'Failure',
+            'code': code, 'reason': reason, 'message': message}
+
+
+class MockOpenShift(object):
+    """
+    Fake OpenShift API server running in a background thread
+    """
+
+    def __init__(self, latency=0, error_rate=0, error_status=503, watch_timeout=30,
+                 log_stream_timeout=None, simulate=False, step_delay=0, log_lines=3,
+                 namespace=DEFAULT_NAMESPACE, seed=None, port=0):
+        """
+        :param latency: float, seconds every response is delayed, or callable
+                        (method, path) -> float
+        :param error_rate: float, probability of answering a request with error_status
+        :param error_status: int, status of random errors
+        :param watch_timeout: float, seconds after which watch streams are closed
+                              when timeoutSeconds isn't requested
+        :param log_stream_timeout: float, seconds after which connections of followed
+                                   log streams are cut, like proxies with idle timeouts do,
+                                   None to stream until the container terminates
+        :param simulate: bool, run created pipeline runs with the fake controller
+        :param step_delay: float, seconds each simulated step runs
+        :param log_lines: int, number of log lines written by each simulated step
+        :param namespace: str, namespace of openshift() clients
+        :param seed: random seed of error injection
+        :param port: int, port to listen on, 0 for any free port
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.watch_timeout = watch_timeout
+        self.log_stream_timeout = log_stream_timeout
+        self.simulate = simulate
+        self.step_delay = step_delay
+        self.log_lines = log_lines
+        self.namespace = namespace
+        self._random = random.Random(seed)
+        self.port = port
+
+        self._cond = threading.Condition()
+        # (resource type, namespace, name): object
+        self._objects = {}
+        # (resource version, resource type, namespace, event)
+        self._events = []
+        self._resource_version = 0
+        # watches from older resource versions get 410 Gone
+        self._compacted = 0
+        # (namespace, pod, container): [(timestamp, line)]
+        self._logs = {}
+        self._finished_logs = set()
+        # queued (status, headers) of injected errors
+        self._errors = []
+        self._stopping = False
+        self._server = None
+        self._threads = []
+
+        # number of requests, keyed by (method, resource type)
+        self.requests = Counter()
+
+    # server lifecycle
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}/'.format(host, port)
+
+    def start(self):
+        mock = self
+
+        class Handler(_Handler):
+            server_mock = mock
+
+        self._stopping = False
+        self._server = ThreadingHTTPServer(('127.0.0.1', self.port), Handler)
+        self._server.daemon_threads = True
+        thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def openshift(self, **kwargs):
+        """
+        :return: osbs.tekton.Openshift using this server
+        """
+        kwargs.setdefault('namespace', self.namespace)
+        kwargs.setdefault('use_auth', False)
+        return Openshift(openshift_api_url=self.url,
+                         openshift_oauth_url=self.url + 'oauth/authorize',
+                         k8s_api_url=self.url + 'api/v1/', **kwargs)
+
+    # error injection
+
+    def inject_error(self, status=503, count=1, headers=None):
+        """
+        Answer the next count requests with status
+        """
+        with self._cond:
+            self._errors.extend([(status, headers or {})] * count)
+
+    def _next_error(self):
+        with self._cond:
+            if self._errors:
+                return self._errors.pop(0)
+            if self.error_rate and self._random.random() < self.error_rate:
+                return self.error_status, {}
+        return None
+
+    def _delay(self, method, path):
+        latency = self.latency(method, path) if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+
+    # objects
+
+    def _key(self, resource_type, name, namespace):
+        return resource_type, namespace or self.namespace, name
+
+    def _record(self, event_type, resource_type, namespace, obj):
+        # called with self._cond held
+        self._resource_version += 1
+        obj['metadata']['resourceVersion'] = str(self._resource_version)
+        event = {'type': event_type, 'object': copy.deepcopy(obj)}
+        self._events.append((self._resource_version, resource_type, namespace, event))
+        self._cond.notify_all()
+
+    def create(self, resource_type, obj, namespace=None):
+        """
+        :return: dict, created object, None if it already exists
+        """
+        api, kind = RESOURCES[resource_type]
+        obj = copy.deepcopy(obj)
+        metadata = obj.setdefault('metadata', {})
+        namespace = namespace or metadata.get('namespace') or self.namespace
+        key = self._key(resource_type, metadata['name'], namespace)
+        metadata.update(namespace=namespace, uid=str(uuid.uuid4()),
+                        creationTimestamp=now_timestamp())
+        obj.update(kind=kind, apiVersion=api.split('/', 1)[-1])
+        obj.setdefault('status', {})
+        with self._cond:
+            if key in self._objects:
+                return None
+            self._objects[key] = obj
+            self._record('ADDED', resource_type, namespace, obj)
+            return copy.deepcopy(obj)
+
+    def get(self, resource_type, name, namespace=None):
+        with self._cond:
+            obj = self._objects.get(self._key(resource_type, name, namespace))
+            return copy.deepcopy(obj)
+
+    def list(self, resource_type, namespace=None, label_selector=None):
+        namespace = namespace or self.namespace
+        with self._cond:
+            return [copy.deepcopy(obj) for (rtype, ns, _), obj in sorted(self._objects.items())
+                    if rtype == resource_type and ns == namespace and
+                    match_labels(obj, label_selector)]
+
+    def update(self, resource_type, name, patch, namespace=None):
+        """
+        Apply a merge patch to the object
+
+        :return: dict, updated object, None if it doesn't exist
+        """
+        key = self._key(resource_type, name, namespace)
+        with self._cond:
+            obj = self._objects.get(key)
+            if obj is None:
+                return None
+            obj = merge_patch(obj, patch)
+            self._objects[key] = obj
+            self._record('MODIFIED', resource_type, key[1], obj)
+            return copy.deepcopy(obj)
+
+    def delete(self, resource_type, name, namespace=None):
+        """
+        :return: dict, deleted object, None if it doesn't exist
+        """
+        key = self._key(resource_type, name, namespace)
+        with self._cond:
+            obj = self._objects.pop(key, None)
+            if obj is None:
+                return None
+            self._record('DELETED', resource_type, key[1], obj)
+            return copy.deepcopy(obj)
+
+    def compact(self):
+        """
+        Expire all resource versions seen so far, like etcd compaction does
+        """
+        with self._cond:
+            self._compacted = self._resource_version
+
+    # logs
+
+    def append_log(self, pod, container, *lines, namespace=None):
+        with self._cond:
+            log = self._logs.setdefault((namespace or self.namespace, pod, container), [])
+            for line in lines:
+                log.append((now_timestamp(), line))
+            self._cond.notify_all()
+
+    def finish_container(self, pod, container, exit_code=0, namespace=None):
+        """
+        Mark the container of the pod terminated, which ends its followed logs
+        """
+        namespace = namespace or self.namespace
+        with self._cond:
+            self._finished_logs.add((namespace, pod, container))
+            pod_json = self._objects.get(self._key('pods', pod, namespace))
+            if pod_json is not None:
+                statuses = pod_json['status'].setdefault('containerStatuses', [])
+                statuses[:] = [status for status in statuses if status['name'] != container]
+                statuses.append({'name': container,
+                                 'state': {'terminated': {'exitCode': exit_code}}})
+                self._record('MODIFIED', 'pods', namespace, pod_json)
+            self._cond.notify_all()
+
+    # fake controller
+
+    def run_pipeline_run(self, name, tasks=('binary-container-build',),
+                         steps=('build',), succeeded=True, namespace=None):
+        """
+        Run the pipeline run like the Tekton controller: create a task run and
+        its pod for each task, write logs of their steps, terminate containers
+        and finish the task runs and the pipeline run
+        """
+        running = {'conditions': [{'type': 'Succeeded', 'status': 'Unknown',
+                                   'reason': 'Running'}],
+                   'startTime': now_timestamp()}
+        self.update('pipelineruns', name, {'status': running}, namespace=namespace)
+
+        child_references = []
+        for task in tasks:
+            task_run_name = '{}-{}'.format(name, task)
+            pod_name = '{}-pod'.format(task_run_name)
+            containers = ['step-{}'.format(step) for step in steps]
+            self.create('pods', {
+                'metadata': {'name': pod_name},
+                'status': {'phase': 'Running',
+                           'containerStatuses': [{'name': container, 'state': {'running': {}}}
+                                                 for container in containers]},
+            }, namespace=namespace)
+            self.create('taskruns', {
+                'metadata': {'name': task_run_name,
+                             'labels': {'tekton.dev/pipelineRun': name,
+                                        'tekton.dev/pipelineTask': task}},
+                'status': dict(running, podName=pod_name,
+                               steps=[{'name': step, 'container': container}
+                                      for step, container in zip(steps, containers)]),
+            }, namespace=namespace)
+            child_references.append({'kind': 'TaskRun', 'name': task_run_name,
+                                     'pipelineTaskName': task})
+            self.update('pipelineruns', name,
+                        {'status': {'childReferences': list(child_references)}},
+                        namespace=namespace)
+
+            for container in containers:
+                for i in range(self.log_lines):
+                    self.append_log(pod_name, container, '{} line {}'.format(container, i),
+                                    namespace=namespace)
+                    if self.step_delay:
+                        time.sleep(self.step_delay / self.log_lines)
+                self.finish_container(pod_name, container, namespace=namespace)
+
+            self.update('taskruns', task_run_name, {'status': {
+                'conditions': [{'type': 'Succeeded', 'status': 'True', 'reason': 'Succeeded'}],
+                'completionTime': now_timestamp(),
+            }}, namespace=namespace)
+
+        status, reason = ('True', 'Succeeded') if succeeded else ('False', 'Failed')
+        self.update('pipelineruns', name, {'status': {
+            'conditions': [{'type': 'Succeeded', 'status': status, 'reason': reason}],
+            'completionTime': now_timestamp(),
+        }}, namespace=namespace)
+
+    def _simulate(self, name, namespace):
+        thread = threading.Thread(target=self.run_pipeline_run, args=(name,),
+                                  kwargs={'namespace': namespace}, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_mock = None
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PATCH(self):
+        self._handle('PATCH')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+    # responses
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_error(self, status, reason, message='', headers=None):
+        self._send_json(status, status_json(status, reason, message), headers)
+
+    def _start_chunked(self, content_type):
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+
+    def _write_chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b'0\r\n\r\n')
+        self.wfile.flush()
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            return json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            return None
+
+    # dispatch
+
+    def _handle(self, method):
+        mock = self.server_mock
+        parsed = urlparse(self.path)
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        match = PATH_RE.match(parsed.path)
+        if not match or match.group('resource_type') not in RESOURCES or \
+                RESOURCES[match.group('resource_type')][0] != match.group('api'):
+            self._read_json()
+            self._send_error(404, 'NotFound', 'unknown path {}'.format(parsed.path))
+            return
+
+        route = match.groupdict()
+        resource_type = route['resource_type']
+        with mock._cond:
+            mock.requests[(method, resource_type)] += 1
+
+        body = self._read_json() if method in ('POST', 'PUT', 'PATCH') else None
+        mock._delay(method, parsed.path)
+        error = mock._next_error()
+        if error:
+            status, headers = error
+            self._send_error(status, 'Injected', 'injected error', headers)
+            return
+
+        try:
+            if route['watch']:
+                self._watch(resource_type, route['namespace'], route['name'], query)
+            elif route['log']:
+                self._log(route['namespace'], route['name'], query)
+            elif method == 'GET' and route['name']:
+                self._get(resource_type, route['namespace'], route['name'])
+            elif method == 'GET':
+                self._list(resource_type, route['namespace'], query)
+            elif method == 'POST' and not route['name']:
+                self._create(resource_type, route['namespace'], body)
+            elif method == 'PATCH' and route['name']:
+                self._patch(resource_type, route['namespace'], route['name'], body)
+            elif method == 'DELETE' and route['name']:
+                self._delete(resource_type, route['namespace'], route['name'])
+            else:
+                self._send_error(405, 'MethodNotAllowed')
+        except (BrokenPipeError, ConnectionResetError):
+            # client closed the stream
+            self.close_connection = True
+
+    def _not_found(self, resource_type, name):
+        self._send_error(404, 'NotFound', '{} "{}" not found'.format(resource_type, name))
+
+    def _get(self, resource_type, namespace, name):
+        obj = self.server_mock.get(resource_type, name, namespace)
+        if obj is None:
+            self._not_found(resource_type, name)
+        else:
+            self._send_json(200, obj)
+
+    def _list(self, resource_type, namespace, query):
+        mock = self.server_mock
+        with mock._cond:
+            items = mock.list(resource_type, namespace, query.get('labelSelector'))
+            resource_version = str(mock._resource_version)
+        start = int(query.get('continue') or 0)
+        limit = int(query.get('limit') or 0) or len(items)
+        metadata = {'resourceVersion': resource_version}
+        if start + limit < len(items):
+            metadata['continue'] = str(start + limit)
+        self._send_json(200, {'kind': RESOURCES[resource_type][1] + 'List',
+                              'metadata': metadata, 'items': items[start:start + limit]})
+
+    def _create(self, resource_type, namespace, body):
+        if not body or not body.get('metadata', {}).get('name'):
+            self._send_error(400, 'BadRequest', 'metadata.name is required')
+            return
+        mock = self.server_mock
+        obj = mock.create(resource_type, body, namespace)
+        if obj is None:
+            self._send_error(409, 'AlreadyExists', '{} "{}" already exists'
+                             .format(resource_type, body['metadata']['name']))
+            return
+        self._send_json(201, obj)
+        if mock.simulate and resource_type == 'pipelineruns':
+            mock._simulate(obj['metadata']['name'], namespace)
+
+    def _patch(self, resource_type, namespace, name, body):
+        if body is None:
+            self._send_error(400, 'BadRequest', 'invalid merge patch')
+            return
+        obj = self.server_mock.update(resource_type, name, body, namespace)
+        if obj is None:
+            self._not_found(resource_type, name)
+        else:
+            self._send_json(200, obj)
+
+    def _delete(self, resource_type, namespace, name):
+        obj = self.server_mock.delete(resource_type, name, namespace)
+        if obj is None:
+            self._not_found(resource_type, name)
+        else:
+            self._send_json(200, obj)
+
+    # streams
+
+    def _watch(self, resource_type, namespace, name, query):
+        mock = self.server_mock
+        deadline = time.monotonic() + float(query.get('timeoutSeconds') or mock.watch_timeout)
+        bookmarks = query.get('allowWatchBookmarks') == 'true'
+        self.close_connection = True
+        self._start_chunked('application/json')
+
+        def send(event):
+            self._write_chunk(json.dumps(event).encode('utf-8') + b'\n')
+
+        with mock._cond:
+            if query.get('resourceVersion'):
+                resource_version = int(query['resourceVersion'])
+                initial = []
+            else:
+                resource_version = mock._resource_version
+                initial = [{'type': 'ADDED', 'object': obj}
+                           for obj in mock.list(resource_type, namespace)
+                           if not name or obj['metadata']['name'] == name]
+            expired = resource_version < mock._compacted
+
+        if expired:
+            send({'type': 'ERROR', 'object': status_json(
+                410, 'Expired', 'too old resource version: {}'.format(resource_version))})
+            self._end_chunked()
+            return
+        for event in initial:
+            send(event)
+
+        while True:
+            with mock._cond:
+                events = [event for rv, rtype, ns, event in mock._events
+                          if rv > resource_version and rtype == resource_type and
+                          ns == namespace and
+                          (not name or event['object']['metadata']['name'] == name)]
+                resource_version = mock._resource_version
+                remaining = deadline - time.monotonic()
+                if not events and remaining > 0 and not mock._stopping:
+                    mock._cond.wait(min(remaining, POLL_SECS))
+            for event in events:
+                send(event)
+            if mock._stopping or time.monotonic() >= deadline:
+                break
+
+        if bookmarks:
+            send({'type': 'BOOKMARK', 'object': {
+                'kind': RESOURCES[resource_type][1],
+                'metadata': {'resourceVersion': str(resource_version)}}})
+        self._end_chunked()
+
+    def _log(self, namespace, pod, query):
+        mock = self.server_mock
+        if mock.get('pods', pod, namespace) is None:
+            self._not_found('pods', pod)
+            return
+
+        container = query.get('container')
+        follow = query.get('follow', '').lower() in ('true', '1')
+        timestamps = query.get('timestamps', '').lower() in ('true', '1')
+        since = query.get('sinceTime')
+        key = (namespace, pod, container)
+
+        def lines_from(index):
+            lines = []
+            with mock._cond:
+                log = mock._logs.get(key, [])
+                for timestamp, line in log[index:]:
+                    # sinceTime has a precision of seconds
+                    if since and timestamp[:19] < since[:19]:
+                        continue
+                    lines.append(('{} {}'.format(timestamp, line) if timestamps else line)
+                                 .encode('utf-8') + b'\n')
+                return lines, len(log), key in mock._finished_logs
+
+        if not follow:
+            lines, _, _ = lines_from(0)
+            data = b''.join(lines)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        self.close_connection = True
+        self._start_chunked('text/plain')
+        deadline = None
+        if mock.log_stream_timeout is not None:
+            deadline = time.monotonic() + mock.log_stream_timeout
+        index = 0
+        while True:
+            lines, index, finished = lines_from(index)
+            for line in lines:
+                self._write_chunk(line)
+            if finished or mock._stopping:
+                break
+            remaining = POLL_SECS if deadline is None else deadline - time.monotonic()
+            if remaining <= 0:
+                # cut the connection without ending the chunked body, like an idle
+                # timeout of a proxy would
+                return
+            with mock._cond:
+                if len(mock._logs.get(key, [])) == index and \
+                        key not in mock._finished_logs and not mock._stopping:
+                    mock._cond.wait(min(remaining, POLL_SECS))
+        self._end_chunked()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenShift API server")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--namespace", default=DEFAULT_NAMESPACE)
+    parser.add_argument("--latency", type=float, default=0,
+                        help="seconds every response is delayed")
+    parser.add_argument("--error-rate", type=float, default=0,
+                        help="probability of answering a request with an error")
+    parser.add_argument("--simulate", action="store_true",
+                        help="run created pipeline runs")
+    parser.add_argument("--step-delay", type=float, default=0,
+                        help="seconds each simulated step runs")
+    args = parser.parse_args()
+
+    server = MockOpenShift(latency=args.latency, error_rate=args.error_rate,
+                           simulate=args.simulate, step_delay=args.step_delay,
+                           namespace=args.namespace, port=args.port).start()
+    print("Serving OpenShift API at {}".format(server.url))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,442 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+
+import pytest
+import responses
+from flexmock import flexmock
+
+from osbs.aio.api import OSBS
+from osbs.aio.tekton import Openshift, PipelineRun, TaskRun, Pod
+from osbs.constants import AIO_STREAM_WORKERS
+from osbs.exceptions import OsbsException
+from osbs.tekton import Openshift as SyncOpenshift
+from osbs.tekton import WAIT_RETRY_SECS, WATCH_RETRY, WATCH_RETRY_SECS
+from tests.constants import TEST_OCP_NAMESPACE
+from tests.mock_openshift import MockOpenShift
+from tests.test_tekton import (PIPELINE_RUN_NAME, PIPELINE_RUN_URL, PIPELINE_WATCH_URL,
+                               PIPELINE_RUN_JSON,
+                               TASK_RUN_NAME, TASK_RUN_URL, TASK_RUN_JSON, TASK_RUN_JSON2,
+                               POD_NAME, POD_URL, POD_JSON, CONTAINERS, EXPECTED_LOGS,
+                               add_task_runs_list)
+
+
+def run(awaitable):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(awaitable)
+    finally:
+        loop.run_until_complete(loop.shutdown_asyncgens())
+        loop.close()
+
+
+def mock_sleep():
+    """
+    Replace asyncio.sleep, no blocking time.sleep is expected
+
+    :return: list, seconds of sleeps
+    """
+    sleeps = []
+
+    async def sleep(secs):
+        sleeps.append(secs)
+
+    flexmock(asyncio).should_receive('sleep').replace_with(sleep)
+    flexmock(time).should_receive('sleep').never()
+    return sleeps
+
+
+async def collect(async_generator):
+    return [item async for item in async_generator]
+
+
+def add_container_logs(pod_url, follow=False):
+    for container in CONTAINERS:
+        if follow:
+            url = f"{pod_url}/log?follow=True&timestamps=true&container={container}"
+            match = [responses.matchers.request_kwargs_matcher({"stream": True})]
+        else:
+            url = f"{pod_url}/log?container={container}"
+            match = []
+        responses.add(responses.GET, url, body=EXPECTED_LOGS[container], match=match)
+
+
+@pytest.fixture
+def openshift():
+    openshift = Openshift(SyncOpenshift(
+        openshift_api_url="https://openshift.testing/",
+        openshift_oauth_url="https://openshift.testing/oauth/authorize",
+        namespace=TEST_OCP_NAMESPACE))
+    yield openshift
+    openshift.close()
+
+
+class TestOpenshift(object):
+
+    def test_executors(self, openshift):
+        short = ThreadPoolExecutor(max_workers=1, thread_name_prefix='short')
+        stream = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stream')
+        openshift = Openshift(openshift.sync, executor=short, stream_executor=stream)
+
+        def thread_names():
+            yield threading.current_thread().name
+
+        async def get_thread_names():
+            return (await openshift.run(lambda: threading.current_thread().name),
+                    await collect(openshift.iterate(thread_names())))
+
+        try:
+            short_name, stream_names = run(get_thread_names())
+            assert short_name.startswith('short')
+            assert [name.split('_')[0] for name in stream_names] == ['stream']
+            # executors given by the caller are not shut down
+            openshift.close()
+            assert openshift.stream_executor is stream
+        finally:
+            short.shutdown()
+            stream.shutdown()
+
+    def test_default_stream_executor(self, openshift):
+        stream_executor = openshift.stream_executor
+        assert stream_executor._max_workers == AIO_STREAM_WORKERS
+        assert openshift.stream_executor is stream_executor
+
+        openshift.close()
+        assert stream_executor._shutdown
+        assert openshift.stream_executor is not stream_executor
+        openshift.close()
+
+    def test_stream_workers(self, openshift):
+        openshift = Openshift(openshift.sync, stream_workers=2)
+        running = []
+        most_running = []
+        lock = threading.Lock()
+
+        def stream():
+            # blocked waiting for the next line
+            with lock:
+                running.append(1)
+                most_running.append(len(running))
+            time.sleep(0.1)
+            with lock:
+                running.pop()
+            yield 'line'
+
+        async def read_streams():
+            return await asyncio.gather(*[collect(openshift.iterate(stream()))
+                                          for _ in range(5)])
+
+        try:
+            assert run(read_streams()) == [['line']] * 5
+            # further streams waited for a free thread
+            assert max(most_running) == 2
+        finally:
+            openshift.close()
+
+    def test_wait_for_cached_cancelled(self, openshift):
+        events = {'started': threading.Event(), 'stop': None}
+
+        def wait_for(name, predicate, exists, timeout, stop):
+            events['stop'] = stop
+            events['started'].set()
+            stop.wait()
+
+        informer = flexmock()
+        informer.should_receive('wait_for').replace_with(wait_for)
+
+        async def wait():
+            task = asyncio.ensure_future(openshift.wait_for_cached(informer, 'name', bool))
+            await asyncio.get_running_loop().run_in_executor(None, events['started'].wait)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        run(wait())
+        # the thread waiting in the informer was released
+        assert events['stop'].is_set()
+
+    def test_iterate_cancelled(self):
+        with MockOpenShift(namespace=TEST_OCP_NAMESPACE) as server:
+            server.create('pods', {'metadata': {'name': 'pod'}, 'status': {
+                'containerStatuses': [{'name': 'step', 'state': {'running': {}}}]}})
+            server.append_log('pod', 'step', 'line 0')
+            stream = ThreadPoolExecutor(max_workers=1)
+            openshift = Openshift(server.openshift(), stream_executor=stream)
+            pod = Pod(os=openshift, pod_name='pod', containers=['step'])
+            lines = []
+
+            async def follow():
+                async for line in pod.stream_container_logs('step'):
+                    lines.append(line)
+
+            try:
+                # the log stream blocks waiting for the next line
+                with pytest.raises(asyncio.TimeoutError):
+                    run(asyncio.wait_for(follow(), 1))
+                assert lines == ['line 0']
+                # the thread reading the stream was released
+                assert stream.submit(lambda: 'free').result(timeout=5) == 'free'
+            finally:
+                stream.shutdown()
+
+    def test_iterate_cancelled_closes_iterable(self, openshift):
+        fetching = threading.Event()
+        release = threading.Event()
+        closed = []
+
+        class Stopper(object):
+            def stop(self):
+                release.set()
+
+        def blocking():
+            try:
+                yield 'first'
+                fetching.set()
+                release.wait(5)
+                yield 'second'
+            finally:
+                closed.append(threading.current_thread().name)
+
+        async def collect_into(items):
+            async for item in openshift.iterate(blocking(), Stopper()):
+                items.append(item)
+
+        async def consume():
+            items = []
+            task = asyncio.ensure_future(collect_into(items))
+            await asyncio.get_running_loop().run_in_executor(None, fetching.wait)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            return items
+
+        assert run(consume()) == ['first']
+        # closed after the pending fetch ended, not while it was running
+        assert release.is_set()
+        assert closed and closed[0].startswith('osbs-aio-stream')
+
+
+class TestPod(object):
+
+    @responses.activate
+    def test_get_logs(self, openshift):
+        add_container_logs(POD_URL)
+        pod = Pod(os=openshift, pod_name=POD_NAME, containers=CONTAINERS)
+
+        assert run(pod.get_logs()) == EXPECTED_LOGS
+
+    @responses.activate
+    def test_get_logs_stream(self, openshift):
+        responses.add(responses.GET, POD_URL, json=POD_JSON)
+        add_container_logs(POD_URL, follow=True)
+        pod = Pod(os=openshift, pod_name=POD_NAME, containers=CONTAINERS)
+
+        assert run(collect(pod.get_logs(follow=True))) == ['Hello World', 'Bye World']
+
+    @responses.activate
+    def test_get_logs_stream_removed(self, openshift):
+        responses.add(responses.GET, POD_URL, json={}, status=404)
+        pod = Pod(os=openshift, pod_name=POD_NAME, containers=CONTAINERS)
+
+        assert run(collect(pod.get_logs(follow=True))) == []
+
+
+class TestTaskRun(object):
+
+    @responses.activate
+    def test_get_logs_wait(self, openshift):
+        responses.add(responses.GET, TASK_RUN_URL, json=TASK_RUN_JSON)
+        responses.add(responses.GET, POD_URL, json=POD_JSON)
+        add_container_logs(POD_URL, follow=True)
+        task_run = TaskRun(os=openshift, task_run_name=TASK_RUN_NAME)
+
+        logs = run(collect(task_run.get_logs(follow=True, wait=True)))
+        assert logs == ['Hello World', 'Bye World']
+
+
+class TestPipelineRun(object):
+
+    @responses.activate
+    def test_wait_for_start(self, openshift):
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        pipeline_run = PipelineRun(os=openshift, pipeline_run_name=PIPELINE_RUN_NAME)
+
+        assert run(pipeline_run.wait_for_start()) == PIPELINE_RUN_JSON
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_wait_for_finish(self, openshift):
+        finished = deepcopy(PIPELINE_RUN_JSON)
+        finished['status']['conditions'][0].update(status='True', reason='Succeeded')
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        responses.add(responses.GET, PIPELINE_WATCH_URL,
+                      json={'type': 'MODIFIED', 'object': finished})
+        pipeline_run = PipelineRun(os=openshift, pipeline_run_name=PIPELINE_RUN_NAME)
+
+        assert run(pipeline_run.wait_for_finish(timeout=60)) is True
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    def test_wait_for_finish_expired_resource_version(self, openshift):
+        finished = deepcopy(PIPELINE_RUN_JSON)
+        finished['status']['conditions'][0].update(status='False', reason='Failed')
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        responses.add(responses.GET, PIPELINE_WATCH_URL,
+                      json={'type': 'ERROR', 'object': {'kind': 'Status', 'code': 410}})
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=finished)
+        sleeps = mock_sleep()
+        pipeline_run = PipelineRun(os=openshift, pipeline_run_name=PIPELINE_RUN_NAME)
+
+        assert run(pipeline_run.wait_for_finish()) is True
+        # the pipeline run is fetched again right away
+        assert sleeps == []
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_wait_for_finish_watch_reconnect_delay(self, openshift):
+        finished = deepcopy(PIPELINE_RUN_JSON)
+        finished['status']['conditions'][0].update(status='True', reason='Succeeded')
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=finished)
+        # the server keeps closing watch streams right away
+        responses.add(responses.GET, PIPELINE_WATCH_URL, body='')
+        sleeps = mock_sleep()
+        pipeline_run = PipelineRun(os=openshift, pipeline_run_name=PIPELINE_RUN_NAME)
+
+        assert run(pipeline_run.wait_for_finish(timeout=3600)) is True
+        assert sleeps == [WATCH_RETRY_SECS] * (WATCH_RETRY - 1)
+        watches = [call for call in responses.calls if 'watch' in call.request.url]
+        assert len(watches) == WATCH_RETRY
+
+    @responses.activate
+    def test_wait_for_finish_poll(self, openshift):
+        finished = deepcopy(PIPELINE_RUN_JSON)
+        finished['status']['conditions'][0].update(status='True', reason='Succeeded')
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        responses.add(responses.GET, PIPELINE_WATCH_URL, json={}, status=403)
+        for _ in range(3):
+            responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=finished)
+        sleeps = mock_sleep()
+        pipeline_run = PipelineRun(os=openshift, pipeline_run_name=PIPELINE_RUN_NAME)
+
+        assert run(pipeline_run.wait_for_finish()) is True
+        assert sleeps == [WAIT_RETRY_SECS, WAIT_RETRY_SECS * 2, WAIT_RETRY_SECS * 4]
+
+    @responses.activate
+    def test_wait_for_finish_timeout(self, openshift):
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        responses.add(responses.GET, PIPELINE_WATCH_URL, body='')
+        pipeline_run = PipelineRun(os=openshift, pipeline_run_name=PIPELINE_RUN_NAME)
+
+        assert run(pipeline_run.wait_for_finish(timeout=0)) is False
+        assert run(pipeline_run.wait_for_finish(deadline=time.time() - 1)) is False
+        # pipeline run is fetched once to check whether it has already finished
+        assert len(responses.calls) == 2
+        assert all(call.request.url == PIPELINE_RUN_URL for call in responses.calls)
+
+    @responses.activate
+    def test_wait_for_finish_informer(self, openshift):
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        finished = deepcopy(PIPELINE_RUN_JSON)
+        finished['status']['conditions'][0].update(status='True', reason='Succeeded')
+        openshift.sync.use_informers = True
+        informer = flexmock()
+        (flexmock(openshift.sync)
+         .should_receive('get_informer')
+         .with_args('apis', 'tekton.dev/v1beta1', 'pipelineruns')
+         .and_return(informer))
+
+        def wait_for(name, predicate, exists, timeout, stop):
+            assert name == PIPELINE_RUN_NAME
+            assert 0 < timeout <= 60
+            assert not stop.is_set()
+            return finished if predicate(finished) else None
+
+        informer.should_receive('wait_for').replace_with(wait_for).once()
+        pipeline_run = PipelineRun(os=openshift, pipeline_run_name=PIPELINE_RUN_NAME)
+
+        assert run(pipeline_run.wait_for_finish(timeout=60)) is True
+
+    @responses.activate
+    def test_status(self, openshift):
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        add_task_runs_list(TASK_RUN_JSON, TASK_RUN_JSON2)
+        pipeline_run = PipelineRun(os=openshift, pipeline_run_name=PIPELINE_RUN_NAME)
+
+        async def get_status():
+            return await asyncio.gather(pipeline_run.has_not_finished(),
+                                        pipeline_run.get_status_reason(),
+                                        pipeline_run.any_task_failed())
+
+        assert run(get_status()) == [True, 'Running', False]
+
+    def test_follow_logs(self, openshift):
+        pipeline_run = PipelineRun(os=openshift, pipeline_run_name=PIPELINE_RUN_NAME)
+        pod = Pod(os=openshift, pod_name=POD_NAME, containers=CONTAINERS)
+        lines = {'step-hello': ['Hello World'], 'step-bye': ['Bye World'], 'step-wait': []}
+
+        async def wait_for_start():
+            return PIPELINE_RUN_JSON
+
+        async def wait_for_pod():
+            return pod
+
+        async def wait_for_taskruns():
+            yield [('short-sleep', TASK_RUN_NAME)]
+
+        async def stream_container_logs(container):
+            for line in lines[container]:
+                yield line
+
+        (flexmock(pipeline_run)
+         .should_receive('wait_for_start').replace_with(wait_for_start))
+        (flexmock(pipeline_run)
+         .should_receive('wait_for_taskruns').replace_with(wait_for_taskruns))
+        flexmock(TaskRun).should_receive('wait_for_pod').replace_with(wait_for_pod)
+        (flexmock(pod)
+         .should_receive('stream_container_logs').replace_with(stream_container_logs))
+
+        logs = run(collect(pipeline_run.follow_logs()))
+        assert sorted(logs) == [('short-sleep', 'step-bye', 'Bye World'),
+                                ('short-sleep', 'step-hello', 'Hello World')]
+
+
+class TestOSBS(object):
+
+    def test_stream_workers(self, osbs_source):
+        flexmock(osbs_source.os_conf).should_receive('get_aio_stream_workers').and_return(3)
+        osbs = OSBS(osbs_source.os_conf)
+        try:
+            assert osbs.os.stream_executor._max_workers == 3
+        finally:
+            osbs.close()
+
+    @responses.activate
+    def test_get_build(self, osbs_source):
+        osbs = OSBS(osbs_source.os_conf)
+        url = osbs.os.build_url('apis', 'tekton.dev/v1beta1', f'pipelineruns/{PIPELINE_RUN_NAME}')
+        responses.add(responses.GET, url, json=PIPELINE_RUN_JSON)
+
+        assert run(osbs.get_build(PIPELINE_RUN_NAME)) == PIPELINE_RUN_JSON
+        assert run(osbs.build_not_finished(PIPELINE_RUN_NAME)) is True
+
+    @responses.activate
+    def test_exceptions_converted(self, osbs_source):
+        osbs = OSBS(osbs_source.os_conf)
+        url = osbs.os.build_url('apis', 'tekton.dev/v1beta1', f'pipelineruns/{PIPELINE_RUN_NAME}')
+        responses.add(responses.GET, url, body=ValueError('boom'))
+
+        with pytest.raises(OsbsException):
+            run(osbs.get_build(PIPELINE_RUN_NAME))
+        with pytest.raises(OsbsException):
+            run(collect(osbs.get_build_logs(PIPELINE_RUN_NAME, follow=True)))
@@ -12,18 +12,22 @@ from flexmock import flexmock
 import pytest
 import json
 import copy
+import os
 import sys
 import datetime
 import random
+import threading
+import time
+from textwrap import dedent
 from tempfile import NamedTemporaryFile
 
-from osbs.api import OSBS, osbsapi
+from osbs.api import OSBS, osbsapi, _load_pipeline_from_template
 from osbs.conf import Configuration
 from osbs.exceptions import (OsbsValidationException, OsbsException, OsbsResponseException)
 from osbs.constants import (REPO_CONTAINER_CONFIG, PRUN_TEMPLATE_USER_PARAMS,
                             PRUN_TEMPLATE_REACTOR_CONFIG_WS, PRUN_TEMPLATE_BUILD_DIR_WS,
                             PRUN_TEMPLATE_CONTEXT_DIR_WS)
-from osbs import utils
+from osbs import api as osbs_api, utils
 from osbs.utils.labels import Labels
 from osbs.repo_utils import RepoInfo, RepoConfiguration, ModuleSpec
 from osbs.build.user_params import BuildUserParams, SourceContainerUserParams
@@ -32,7 +36,7 @@ from tests.constants import (TEST_COMPONENT, TEST_GIT_BRANCH, TEST_GIT_REF, TEST
                              TEST_TARGET, TEST_USER, TEST_KOJI_TASK_ID, TEST_VERSION,
                              TEST_PIPELINE_RUN_TEMPLATE, TEST_PIPELINE_REPLACEMENTS_TEMPLATE,
                              TEST_OCP_NAMESPACE)
-from osbs.tekton import PipelineRun, TaskRun
+from osbs.tekton import Openshift, PipelineRun, TaskRun
 
 
 REQUIRED_BUILD_ARGS = {
@@ -160,7 +164,8 @@ class TestOSBS(object):
             baseimage = 'fedora23/python'
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info(MockParser())))
         kwargs = REQUIRED_BUILD_ARGS
         kwargs['default_buildtime_limit'] = 10800
@@ -251,7 +256,8 @@ class TestOSBS(object):
 
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info(MockParser())))
 
         with pytest.raises(OsbsValidationException) as exc:
@@ -284,7 +290,8 @@ class TestOSBS(object):
             baseimage = 'fedora:25'
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info(MockParser())))
         create_build_args = {
             'git_uri': TEST_GIT_URI,
@@ -320,7 +327,8 @@ class TestOSBS(object):
             baseimage = 'fedora23/python'
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info(mock_df_parser=MockParser())))
 
         self.mock_start_pipeline()
@@ -334,7 +342,8 @@ class TestOSBS(object):
     def test_missing_component_argument_doesnt_break_build(self, osbs_binary):  # noqa
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info()))
 
         self.mock_start_pipeline()
@@ -345,7 +354,8 @@ class TestOSBS(object):
         mock_config = MockConfiguration(is_flatpak=True, modules=TEST_MODULES)
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info(mock_config=mock_config)))
 
         kwargs = {
@@ -375,6 +385,44 @@ class TestOSBS(object):
         response = osbs_binary.create_binary_container_build(**kwargs)
         assert isinstance(response, PipelineRun)
 
+    def test_create_binary_container_pipeline_runs(self, osbs_binary):
+        lock = threading.Lock()
+        cloning = []
+        max_cloning = []
+
+        def get_repo_info(*args, **kwargs):
+            with lock:
+                cloning.append(args[0])
+                max_cloning.append(len(cloning))
+            time.sleep(0.01)
+            with lock:
+                cloning.remove(args[0])
+            return self.mock_repo_info()
+
+        flexmock(utils).should_receive('get_repo_info').replace_with(get_repo_info)
+        self.mock_start_pipeline()
+
+        kwargs = {
+            'git_uri': TEST_GIT_URI,
+            'git_ref': TEST_GIT_REF,
+            'git_branch': TEST_GIT_BRANCH,
+            'user': TEST_USER,
+            'scratch': True,
+            'default_buildtime_limit': 10800,
+            'max_buildtime_limit': 21600,
+        }
+        builds = [kwargs, dict(kwargs, git_uri=None), dict(kwargs, target=TEST_TARGET)]
+
+        results = osbs_binary.create_binary_container_pipeline_runs(builds, max_workers=3,
+                                                                    max_git_workers=1)
+
+        assert [isinstance(result.pipeline_run, PipelineRun) for result in results] == [
+            True, False, True]
+        assert results[0].error is None
+        assert isinstance(results[1].error, OsbsException)
+        assert 'required parameter git_uri missing' in str(results[1].error)
+        assert max(max_cloning) == 1
+
     @pytest.mark.parametrize(('build_flatpak', 'repo_flatpak', 'match_exception'), [
         (True, False, "repository doesn't have a container.yaml with a flatpak: section"),
         (False, True, "repository has a container.yaml with a flatpak: section"),
@@ -384,7 +432,8 @@ class TestOSBS(object):
         mock_config = MockConfiguration(is_flatpak=repo_flatpak, modules=TEST_MODULES)
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info(mock_config=mock_config)))
 
         kwargs = {
@@ -407,7 +456,8 @@ class TestOSBS(object):
 
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info(mock_config=MockConfiguration(modules=TEST_MODULES,
                                                                           is_flatpak=True))))
 
@@ -431,7 +481,8 @@ class TestOSBS(object):
 
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info(mock_config=MockConfiguration(modules=TEST_MODULES))))
 
         kwargs = {'git_uri': TEST_GIT_URI,
@@ -461,7 +512,8 @@ class TestOSBS(object):
 
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info(mock_config=MockConfiguration(modules=TEST_MODULES))))
 
         kwargs = {'git_uri': TEST_GIT_URI,
@@ -490,7 +542,8 @@ class TestOSBS(object):
 
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info(mock_config=MockConfiguration(modules=TEST_MODULES))))
 
         kwargs = {'git_uri': TEST_GIT_URI,
@@ -525,7 +578,8 @@ class TestOSBS(object):
 
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=branch_name, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=branch_name, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(repo_info))
 
         kwargs = {'git_uri': TEST_GIT_URI,
@@ -570,7 +624,8 @@ class TestOSBS(object):
 
         (flexmock(utils)
          .should_receive('get_repo_info')
-         .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+         .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                    git_cache=None, repo_info_cache=None)
          .and_return(repo_info))
 
         kwargs = {'git_uri': TEST_GIT_URI,
@@ -590,7 +645,8 @@ class TestOSBS(object):
 
         (flexmock(utils)
          .should_receive('get_repo_info')
-         .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+         .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                    git_cache=None, repo_info_cache=None)
          .and_return(repo_info))
 
         kwargs = {'git_uri': TEST_GIT_URI,
@@ -643,7 +699,8 @@ class TestOSBS(object):
 
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info(mock_df_parser=mocked_df_parser)))
 
         with pytest.raises(OsbsValidationException) as exc:
@@ -661,7 +718,8 @@ class TestOSBS(object):
 
         (flexmock(utils)
          .should_receive('get_repo_info')
-         .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+         .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                    git_cache=None, repo_info_cache=None)
          .and_return(self.mock_repo_info(mock_df_parser=MockDfParserNoDf(),
                                          mock_config=MockConfiguration(is_flatpak=flatpak,
                                                                        modules=TEST_MODULES))))
@@ -726,7 +784,8 @@ class TestOSBS(object):
 
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info()))
 
         rand = '67890'
@@ -804,7 +863,8 @@ class TestOSBS(object):
 
         (flexmock(utils)
             .should_receive('get_repo_info')
-            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None)
+            .with_args(TEST_GIT_URI, TEST_GIT_REF, git_branch=TEST_GIT_BRANCH, depth=None,
+                       git_cache=None, repo_info_cache=None)
             .and_return(self.mock_repo_info()))
 
         (flexmock(PipelineRun)
@@ -944,6 +1004,16 @@ class TestOSBS(object):
 
         assert resp == osbs_binary.get_build('run_name')
 
+    def test_get_builds_status(self, osbs_binary):
+        statuses = {'run_name': None}
+        (flexmock(osbs_api)
+         .should_receive('list_pipeline_runs_status')
+         .with_args(osbs_binary.os, pipeline_run_names=['run_name'], label_selector=None)
+         .once()
+         .and_return(statuses))
+
+        assert statuses == osbs_binary.get_builds_status(['run_name'])
+
     def test_get_build_reason(self, osbs_binary):
         reason = 'my_reason'
         resp = {'metadata': {'name': 'run_name'}, 'status': {'conditions': [{'reason': reason}]}}
@@ -1028,6 +1098,14 @@ class TestOSBS(object):
 
         assert logs == osbs_binary.get_build_logs('run_name', follow=follow, wait=wait)
 
+    def test_save_build_logs(self, osbs_binary, tmpdir):
+        paths = {'binary-container-build': {'step-build': 'path'}}
+        (flexmock(PipelineRun)
+            .should_receive('save_logs')
+            .with_args(tmpdir.strpath).and_return(paths))
+
+        assert paths == osbs_binary.save_build_logs('run_name', tmpdir.strpath)
+
     def test_get_build_error_message(self, osbs_binary):
         metadata = '{"plugins-metadata": {"errors": {"plugin1": "error1"}}}'
         message = [{'key': 'task_result', 'value': 'bad thing'}]
@@ -1046,18 +1124,21 @@ class TestOSBS(object):
 
         resp1 = {'metadata': {'name': 'run_name'},
                  'status': {'childReferences': childrefs, 'conditions': [{'message': 'error'}]}}
-        resp2 = {'metadata': {'labels': {'tekton.dev/pipelineTask': 'prun-task1'}},
+        resp2 = {'metadata': {'name': 'task_run_name1',
+                              'labels': {'tekton.dev/pipelineTask': 'prun-task1'}},
                  'status': taskstat1}
-        resp3 = {'metadata': {'labels': {'tekton.dev/pipelineTask': 'prun-task2'}},
+        resp3 = {'metadata': {'name': 'task_run_name2',
+                              'labels': {'tekton.dev/pipelineTask': 'prun-task2'}},
                  'status': taskstat2}
-        resp4 = {'metadata': {'labels': {'tekton.dev/pipelineTask': 'binary-container-exit'}},
+        resp4 = {'metadata': {'name': 'task_run_name3',
+                              'labels': {'tekton.dev/pipelineTask': 'binary-container-exit'}},
                  'status': taskstat3}
 
         flexmock(PipelineRun).should_receive('get_info').and_return(resp1)
-        (flexmock(TaskRun).should_receive('get_info')
-         .and_return(resp2)
-         .and_return(resp3)
-         .and_return(resp4))
+        (flexmock(Openshift).should_receive('list_resource')
+         .and_return({'items': [resp2, resp3, resp4]})
+         .once())
+        flexmock(TaskRun).should_receive('get_info').never()
 
         error_msg = "Error in plugin plugin1: error1;\n"
         error_msg += "Error in prun-task2: bad thing;\n"
@@ -1074,11 +1155,12 @@ class TestOSBS(object):
         childrefs = [{'name': 'task_run_name', 'kind': 'TaskRun'}]
 
         resp1 = {'metadata': {'name': 'run_name'}, 'status': {'childReferences': childrefs}}
-        resp2 = {'metadata': {'labels': {'tekton.dev/pipelineTask': 'binary-container-prebuild'}},
+        resp2 = {'metadata': {'name': 'task_run_name',
+                              'labels': {'tekton.dev/pipelineTask': 'binary-container-prebuild'}},
                  'status': taskstatus}
 
         flexmock(PipelineRun).should_receive('get_info').and_return(resp1)
-        flexmock(TaskRun).should_receive('get_info').and_return(resp2)
+        flexmock(Openshift).should_receive('list_resource').and_return({'items': [resp2]})
         assert osbs_binary.get_final_platforms('run_name') == ["x86_64", "ppc64le"]
 
     def test_get_build_results(self, osbs_binary):
@@ -1150,3 +1232,45 @@ class TestOSBS(object):
             'user_params_json': user_params_json,
         }
         assert data == expected
+
+
+def test_load_pipeline_from_template(tmpdir):
+    template_path = os.path.join(str(tmpdir), 'pipeline-run.yaml')
+    with open(template_path, 'w') as f:
+        f.write(dedent("""\
+            metadata:
+              name: $name
+            spec:
+              timeout: $timeout
+              retries: $retries
+              quoted: '$retries'
+              params:
+                - name: user-params
+                  value: >
+                    $json
+            """))
+    substitutions = {'name': 'run-1', 'timeout': '3h', 'retries': '3',
+                     'json': json.dumps({'key': 'value: 1'})}
+
+    expected = {
+        'metadata': {'name': 'run-1'},
+        'spec': {
+            'timeout': '3h',
+            'retries': 3,
+            'quoted': '3',
+            'params': [{'name': 'user-params', 'value': '{"key": "value: 1"}\n'}],
+        },
+    }
+    assert _load_pipeline_from_template(template_path, substitutions) == expected
+
+    # parsed template is reused until the file changes
+    template = osbs_api._pipeline_run_templates[template_path][1]
+    assert _load_pipeline_from_template(template_path, substitutions) == expected
+    assert osbs_api._pipeline_run_templates[template_path][1] is template
+
+    with open(template_path, 'a') as f:
+        f.write('kind: PipelineRun\n')
+    os.utime(template_path, ns=(0, 0))
+    rendered = _load_pipeline_from_template(template_path, substitutions)
+    assert rendered == dict(expected, kind='PipelineRun')
+    assert osbs_api._pipeline_run_templates[template_path][1] is not template
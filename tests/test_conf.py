@@ -309,6 +309,89 @@ class TestConfiguration(object):
             conf = Configuration(conf_file=config_file, conf_section='default')
         assert conf.get_max_buildtime_limit() == expected
 
+    @pytest.mark.parametrize(('config', 'expected_maxsize', 'expected_keep_alive'), [
+        ({
+             'default': {'http_pool_maxsize': 30, 'http_keep_alive': 'false'},
+         }, 30, False),
+        ({
+             'default': {},
+         }, 10, True),
+    ])
+    def test_http_pool(self, config, expected_maxsize, expected_keep_alive):
+        with self.config_file(config) as config_file:
+            conf = Configuration(conf_file=config_file, conf_section='default')
+        assert conf.get_http_pool_maxsize() == expected_maxsize
+        assert conf.get_http_keep_alive() == expected_keep_alive
+
+    @pytest.mark.parametrize(('config', 'expected_threshold', 'expected_reset'), [
+        ({'default': {'http_circuit_breaker_threshold': '5',
+                      'http_circuit_breaker_reset': '30'}}, 5, 30),
+        ({'default': {}}, 0, 60),
+    ])
+    def test_http_circuit_breaker(self, config, expected_threshold, expected_reset):
+        with self.config_file(config) as config_file:
+            conf = Configuration(conf_file=config_file, conf_section='default')
+        assert conf.get_http_circuit_breaker_threshold() == expected_threshold
+        assert conf.get_http_circuit_breaker_reset() == expected_reset
+
+    @pytest.mark.parametrize(('config', 'expected'), [
+        ({'default': {'aio_stream_workers': '200'}}, 200),
+        ({'default': {}}, 64),
+    ])
+    def test_aio_stream_workers(self, config, expected):
+        with self.config_file(config) as config_file:
+            conf = Configuration(conf_file=config_file, conf_section='default')
+        assert conf.get_aio_stream_workers() == expected
+
+    @pytest.mark.parametrize(('config', 'expected_qps', 'expected_burst'), [
+        ({'default': {'api_qps': '2.5', 'api_burst': '10'}}, 2.5, 10),
+        ({'default': {'api_qps': '5'}}, 5, None),
+        ({'default': {}}, None, None),
+    ])
+    def test_api_rate_limit(self, config, expected_qps, expected_burst):
+        with self.config_file(config) as config_file:
+            conf = Configuration(conf_file=config_file, conf_section='default')
+        assert conf.get_api_qps() == expected_qps
+        assert conf.get_api_burst() == expected_burst
+
+    @pytest.mark.parametrize(('config', 'expected'), [
+        ({'default': {'use_informers': 'true'}}, True),
+        ({'default': {}}, False),
+    ])
+    def test_use_informers(self, config, expected):
+        with self.config_file(config) as config_file:
+            conf = Configuration(conf_file=config_file, conf_section='default')
+        assert conf.get_use_informers() == expected
+
+    @pytest.mark.parametrize(('config', 'expected_dir', 'expected_max_size'), [
+        ({
+             'default': {'git_cache_dir': '/var/cache/osbs', 'git_cache_max_size_mb': 100},
+         }, '/var/cache/osbs', 100),
+        ({
+             'default': {},
+         }, None, 10240),
+    ])
+    def test_git_cache(self, config, expected_dir, expected_max_size):
+        with self.config_file(config) as config_file:
+            conf = Configuration(conf_file=config_file, conf_section='default')
+        assert conf.get_git_cache_dir() == expected_dir
+        assert conf.get_git_cache_max_size_mb() == expected_max_size
+
+    @pytest.mark.parametrize(('config', 'expected'), [
+        ({
+             'default': {'use_repo_info_cache': 'true', 'repo_info_cache_dir': '/var/cache/osbs',
+                         'repo_info_cache_size': 10, 'repo_info_cache_ttl': 60},
+         }, (True, '/var/cache/osbs', 10, 60)),
+        ({
+             'default': {},
+         }, (False, None, 100, 86400)),
+    ])
+    def test_repo_info_cache(self, config, expected):
+        with self.config_file(config) as config_file:
+            conf = Configuration(conf_file=config_file, conf_section='default')
+        assert (conf.get_use_repo_info_cache(), conf.get_repo_info_cache_dir(),
+                conf.get_repo_info_cache_size(), conf.get_repo_info_cache_ttl()) == expected
+
     def test_deprecated_warnings(self, caplog):  # noqa:F811
         with caplog.at_level(logging.WARNING):
             assert "it has been deprecated" not in caplog.text
@@ -8,16 +8,25 @@ of the BSD license. See the LICENSE file for details.
 from __future__ import absolute_import
 
 import logging
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer, ThreadingHTTPServer
 
 from flexmock import flexmock
 import pytest
 import requests
 import http
 
+from urllib3.exceptions import MaxRetryError, NewConnectionError
+from urllib3.response import HTTPResponse
 from urllib3.util import Retry
-from osbs.osbs_http import HttpSession, HttpStream, HttpResponse
-from osbs.exceptions import OsbsNetworkException, OsbsException, OsbsResponseException
+import osbs.osbs_http
+from osbs.osbs_http import BackoffRetry, HttpSession, HttpStream, HttpResponse
+from osbs.exceptions import (OsbsCircuitOpenException, OsbsNetworkException, OsbsException,
+                             OsbsResponseException)
 from osbs.constants import HTTP_RETRIES_STATUS_FORCELIST, HTTP_REQUEST_TIMEOUT
+from osbs.tekton import check_response
 
 logger = logging.getLogger(__file__)
 
@@ -208,7 +217,7 @@ class TestHttpSession(object):
            'headers': {}
         }
 
-        fake_response = flexmock(status_code=http.client.OK, headers={})
+        fake_response = flexmock(status_code=http.client.OK, headers={}, close=lambda: None)
 
         (flexmock(requests.Session)
             .should_receive('request')
@@ -231,6 +240,9 @@ class TestHttpSession(object):
             def iter_lines(self, **kwargs):
                 raise exc('')
 
+            def close(self):
+                pass
+
         url = "https://httpbin.org/stream/3"
         method = "get"
         kwargs = {
@@ -258,6 +270,9 @@ class TestHttpSession(object):
             def iter_lines(self, **kwargs):
                 raise requests.exceptions.ConnectionError
 
+            def close(self):
+                pass
+
         url = "https://httpbin.org/stream/3"
         method = "get"
         kwargs = {
@@ -287,9 +302,234 @@ class TestHttpResponse(object):
         response = HttpResponse(status_code=http.client.OK, headers={}, content=content_json)
         assert content_str == response.json()
 
+    @pytest.mark.parametrize('encoding', ['utf-8', 'utf-16', 'utf-32-le'])
+    def test_encodings(self, encoding):
+        content = '{"name": "\u010de\u0161tina"}'.encode(encoding)
+        response = HttpResponse(status_code=http.client.OK, headers={}, content=content)
+        assert response.json() == {'name': '\u010de\u0161tina'}
+
+    def test_error_response(self):
+        response = HttpResponse(status_code=http.client.NOT_FOUND, headers={},
+                                content=b'{"reason": "NotFound"}')
+        with pytest.raises(OsbsResponseException) as exc_info:
+            response.json()
+        assert exc_info.value.status_code == http.client.NOT_FOUND
+        assert exc_info.value.message == '{"reason": "NotFound"}'
+
     def test_bad_coding_guess(self):
         bad_json = b'[\"cat\", \"dog\"][\"cat\", \"dog\"]'
         response = HttpResponse(status_code=http.client.OK, headers={}, content=bad_json)
         with pytest.raises(OsbsResponseException) as exc_info:
             response.json()
         assert 'HtttpResponse has corrupt json' in exc_info.value.message
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"path": "%s"}' % self.path.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class StatusHandler(KeepAliveHandler):
+    # (status, headers) of the next responses, 200 when empty
+    responses = []
+    requests = 0
+
+    def do_GET(self):
+        StatusHandler.requests += 1
+        status, headers = self.responses.pop(0) if self.responses else (200, {})
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+def serve(handler, server_class=HTTPServer):
+    server = server_class(('127.0.0.1', 0), handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'http://127.0.0.1:{}'.format(server.server_address[1])
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def local_server():
+    yield from serve(KeepAliveHandler)
+
+
+@pytest.fixture
+def status_server():
+    StatusHandler.responses = []
+    StatusHandler.requests = 0
+    # connections kept alive by failed tests mustn't block the shutdown
+    yield from serve(StatusHandler, ThreadingHTTPServer)
+
+
+class TestHttpSessionPool(object):
+    def test_connections_reused(self, local_server):
+        session = HttpSession()
+        for i in range(3):
+            response = session.get('{}/{}'.format(local_server, i))
+            assert response.json() == {'path': '/{}'.format(i)}
+
+        assert session.get_pool_stats() == {
+            'requests': 3,
+            'new_connections': 1,
+            'hits': 2,
+            'in_flight': 0,
+        }
+
+    def test_keep_alive_disabled(self, local_server):
+        session = HttpSession(keep_alive=False)
+        headers = {'Accept': 'application/json'}
+        for i in range(2):
+            session.get('{}/{}'.format(local_server, i), headers=headers)
+
+        # the caller's headers are left alone
+        assert headers == {'Accept': 'application/json'}
+        stats = session.get_pool_stats()
+        assert stats['new_connections'] == 2
+        assert stats['hits'] == 0
+
+    def test_stream_in_flight(self, local_server):
+        session = HttpSession()
+        stream = session.get('{}/stream'.format(local_server), stream=True)
+        assert session.get_pool_stats()['in_flight'] == 1
+        with stream as r:
+            assert b''.join(r.iter_lines()) == b'{"path": "/stream"}'
+        assert session.get_pool_stats()['in_flight'] == 0
+
+        session.get('{}/after'.format(local_server))
+        assert session.get_pool_stats()['new_connections'] == 1
+
+    def test_failed_request_not_in_flight(self):
+        session = HttpSession()
+        (flexmock(HttpStream)
+            .should_receive('__init__')
+            .and_raise(requests.exceptions.ConnectionError('')))
+        with pytest.raises(OsbsException):
+            session.get('http://127.0.0.1:1/')
+
+        assert session.get_pool_stats()['in_flight'] == 0
+
+    def test_sessions_per_retry_setting(self):
+        session = HttpSession(pool_maxsize=3)
+        with_retries = session._get_session(True)
+        assert session._get_session(True) is with_retries
+        assert session._get_session(False) is not with_retries
+        adapter = with_retries.get_adapter('https://example.com')
+        assert adapter._pool_maxsize == 3
+        assert adapter.max_retries.total > 0
+        assert session._get_session(False).get_adapter('https://example.com').max_retries.total == 0
+
+
+class TestBackoffRetry(object):
+    def test_jitter(self):
+        retry = BackoffRetry(total=20, backoff_factor=2, max_backoff=30)
+        delays = []
+        for _ in range(20):
+            retry = retry.increment('GET', '/', error=NewConnectionError(None, 'refused'))
+            delays.append(retry.get_backoff_time())
+
+        assert all(2 <= delay <= 30 for delay in delays)
+        assert len(set(delays)) > 1
+        with pytest.raises(MaxRetryError):
+            retry.increment('GET', '/', error=NewConnectionError(None, 'refused'))
+
+    def test_deadline(self):
+        (flexmock(time)
+            .should_receive('monotonic')
+            .and_return(100)
+            .and_return(100)
+            .and_return(200))
+        retry = BackoffRetry(total=8, backoff_factor=1, max_backoff=2, deadline=60)
+        retry = retry.increment('GET', '/', error=NewConnectionError(None, 'refused'))
+        with pytest.raises(MaxRetryError):
+            retry.increment('GET', '/', error=NewConnectionError(None, 'refused'))
+
+    @pytest.mark.parametrize(('retry_after', 'exceeded'), [
+        ('30', False),
+        ('120', True),
+    ])
+    def test_retry_after_within_deadline(self, retry_after, exceeded):
+        retry = BackoffRetry(total=8, backoff_factor=1, deadline=60, status_forcelist=[503])
+        response = HTTPResponse(status=503, headers={'Retry-After': retry_after})
+        if exceeded:
+            with pytest.raises(MaxRetryError):
+                retry.increment('GET', '/', response=response)
+        else:
+            retry = retry.increment('GET', '/', response=response)
+            assert retry.get_retry_after(response) == int(retry_after)
+
+    def test_deadline_returns_last_response(self, status_server, monkeypatch):
+        monkeypatch.setattr(osbs.osbs_http, 'HTTP_RETRIES_DEADLINE', 0)
+        StatusHandler.responses = [(503, {}), (200, {})]
+        StatusHandler.requests = 0
+
+        response = HttpSession().get(status_server)
+        assert response.status_code == 503
+        assert StatusHandler.requests == 1
+        with pytest.raises(OsbsResponseException) as exc_info:
+            check_response(response)
+        assert exc_info.value.status_code == 503
+
+    def test_deadline_connection_error(self, monkeypatch):
+        monkeypatch.setattr(osbs.osbs_http, 'HTTP_RETRIES_DEADLINE', 0)
+        sock = socket.socket()
+        sock.bind(('127.0.0.1', 0))
+        url = 'http://127.0.0.1:{}'.format(sock.getsockname()[1])
+        # nothing listens on the port
+        sock.close()
+        flexmock(time).should_receive('sleep').never()
+
+        with pytest.raises(OsbsException) as exc_info:
+            HttpSession().get(url)
+        assert isinstance(exc_info.value.cause, requests.ConnectionError)
+
+    @pytest.mark.parametrize('status_code', [429, 503])
+    def test_retry_after_honoured(self, status_server, status_code):
+        StatusHandler.responses = [(status_code, {'Retry-After': '7'})]
+        sleeps = []
+        flexmock(time).should_receive('sleep').replace_with(sleeps.append)
+
+        response = HttpSession().get(status_server)
+        assert response.status_code == 200
+        assert sleeps == [7]
+
+
+class TestCircuitBreaker(object):
+    def test_open_after_failures(self, status_server):
+        StatusHandler.responses = [(500, {})] * 2
+        session = HttpSession(circuit_breaker_threshold=2, circuit_breaker_reset=60)
+        for _ in range(2):
+            assert session.get(status_server, retries_enabled=False).status_code == 500
+
+        with pytest.raises(OsbsCircuitOpenException) as exc_info:
+            session.get(status_server, retries_enabled=False)
+        assert 'circuit breaker' in exc_info.value.message
+        assert 0 < exc_info.value.retry_after <= 60
+        assert StatusHandler.requests == 2
+
+    def test_disabled_by_default(self, status_server):
+        StatusHandler.responses = [(500, {})] * 10
+        session = HttpSession()
+        for _ in range(10):
+            assert session.get(status_server, retries_enabled=False).status_code == 500
+        assert StatusHandler.requests == 10
+
+    def test_success_resets(self, status_server):
+        StatusHandler.responses = [(500, {}), (200, {}), (500, {}), (200, {})]
+        session = HttpSession(circuit_breaker_threshold=2)
+        for status_code in (500, 200, 500, 200):
+            assert session.get(status_server, retries_enabled=False).status_code == status_code
@@ -0,0 +1,187 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import json
+from copy import deepcopy
+
+import pytest
+import responses
+
+from osbs import informer as informer_module
+from osbs.exceptions import OsbsResponseException
+from osbs.tekton import Openshift, PipelineRun, TaskRun, Pod
+from tests.constants import TEST_OCP_NAMESPACE
+
+APIS_URL = 'https://openshift.testing/apis/tekton.dev/v1beta1'
+API_URL = 'https://openshift.testing/api/v1'
+PIPELINE_RUNS_URL = f'{APIS_URL}/namespaces/{TEST_OCP_NAMESPACE}/pipelineruns'
+PIPELINE_RUNS_WATCH_URL = f'{APIS_URL}/watch/namespaces/{TEST_OCP_NAMESPACE}/pipelineruns/'
+TASK_RUNS_URL = f'{APIS_URL}/namespaces/{TEST_OCP_NAMESPACE}/taskruns'
+TASK_RUNS_WATCH_URL = f'{APIS_URL}/watch/namespaces/{TEST_OCP_NAMESPACE}/taskruns/'
+PODS_URL = f'{API_URL}/namespaces/{TEST_OCP_NAMESPACE}/pods'
+PODS_WATCH_URL = f'{API_URL}/watch/namespaces/{TEST_OCP_NAMESPACE}/pods/'
+
+PIPELINE_RUN_NAME = 'source-default'
+PIPELINE_RUN_NAME2 = 'source-default2'
+
+
+def run_json(name, resource_version, status=None, reason=None, kind='PipelineRun'):
+    obj = {
+        'kind': kind,
+        'metadata': {'name': name, 'resourceVersion': resource_version},
+        'status': {},
+    }
+    if status:
+        obj['status']['conditions'] = [{'status': status, 'reason': reason}]
+    return obj
+
+
+def pod_json(name, resource_version, phase):
+    return {
+        'kind': 'Pod',
+        'metadata': {'name': name, 'resourceVersion': resource_version},
+        'status': {'phase': phase},
+    }
+
+
+def add_list(url, resource_version, *items):
+    responses.add(responses.GET, url,
+                  json={'metadata': {'resourceVersion': resource_version}, 'items': list(items)})
+
+
+def add_watch(url, *events):
+    body = '\n'.join(json.dumps({'type': event_type, 'object': obj})
+                     for event_type, obj in events)
+    responses.add(responses.GET, url, body=body)
+
+
+def count_calls(url):
+    return len([call for call in responses.calls if call.request.url.split('?')[0] == url])
+
+
+@pytest.fixture
+def openshift():
+    os = Openshift(openshift_api_url="https://openshift.testing/",
+                   openshift_oauth_url="https://openshift.testing/oauth/authorize",
+                   namespace=TEST_OCP_NAMESPACE,
+                   use_informers=True)
+    # keep requests mocked until background threads exit
+    responses.start()
+    yield os
+    os.stop_informers(wait=True)
+    responses.stop()
+    responses.reset()
+
+
+class TestInformer(object):
+
+    def test_pipeline_runs_share_watch(self, openshift):
+        add_list(PIPELINE_RUNS_URL, '10',
+                 run_json(PIPELINE_RUN_NAME, '9', 'Unknown', 'Started'),
+                 run_json(PIPELINE_RUN_NAME2, '8', 'Unknown', 'Running'))
+        running = run_json(PIPELINE_RUN_NAME, '11', 'Unknown', 'Running')
+        add_watch(PIPELINE_RUNS_WATCH_URL, ('MODIFIED', running))
+        add_watch(PIPELINE_RUNS_WATCH_URL)
+
+        assert PipelineRun(openshift, PIPELINE_RUN_NAME).wait_for_start() == running
+        assert PipelineRun(openshift, PIPELINE_RUN_NAME2).wait_for_start() == \
+            run_json(PIPELINE_RUN_NAME2, '8', 'Unknown', 'Running')
+
+        informer = openshift.get_informer('apis', 'tekton.dev/v1beta1', 'pipelineruns')
+        assert informer.resource_version == '11'
+        # objects were listed once and no object was fetched separately
+        assert count_calls(PIPELINE_RUNS_URL) == 1
+        assert count_calls(f'{PIPELINE_RUNS_URL}/{PIPELINE_RUN_NAME}') == 0
+        watch_request = [call.request for call in responses.calls
+                         if call.request.url.startswith(PIPELINE_RUNS_WATCH_URL)][0]
+        assert 'resourceVersion=10' in watch_request.url
+
+    def test_wait_for_finish(self, openshift):
+        running = run_json(PIPELINE_RUN_NAME, '9', 'Unknown', 'Running')
+        responses.add(responses.GET, f'{PIPELINE_RUNS_URL}/{PIPELINE_RUN_NAME}', json=running)
+        add_list(PIPELINE_RUNS_URL, '10', running)
+        succeeded = run_json(PIPELINE_RUN_NAME, '11', 'True', 'Succeeded')
+        add_watch(PIPELINE_RUNS_WATCH_URL, ('MODIFIED', succeeded))
+        add_watch(PIPELINE_RUNS_WATCH_URL)
+
+        assert PipelineRun(openshift, PIPELINE_RUN_NAME).wait_for_finish(timeout=5) is True
+
+    def test_removed(self, openshift):
+        started = run_json(PIPELINE_RUN_NAME, '9', 'Unknown', 'Started')
+        add_list(PIPELINE_RUNS_URL, '10', started)
+        add_watch(PIPELINE_RUNS_WATCH_URL, ('DELETED', started))
+        add_watch(PIPELINE_RUNS_WATCH_URL)
+
+        assert PipelineRun(openshift, PIPELINE_RUN_NAME).wait_for_start() is None
+
+    def test_not_existing(self, openshift):
+        add_list(PIPELINE_RUNS_URL, '10')
+        add_watch(PIPELINE_RUNS_WATCH_URL)
+        responses.add(responses.GET, f'{PIPELINE_RUNS_URL}/{PIPELINE_RUN_NAME}',
+                      json={}, status=404)
+
+        assert PipelineRun(openshift, PIPELINE_RUN_NAME).wait_for_start() is None
+
+    def test_relist_when_expired(self, openshift):
+        add_list(PIPELINE_RUNS_URL, '10', run_json(PIPELINE_RUN_NAME, '9', 'Unknown', 'Started'))
+        running = run_json(PIPELINE_RUN_NAME, '30', 'Unknown', 'Running')
+        add_list(PIPELINE_RUNS_URL, '31', running)
+        add_watch(PIPELINE_RUNS_WATCH_URL, ('ERROR', {'kind': 'Status', 'code': 410}))
+        add_watch(PIPELINE_RUNS_WATCH_URL)
+
+        assert PipelineRun(openshift, PIPELINE_RUN_NAME).wait_for_start() == running
+        assert count_calls(PIPELINE_RUNS_URL) == 2
+
+    def test_timeout(self, openshift):
+        add_list(PIPELINE_RUNS_URL, '10', run_json(PIPELINE_RUN_NAME, '9', 'Unknown', 'Started'))
+        add_watch(PIPELINE_RUNS_WATCH_URL)
+
+        informer = openshift.get_informer('apis', 'tekton.dev/v1beta1', 'pipelineruns')
+        assert informer.wait_for(PIPELINE_RUN_NAME, lambda obj: False, timeout=0.1) is None
+        assert informer.get(PIPELINE_RUN_NAME)['metadata']['resourceVersion'] == '9'
+
+    def test_task_run_and_pod(self, openshift):
+        task_run = run_json('task-run', '5', 'Unknown', 'Pending', kind='TaskRun')
+        add_list(TASK_RUNS_URL, '5', task_run)
+        running_task_run = run_json('task-run', '6', 'Unknown', 'Running', kind='TaskRun')
+        add_watch(TASK_RUNS_WATCH_URL, ('ADDED', run_json('other', '6', kind='TaskRun')),
+                  ('MODIFIED', running_task_run))
+        add_watch(TASK_RUNS_WATCH_URL)
+
+        add_list(PODS_URL, '7')
+        running_pod = pod_json('pod', '9', 'Running')
+        add_watch(PODS_WATCH_URL, ('ADDED', pod_json('pod', '8', 'Pending')),
+                  ('MODIFIED', running_pod))
+        add_watch(PODS_WATCH_URL)
+        responses.add(responses.GET, f'{PODS_URL}/pod', json=pod_json('pod', '8', 'Pending'))
+
+        assert TaskRun(openshift, 'task-run').wait_for_start() == running_task_run
+        assert Pod(openshift, 'pod').wait_for_start() == running_pod
+
+    def test_failed_watch(self, openshift, caplog, monkeypatch):
+        monkeypatch.setattr(informer_module, 'INFORMER_RETRY_SECS', 0)
+        monkeypatch.setattr(informer_module, 'INFORMER_MAX_BAD_RESPONSES', 1)
+        responses.add(responses.GET, PIPELINE_RUNS_URL, json={'message': 'forbidden'},
+                      status=403)
+
+        informer = openshift.get_informer('apis', 'tekton.dev/v1beta1', 'pipelineruns')
+        with pytest.raises(OsbsResponseException):
+            informer.get(PIPELINE_RUN_NAME)
+        assert 'Watch of pipelineruns stopped' in caplog.text
+
+    def test_disabled(self):
+        os = Openshift(openshift_api_url="https://openshift.testing/",
+                       openshift_oauth_url="https://openshift.testing/oauth/authorize",
+                       namespace=TEST_OCP_NAMESPACE)
+        pipeline_run = run_json(PIPELINE_RUN_NAME, '9', 'Unknown', 'Running')
+
+        def custom_watch(*args, **kwargs):
+            yield deepcopy(pipeline_run)
+
+        os.watch_resource = custom_watch
+        assert PipelineRun(os, PIPELINE_RUN_NAME).wait_for_start() == pipeline_run
+        assert os._informers == {}
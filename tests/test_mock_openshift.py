@@ -0,0 +1,239 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+
+
+Tests of osbs.tekton against the in-process mock OpenShift API server
+"""
+import threading
+import time
+
+import pytest
+from flexmock import flexmock
+
+from osbs.exceptions import OsbsNetworkException, OsbsResponseException
+from osbs.tekton import API_VERSION, PipelineRun, Pod, list_pipeline_runs_status
+from osbs.utils import metrics
+from tests.constants import TEST_OCP_NAMESPACE
+from tests.mock_openshift import MockOpenShift, match_labels, merge_patch
+
+PIPELINE_RUN_NAME = 'mock-pipeline-run'
+
+
+def pipeline_run_data(name=PIPELINE_RUN_NAME, labels=None):
+    return {
+        'apiVersion': API_VERSION,
+        'kind': 'PipelineRun',
+        'metadata': {'name': name, 'labels': labels or {}},
+        'spec': {'pipelineRef': {'name': 'binary-container'}},
+    }
+
+
+def test_merge_patch():
+    target = {'a': 1, 'b': {'c': 2, 'd': 3}, 'e': [1, 2]}
+    patch = {'a': None, 'b': {'c': 4}, 'e': [3]}
+    assert merge_patch(target, patch) == {'b': {'c': 4, 'd': 3}, 'e': [3]}
+    assert target['a'] == 1
+
+
+@pytest.mark.parametrize(('selector', 'expected'), [
+    (None, True),
+    ('app=osbs', True),
+    ('app==osbs', True),
+    ('app=other', False),
+    ('app=osbs,tier=build', True),
+    ('app in (other, osbs)', True),
+    ('app in (other),tier=build', False),
+])
+def test_match_labels(selector, expected):
+    obj = {'metadata': {'labels': {'app': 'osbs', 'tier': 'build'}}}
+    assert match_labels(obj, selector) == expected
+
+
+def test_pipeline_run_crud(mock_openshift):
+    os = mock_openshift.openshift()
+    pipeline_run = PipelineRun(os, PIPELINE_RUN_NAME, pipeline_run_data())
+
+    created = pipeline_run.start_pipeline_run()
+    assert created['metadata']['namespace'] == TEST_OCP_NAMESPACE
+    assert pipeline_run.get_info()['metadata']['uid'] == created['metadata']['uid']
+
+    with pytest.raises(OsbsResponseException) as exc_info:
+        pipeline_run.start_pipeline_run()
+    assert exc_info.value.status_code == 409
+
+    pipeline_run.cancel_pipeline_run()
+    assert pipeline_run.get_info()['spec']['status'] == 'CancelledRunFinally'
+
+    pipeline_run.remove_pipeline_run()
+    assert pipeline_run.get_info() is None
+    assert mock_openshift.requests[('POST', 'pipelineruns')] == 2
+    assert mock_openshift.requests[('PATCH', 'pipelineruns')] == 1
+
+
+def test_simulated_pipeline_run():
+    with MockOpenShift(namespace=TEST_OCP_NAMESPACE, simulate=True, log_lines=2) as server:
+        os = server.openshift()
+        pipeline_run = PipelineRun(os, PIPELINE_RUN_NAME, pipeline_run_data())
+        pipeline_run.start_pipeline_run()
+
+        logs = list(pipeline_run.get_logs(follow=True))
+        assert pipeline_run.wait_for_finish(timeout=10)
+        assert pipeline_run.has_succeeded()
+
+    assert logs == [('binary-container-build', 'step-build line 0'),
+                    ('binary-container-build', 'step-build line 1')]
+
+
+def test_list_pipeline_runs_status(mock_openshift):
+    mock_openshift.create('pipelineruns', pipeline_run_data('ok', {'app': 'osbs'}))
+    mock_openshift.create('pipelineruns', pipeline_run_data('failed', {'app': 'osbs'}))
+    mock_openshift.create('pipelineruns', pipeline_run_data('other', {'app': 'other'}))
+    mock_openshift.run_pipeline_run('ok')
+    mock_openshift.run_pipeline_run('failed', succeeded=False)
+
+    statuses = list_pipeline_runs_status(mock_openshift.openshift(), label_selector='app=osbs')
+    assert sorted(statuses) == ['failed', 'ok']
+    assert statuses['ok'].status == 'True'
+    assert statuses['failed'].status == 'False'
+
+
+def test_list_pagination(mock_openshift):
+    for i in range(5):
+        mock_openshift.create('pipelineruns', pipeline_run_data('run-{}'.format(i)))
+
+    listed = mock_openshift.openshift().list_resource('apis', API_VERSION, 'pipelineruns',
+                                                      limit=2)
+    assert [item['metadata']['name'] for item in listed['items']] == \
+        ['run-{}'.format(i) for i in range(5)]
+    assert mock_openshift.requests[('GET', 'pipelineruns')] == 3
+
+
+def test_watch_events(mock_openshift):
+    mock_openshift.create('pipelineruns', pipeline_run_data())
+    os = mock_openshift.openshift()
+    resource_version = mock_openshift.get('pipelineruns', PIPELINE_RUN_NAME)[
+        'metadata']['resourceVersion']
+    mock_openshift.update('pipelineruns', PIPELINE_RUN_NAME, {'spec': {'status': 'x'}})
+    mock_openshift.delete('pipelineruns', PIPELINE_RUN_NAME)
+
+    events = list(os.watch_events('apis', API_VERSION, 'pipelineruns', PIPELINE_RUN_NAME,
+                                  resourceVersion=resource_version, timeoutSeconds=1,
+                                  allowWatchBookmarks='true'))
+    assert [event['type'] for event in events] == ['MODIFIED', 'DELETED', 'BOOKMARK']
+
+    mock_openshift.compact()
+    counted = []
+    sink = metrics.CallbackSink(counted.append)
+    metrics.add_sink(sink)
+    try:
+        events = list(os.watch_events('apis', API_VERSION, 'pipelineruns',
+                                      resourceVersion=resource_version, timeoutSeconds=1))
+    finally:
+        metrics.remove_sink(sink)
+    assert [(event['type'], event['object']['code']) for event in events] == [('ERROR', 410)]
+    assert [(m.name, m.labels) for m in counted if m.kind == metrics.COUNT] == [
+        ('watch_streams', {'resource_type': 'pipelineruns'}),
+        ('watch_events', {'resource_type': 'pipelineruns', 'type': 'ERROR'}),
+    ]
+
+
+def test_informer(mock_openshift):
+    mock_openshift.create('pipelineruns', pipeline_run_data())
+    os = mock_openshift.openshift(use_informers=True)
+    try:
+        informer = os.get_informer('apis', API_VERSION, 'pipelineruns')
+        assert informer.get(PIPELINE_RUN_NAME)['metadata']['name'] == PIPELINE_RUN_NAME
+
+        mock_openshift.update('pipelineruns', PIPELINE_RUN_NAME, {'spec': {'status': 'x'}})
+        pipeline_run = informer.wait_for(PIPELINE_RUN_NAME,
+                                         lambda obj: obj.get('spec', {}).get('status'),
+                                         timeout=10)
+        assert pipeline_run['spec']['status'] == 'x'
+    finally:
+        os.stop_informers()
+
+
+def test_log_resume(monkeypatch):
+    monkeypatch.setattr('osbs.tekton.LOG_RESUME_WAIT_SECS', 0.5)
+    with MockOpenShift(namespace=TEST_OCP_NAMESPACE, log_stream_timeout=0.3) as server:
+        server.create('pods', {'metadata': {'name': 'pod'}, 'status': {
+            'containerStatuses': [{'name': 'step', 'state': {'running': {}}}]}})
+        server.append_log('pod', 'step', 'line 0', 'line 1')
+
+        def finish():
+            server.append_log('pod', 'step', 'line 2', 'line 3')
+            server.finish_container('pod', 'step')
+
+        # the first stream is closed before the rest of the log is written
+        timer = threading.Timer(0.4, finish)
+        timer.start()
+        pod = Pod(server.openshift(), 'pod', containers=['step'])
+        assert list(pod._stream_logs('step')) == ['line 0', 'line 1', 'line 2', 'line 3']
+        timer.join()
+
+
+def log_threads():
+    return [thread for thread in threading.enumerate() if thread.name.startswith('osbs-logs-')]
+
+
+def test_follow_logs_stopped_early(mock_openshift):
+    running = {'conditions': [{'type': 'Succeeded', 'status': 'Unknown', 'reason': 'Running'}],
+               'startTime': '2022-01-01T00:00:00Z'}
+    mock_openshift.create('pods', {'metadata': {'name': 'pod'}, 'status': {
+        'phase': 'Running', 'containerStatuses': [{'name': 'step-build', 'state': {'running': {}}}]
+    }})
+    mock_openshift.create('taskruns', {'metadata': {'name': 'task-run'}, 'status': dict(
+        running, podName='pod', steps=[{'name': 'build', 'container': 'step-build'}])})
+    data = pipeline_run_data()
+    data['status'] = dict(running, childReferences=[
+        {'kind': 'TaskRun', 'name': 'task-run', 'pipelineTaskName': 'build'}])
+    mock_openshift.create('pipelineruns', data)
+    mock_openshift.append_log('pod', 'step-build', 'line 0')
+
+    logs = PipelineRun(mock_openshift.openshift(), PIPELINE_RUN_NAME).follow_logs()
+    assert next(logs) == ('build', 'step-build', 'line 0')
+    # threads are blocked in the watch of the pipeline run and in the log stream
+    assert log_threads()
+    logs.close()
+
+    deadline = time.monotonic() + 10
+    while log_threads() and time.monotonic() < deadline:
+        time.sleep(0.1)
+    assert not log_threads()
+
+
+def test_injected_errors(mock_openshift):
+    flexmock(time).should_receive('sleep')
+    mock_openshift.create('pipelineruns', pipeline_run_data())
+    os = mock_openshift.openshift()
+    pipeline_run = PipelineRun(os, PIPELINE_RUN_NAME)
+
+    # retried by the http session
+    mock_openshift.inject_error(503, count=2)
+    assert pipeline_run.get_info()['metadata']['name'] == PIPELINE_RUN_NAME
+    assert mock_openshift.requests[('GET', 'pipelineruns')] == 3
+
+    mock_openshift.inject_error(403)
+    with pytest.raises(OsbsResponseException) as exc_info:
+        pipeline_run.get_info()
+    assert exc_info.value.status_code == 403
+
+
+def test_error_rate():
+    flexmock(time).should_receive('sleep')
+    with MockOpenShift(namespace=TEST_OCP_NAMESPACE, error_rate=1) as server:
+        pipeline_run = PipelineRun(server.openshift(), PIPELINE_RUN_NAME)
+        with pytest.raises((OsbsNetworkException, OsbsResponseException)):
+            pipeline_run.get_info()
+
+
+def test_latency():
+    with MockOpenShift(namespace=TEST_OCP_NAMESPACE, latency=0.2) as server:
+        pipeline_run = PipelineRun(server.openshift(), PIPELINE_RUN_NAME)
+        start = time.monotonic()
+        assert pipeline_run.get_info() is None
+        assert time.monotonic() - start >= 0.2
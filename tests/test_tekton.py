@@ -5,8 +5,12 @@ All rights reserved.
 This software may be modified and distributed under the terms
 of the BSD license. See the LICENSE file for details.
 """
+import io
 import json
+import os
 import re
+import requests
+import threading
 import time
 import responses
 import pytest
@@ -15,8 +19,12 @@ from copy import deepcopy
 from flexmock import flexmock
 
 from osbs.tekton import (Openshift, PipelineRun, TaskRun, Pod, API_VERSION, WAIT_RETRY_SECS,
-                         WAIT_RETRY)
-from osbs.exceptions import OsbsException
+                         WAIT_POLL_MAX_SECS, PipelineRunStatus, _LogMultiplexer,
+                         list_pipeline_runs_status, LogCursor, LOG_RESUME_MAX_RETRIES,
+                         STATUS_GET_MAX_NAMES, WATCH_RETRY, WATCH_RETRY_SECS,
+                         LOG_RESUME_WAIT_SECS)
+from osbs.exceptions import OsbsException, OsbsResponseException
+from osbs.osbs_http import HttpStream
 from tests.constants import TEST_PIPELINE_RUN_TEMPLATE, TEST_OCP_NAMESPACE
 
 PIPELINE_NAME = 'source-container-0-1'
@@ -29,6 +37,8 @@ PIPELINE_WATCH_URL = f'https://openshift.testing/apis/tekton.dev/v1beta1/watch/n
 TASK_RUN_URL = f'https://openshift.testing/apis/tekton.dev/v1beta1/namespaces/{TEST_OCP_NAMESPACE}/taskruns/{TASK_RUN_NAME}' # noqa E501
 TASK_RUN_URL2 = f'https://openshift.testing/apis/tekton.dev/v1beta1/namespaces/{TEST_OCP_NAMESPACE}/taskruns/{TASK_RUN_NAME2}' # noqa E501
 TASK_RUN_URL3 = f'https://openshift.testing/apis/tekton.dev/v1beta1/namespaces/{TEST_OCP_NAMESPACE}/taskruns/{TASK_RUN_NAME3}' # noqa E501
+TASK_RUNS_URL = f'https://openshift.testing/apis/tekton.dev/v1beta1/namespaces/{TEST_OCP_NAMESPACE}/taskruns' # noqa E501
+TASK_RUNS_SELECTOR = {'labelSelector': f'tekton.dev/pipelineRun={PIPELINE_RUN_NAME}'}
 TASK_RUN_WATCH_URL = f"https://openshift.testing/apis/tekton.dev/v1beta1/watch/namespaces/{TEST_OCP_NAMESPACE}/taskruns/{TASK_RUN_NAME}/" # noqa E501
 TASK_RUN_WATCH_URL2 = f"https://openshift.testing/apis/tekton.dev/v1beta1/watch/namespaces/{TEST_OCP_NAMESPACE}/taskruns/{TASK_RUN_NAME2}/" # noqa E501
 
@@ -88,6 +98,7 @@ TASK_RUN_JSON = {
     "apiVersion": "tekton.dev/v1beta1",
     "kind": "TaskRun",
     "metadata": {
+        "name": TASK_RUN_NAME,
         "labels": {
             "tekton.dev/pipelineTask": "short-sleep",
         }
@@ -117,6 +128,7 @@ TASK_RUN_JSON2 = {
     "apiVersion": "tekton.dev/v1beta1",
     "kind": "TaskRun",
     "metadata": {
+        "name": TASK_RUN_NAME2,
         "labels": {
             "tekton.dev/pipelineTask": "short2-sleep",
         }
@@ -146,6 +158,7 @@ TASK_RUN_JSON3 = {
     "apiVersion": "tekton.dev/v1beta1",
     "kind": "TaskRun",
     "metadata": {
+        "name": TASK_RUN_NAME3,
         "labels": {
             "tekton.dev/pipelineTask": "short3-sleep",
         }
@@ -242,6 +255,15 @@ PIPELINE_MINIMAL_DATA = {
 }
 
 
+def add_task_runs_list(*task_runs, **list_metadata):
+    responses.add(
+        responses.GET,
+        TASK_RUNS_URL,
+        json={'kind': 'TaskRunList', 'metadata': list_metadata, 'items': list(task_runs)},
+        match=[responses.matchers.query_param_matcher(TASK_RUNS_SELECTOR, strict_match=False)],
+    )
+
+
 @pytest.fixture(scope='module')
 def openshift():
     return Openshift(openshift_api_url="https://openshift.testing/",
@@ -265,6 +287,68 @@ def pod(openshift):
     return Pod(os=openshift, pod_name=POD_NAME, containers=CONTAINERS)
 
 
+@pytest.fixture
+def circuit_breaker_os():
+    """
+    Openshift whose requests fail immediately after a failed one, for 30 seconds
+
+    :return: (Openshift, list of seconds of sleeps, which advance time.monotonic)
+    """
+    now = [0]
+    sleeps = []
+
+    def sleep(secs):
+        sleeps.append(secs)
+        now[0] += secs
+
+    flexmock(time).should_receive('sleep').replace_with(sleep)
+    flexmock(time).should_receive('monotonic').replace_with(lambda: now[0])
+    os = Openshift(openshift_api_url="https://openshift.testing/",
+                   openshift_oauth_url="https://openshift.testing/oauth/authorize",
+                   namespace=TEST_OCP_NAMESPACE,
+                   http_circuit_breaker_threshold=1, http_circuit_breaker_reset=30)
+    return os, sleeps
+
+
+class TestOpenshift():
+
+    @responses.activate
+    def test_rate_limit(self):
+        sleeps = []
+        flexmock(time).should_receive('sleep').replace_with(sleeps.append)
+        flexmock(time).should_receive('monotonic').and_return(0)
+        os = Openshift(openshift_api_url="https://openshift.testing/",
+                       openshift_oauth_url="https://openshift.testing/oauth/authorize",
+                       namespace=TEST_OCP_NAMESPACE, api_qps=10, api_burst=2)
+        responses.add(responses.GET, POD_URL, json=POD_JSON)
+
+        for _ in range(4):
+            os.get(POD_URL)
+
+        assert len(responses.calls) == 4
+        assert sleeps == [pytest.approx(0.1), pytest.approx(0.2)]
+        stats = os.get_rate_limiter_stats()
+        assert stats['requests'] == 4
+        assert stats['throttled'] == 2
+        assert stats['wait_seconds'] == pytest.approx(0.3)
+
+    def test_no_rate_limit(self, openshift):
+        assert openshift.get_rate_limiter_stats() is None
+
+    @responses.activate
+    def test_watch_resource_circuit_open(self, circuit_breaker_os):
+        openshift, sleeps = circuit_breaker_os
+        responses.add(responses.GET, POD_URL, body=requests.ConnectionError('refused'))
+        responses.add(responses.GET, POD_URL, json=POD_JSON)
+
+        watch = openshift.watch_resource('api', 'v1', 'pods', POD_NAME)
+        # watching continues once the server is tried again
+        assert next(watch) == POD_JSON
+        assert sleeps == [WATCH_RETRY_SECS, 30 - WATCH_RETRY_SECS]
+        assert len(responses.calls) == 2
+        watch.close()
+
+
 class TestPod():
 
     @responses.activate
@@ -286,7 +370,40 @@ class TestPod():
                       json=POD_JSON)
         resp = pod.wait_for_start()
 
+        # object is already running, no need to watch it
+        assert len(responses.calls) == 1
+        assert resp == POD_JSON
+
+    @responses.activate
+    def test_wait_for_start_from_watch_event(self, pod):
+        pending_pod = deepcopy(POD_JSON)
+        pending_pod['metadata']['resourceVersion'] = '10'
+        pending_pod['status']['phase'] = 'Pending'
+        running_pod = deepcopy(POD_JSON)
+        running_pod['metadata']['resourceVersion'] = '11'
+        responses.add(responses.GET, POD_URL, json=pending_pod)
+        responses.add(responses.GET, POD_WATCH_URL,
+                      json={'type': 'MODIFIED', 'object': running_pod})
+        resp = pod.wait_for_start()
+
+        # object is fetched once, the update comes from the watch event payload
         assert len(responses.calls) == 2
+        assert resp == running_pod
+        assert 'resourceVersion=10' in responses.calls[1].request.url
+
+    @responses.activate
+    def test_wait_for_start_expired_resource_version(self, pod):
+        flexmock(time).should_receive('sleep')
+        pending_pod = deepcopy(POD_JSON)
+        pending_pod['metadata']['resourceVersion'] = '10'
+        pending_pod['status']['phase'] = 'Pending'
+        responses.add(responses.GET, POD_URL, json=pending_pod)
+        responses.add(responses.GET, POD_WATCH_URL,
+                      json={'type': 'ERROR', 'object': {'kind': 'Status', 'code': 410}})
+        responses.add(responses.GET, POD_URL, json=POD_JSON)
+        resp = pod.wait_for_start()
+
+        assert len(responses.calls) == 3
         assert resp == POD_JSON
 
     @responses.activate
@@ -321,11 +438,43 @@ class TestPod():
     def test_get_logs(self, pod):
         for container in CONTAINERS:
             url = f"{POD_URL}/log?container={container}"
-            responses.add(responses.GET, url, body=EXPECTED_LOGS[container])
+            # logs are read in chunks from streamed responses
+            responses.add(responses.GET, url, body=EXPECTED_LOGS[container],
+                          match=[responses.matchers.request_kwargs_matcher({"stream": True})])
+        in_flight = pod.os.get_http_pool_stats()['in_flight']
         logs = pod.get_logs()
 
         assert len(responses.calls) == 3
         assert logs == EXPECTED_LOGS
+        assert pod.os.get_http_pool_stats()['in_flight'] == in_flight
+
+    @responses.activate
+    def test_write_logs(self, pod):
+        in_flight = pod.os.get_http_pool_stats()['in_flight']
+        body = b'line\n' * 50000
+        url = f"{POD_URL}/log?container={CONTAINERS[0]}"
+        responses.add(responses.GET, url, body=body,
+                      match=[responses.matchers.request_kwargs_matcher({"stream": True})])
+
+        sink = io.BytesIO()
+        assert pod.write_logs(sink, CONTAINERS[0]) == len(body)
+        assert sink.getvalue() == body
+
+        responses.add(responses.GET, url, body=body)
+        chunks = list(pod.iter_log_chunks(CONTAINERS[0], chunk_size=1000))
+        assert len(chunks) == len(body) // 1000
+        # the streamed responses are closed
+        assert pod.os.get_http_pool_stats()['in_flight'] == in_flight
+
+    @responses.activate
+    def test_write_logs_error(self, pod):
+        in_flight = pod.os.get_http_pool_stats()['in_flight']
+        url = f"{POD_URL}/log?container={CONTAINERS[0]}"
+        responses.add(responses.GET, url, body='not found', status=404)
+
+        with pytest.raises(OsbsResponseException):
+            pod.write_logs(io.BytesIO(), CONTAINERS[0])
+        assert pod.os.get_http_pool_stats()['in_flight'] == in_flight
 
     @responses.activate
     def test_get_logs_stream(self, pod):
@@ -336,7 +485,7 @@ class TestPod():
         )
         responses.add(responses.GET, POD_URL, json=POD_JSON)
         for container in CONTAINERS:
-            url = f"{POD_URL}/log?follow=True&container={container}"
+            url = f"{POD_URL}/log?follow=True&timestamps=true&container={container}"
             responses.add(
                 responses.GET,
                 url,
@@ -346,8 +495,150 @@ class TestPod():
 
         logs = [line for line in pod.get_logs(wait=True, follow=True)]
 
-        assert len(responses.calls) == 5
-        assert logs == ['Hello World', 'Bye World']
+        # watch and a log of each of 3 containers, logs ended properly,
+        # so the pod isn't fetched to check whether containers terminated
+        assert len(responses.calls) == 4
+        # containers are followed at the same time
+        assert sorted(logs) == ['Bye World', 'Hello World']
+
+    def test_get_logs_stream_parallel(self, pod):
+        flexmock(pod).should_receive('wait_for_start').and_return(POD_JSON)
+        second_read = threading.Event()
+
+        def stream_logs(container, cursor=None, multiplexer=None):
+            if container == CONTAINERS[0]:
+                # waits until a line of another container was yielded
+                assert second_read.wait(10)
+                yield 'first'
+            elif container == CONTAINERS[1]:
+                yield 'second'
+
+        flexmock(pod).should_receive('_stream_logs').replace_with(stream_logs)
+        logs = pod.get_logs(follow=True)
+        assert next(logs) == 'second'
+        second_read.set()
+        assert list(logs) == ['first']
+
+    @staticmethod
+    def add_container_state(state):
+        pod_json = deepcopy(POD_JSON)
+        pod_json['status']['containerStatuses'] = [{'name': CONTAINERS[0], 'state': {state: {}}}]
+        responses.add(responses.GET, POD_URL, json=pod_json)
+
+    @staticmethod
+    def interrupt_first_stream(monkeypatch):
+        """
+        Make the first log stream end by a broken connection
+        """
+        iter_lines = HttpStream.iter_lines
+        streams = []
+
+        def interrupted_iter_lines(stream):
+            streams.append(stream)
+            yield from iter_lines(stream)
+            if len(streams) == 1:
+                stream.interrupted = True
+
+        monkeypatch.setattr(HttpStream, 'iter_lines', interrupted_iter_lines)
+
+    @responses.activate
+    def test_stream_logs_resume(self, pod, monkeypatch):
+        flexmock(time).should_receive('sleep')
+        self.interrupt_first_stream(monkeypatch)
+        url = f"{POD_URL}/log?follow=True&timestamps=true&container={CONTAINERS[0]}"
+        responses.add(responses.GET, url,
+                      body='2022-01-01T00:00:00.1Z a\n2022-01-01T00:00:00.2Z b\n')
+        # the stream was interrupted and the container is still running
+        self.add_container_state('running')
+        responses.add(responses.GET, f"{url}&sinceTime=2022-01-01T00:00:00Z",
+                      body='2022-01-01T00:00:00.1Z a\n2022-01-01T00:00:00.2Z b\n'
+                           '2022-01-01T00:00:00.2Z c\n2022-01-01T00:00:00.12Z x\n'
+                           '2022-01-01T00:00:01Z d e\n')
+
+        cursor = LogCursor()
+        assert list(pod._stream_logs(CONTAINERS[0], cursor)) == ['a', 'b', 'c', 'd e']
+        assert cursor.to_dict() == {'timestamp': '2022-01-01T00:00:01Z', 'delivered': 1}
+        # the second stream ended properly, so the pod was fetched only once
+        assert [call.request.url for call in responses.calls].count(POD_URL) == 1
+
+    @responses.activate
+    @pytest.mark.parametrize('interrupted', [True, False])
+    def test_stream_logs_informer_state(self, pod, monkeypatch, interrupted):
+        if interrupted:
+            self.interrupt_first_stream(monkeypatch)
+        url = f"{POD_URL}/log?follow=True&timestamps=true&container={CONTAINERS[0]}"
+        responses.add(responses.GET, url, body='2022-01-01T00:00:00.1Z a\n')
+        pod_json = deepcopy(POD_JSON)
+        pod_json['status']['containerStatuses'] = [
+            {'name': CONTAINERS[0], 'state': {'terminated': {}}}]
+        informer = flexmock()
+        informer.should_receive('get').with_args(POD_NAME).and_return(pod_json).once()
+        monkeypatch.setattr(pod.os, 'use_informers', True)
+        flexmock(pod.os).should_receive('get_informer').and_return(informer)
+
+        # the container state is taken from the cache, the pod isn't fetched
+        assert list(pod._stream_logs(CONTAINERS[0])) == ['a']
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_stream_logs_from_cursor(self, pod):
+        url = (f"{POD_URL}/log?follow=True&timestamps=true&container={CONTAINERS[0]}"
+               "&sinceTime=2022-01-01T00:00:00Z")
+        responses.add(responses.GET, url,
+                      body='2022-01-01T00:00:00.5Z a\n2022-01-01T00:00:00.5Z b\n'
+                           '2022-01-01T00:00:00.5Z c\nnot timestamped\n')
+
+        cursor = LogCursor.from_dict({'timestamp': '2022-01-01T00:00:00.5Z', 'delivered': 2})
+        assert list(pod._stream_logs(CONTAINERS[0], cursor)) == ['c', 'not timestamped']
+        assert cursor.delivered == 3
+
+    @pytest.mark.parametrize('data', [
+        {'timestamp': 'yesterday', 'delivered': 2},
+        {'timestamp': '2022-01-01T00:00:00.5', 'delivered': 1},
+        {'timestamp': 1640995200, 'delivered': 1},
+        {'timestamp': '2022-01-01T00:00:00.5Z', 'delivered': 'two'},
+        {'timestamp': '2022-01-01T00:00:00.5Z', 'delivered': -1},
+        {'delivered': 3},
+    ])
+    @responses.activate
+    def test_stream_logs_invalid_cursor(self, pod, data, caplog):
+        url = f"{POD_URL}/log?follow=True&timestamps=true&container={CONTAINERS[0]}"
+        responses.add(responses.GET, url,
+                      body='2022-01-01T00:00:00.5Z a\n2022-01-01T00:00:00.6Z b\n')
+
+        cursor = LogCursor.from_dict(data)
+        assert (cursor.timestamp, cursor.delivered) == (None, 0)
+        if 'timestamp' in data:
+            assert 'Ignoring invalid log cursor' in caplog.text
+        assert list(pod._stream_logs(CONTAINERS[0], cursor)) == ['a', 'b']
+
+        cursor.update(data)
+        assert (cursor.timestamp, cursor.delivered) == (None, 0)
+
+    @responses.activate
+    def test_stream_logs_circuit_open(self, circuit_breaker_os):
+        openshift, sleeps = circuit_breaker_os
+        pod = Pod(os=openshift, pod_name=POD_NAME, containers=CONTAINERS)
+        url = f"{POD_URL}/log?follow=True&timestamps=true&container={CONTAINERS[0]}"
+        responses.add(responses.GET, url, body=requests.ConnectionError('refused'))
+        responses.add(responses.GET, url, body='2022-01-01T00:00:00.5Z a\n')
+
+        # following waits until the server is tried again, it isn't a failed attempt
+        assert list(pod._stream_logs(CONTAINERS[0])) == ['a']
+        assert sleeps == [LOG_RESUME_WAIT_SECS, 30 - LOG_RESUME_WAIT_SECS]
+
+    @responses.activate
+    def test_stream_logs_give_up(self):
+        pod = Pod(os=Openshift(openshift_api_url="https://openshift.testing/",
+                               openshift_oauth_url="https://openshift.testing/oauth/authorize",
+                               namespace=TEST_OCP_NAMESPACE),
+                  pod_name=POD_NAME, containers=CONTAINERS)
+        flexmock(time).should_receive('sleep')
+        url = f"{POD_URL}/log?follow=True&timestamps=true&container={CONTAINERS[0]}"
+        responses.add(responses.GET, url, body=requests.ConnectionError('refused'))
+
+        assert list(pod._stream_logs(CONTAINERS[0])) == []
+        assert len(responses.calls) == LOG_RESUME_MAX_RETRIES + 1
 
     @responses.activate
     def test_get_logs_stream_removed(self, pod):
@@ -384,7 +675,7 @@ class TestTaskRun():
         responses.add(responses.GET, TASK_RUN_URL, json=TASK_RUN_JSON)
         resp = task_run.wait_for_start()
 
-        assert len(responses.calls) == 2
+        assert len(responses.calls) == 1
         assert resp == TASK_RUN_JSON
 
     @responses.activate
@@ -429,7 +720,7 @@ class TestTaskRun():
         responses.add(responses.GET, POD_URL,
                       json=POD_JSON)
         for container in CONTAINERS:
-            url = f"{POD_URL}/log?follow=True&container={container}"
+            url = f"{POD_URL}/log?follow=True&timestamps=true&container={container}"
             responses.add(
                 responses.GET,
                 url,
@@ -438,7 +729,7 @@ class TestTaskRun():
             )
 
         logs = [line for line in task_run.get_logs(follow=True, wait=True)]
-        assert logs == ['Hello World', 'Bye World']
+        assert sorted(logs) == ['Bye World', 'Hello World']
 
     @responses.activate
     def test_get_logs_wait_removed(self, task_run):
@@ -752,21 +1043,19 @@ class TestPipelineRun():
     ])  # noqa
     def test_get_error_message(self, pipeline_run, pipeline_json, tasks_json, error_lines):
         responses.add(responses.GET, PIPELINE_RUN_URL, json=pipeline_json)
-        taskrun_url = f'https://openshift.testing/apis/tekton.dev/v1beta1/namespaces/' \
-                      f'{TEST_OCP_NAMESPACE}/taskruns/'
-
+        task_runs = []
         for task in tasks_json:
             taskr_json = deepcopy(TASK_RUN_JSON)
             taskr_json['metadata']['name'] = task['metadata']['name']
             taskr_json['metadata']['labels'] = task['metadata']['labels']
             taskr_json['status'] = task['status']
-            task_url = f"{taskrun_url}{task['metadata']['name']}"
-
-            responses.add(responses.GET, task_url, json=taskr_json)
+            task_runs.append(taskr_json)
+        add_task_runs_list(*task_runs)
 
         resp = pipeline_run.get_error_message()
 
-        assert len(responses.calls) == (4 + 2*len(tasks_json) if pipeline_json else 1)
+        # pipeline run and task runs are fetched only once
+        assert len(responses.calls) == (2 if tasks_json else 1)
         assert resp == error_lines
 
     @responses.activate
@@ -842,7 +1131,9 @@ class TestPipelineRun():
     ])  # noqa
     def test_get_final_platforms(self, pipeline_run, prun_json, taskrun_json, platforms):
         responses.add(responses.GET, PIPELINE_RUN_URL, json=prun_json)
-        responses.add(responses.GET, TASK_RUN_URL, json=taskrun_json)
+        if taskrun_json:
+            taskrun_json['metadata']['name'] = TASK_RUN_NAME
+        add_task_runs_list(taskrun_json)
 
         assert pipeline_run.get_final_platforms() == platforms
 
@@ -941,7 +1232,6 @@ class TestPipelineRun():
     def test_any_task_failed_or_cancelled(
         self, pipeline_run, task_run_states, any_failed, any_canceled, caplog
     ):
-        taskrun_url = f'https://openshift.testing/apis/tekton.dev/v1beta1/namespaces/{TEST_OCP_NAMESPACE}/taskruns/' # noqa E501
         ppr_json = deepcopy(PIPELINE_RUN_JSON)
 
         if task_run_states is not None:
@@ -953,16 +1243,18 @@ class TestPipelineRun():
                 for counter in range(len(task_run_states))
             ]
 
-            counter = 0
-            for task_name, (status, reason, completion_time) in task_run_states:
+            task_runs = []
+            for counter, (task_name, (status, reason, completion_time)) in enumerate(
+                task_run_states
+            ):
                 taskr_json = deepcopy(TASK_RUN_JSON)
+                taskr_json['metadata']['name'] = f"task_run_{counter}"
                 taskr_json['metadata']['labels']['tekton.dev/pipelineTask'] = task_name
                 taskr_json['status'] = {"completionTime": completion_time,
                                         "conditions": [{"status": status, "reason": reason}]}
-                task_url = f"{taskrun_url}task_run_{counter}"
-                counter += 1
+                task_runs.append(taskr_json)
 
-                responses.add(responses.GET, task_url, json=taskr_json)
+            add_task_runs_list(*task_runs)
         else:
             ppr_json['status'].pop('childReferences', None)
 
@@ -1028,28 +1320,170 @@ class TestPipelineRun():
         assert pipeline_run.pipeline_results == expect_results
 
     @responses.activate
-    @pytest.mark.parametrize(('status', 'reason', 'sleep_times'), [
-        (None, None, 0),
-        ('True', 'Succeeded', 0),
-        ('False', 'Failed', 0),
-        ('Unknown', 'PipelineRunCancelled', 0),
-        ('Unknown', 'Running', WAIT_RETRY),
+    def test_snapshot(self, pipeline_run):
+        running = deepcopy(PIPELINE_RUN_JSON)
+        succeeded = deepcopy(PIPELINE_RUN_JSON)
+        succeeded['status']['conditions'][0] = {'status': 'True', 'reason': 'Succeeded'}
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=running)
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=succeeded)
+
+        with pipeline_run.snapshot() as data:
+            assert data == running
+            assert pipeline_run.has_not_finished()
+            assert pipeline_run.status_reason == 'Running'
+            assert pipeline_run.status_status == 'Unknown'
+            assert pipeline_run.child_references == running['status']['childReferences']
+            assert pipeline_run.pipeline_results == {}
+            with pipeline_run.snapshot() as nested_data:
+                assert nested_data == running
+            assert len(responses.calls) == 1
+
+            assert pipeline_run.refresh() == succeeded
+            assert not pipeline_run.has_not_finished()
+            assert pipeline_run.has_succeeded()
+            assert len(responses.calls) == 2
+
+        # outside of snapshot, data is always fresh
+        assert pipeline_run.data == succeeded
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_snapshot_threads(self, pipeline_run):
+        succeeded = deepcopy(PIPELINE_RUN_JSON)
+        succeeded['status']['conditions'][0] = {'status': 'True', 'reason': 'Succeeded'}
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=succeeded)
+        entered = threading.Event()
+        exited = threading.Event()
+        results = []
+
+        def other_snapshot():
+            with pipeline_run.snapshot():
+                entered.set()
+                exited.wait(10)
+                # snapshot of the main thread ended meanwhile
+                results.append(pipeline_run.status_reason)
+
+        with pipeline_run.snapshot():
+            thread = threading.Thread(target=other_snapshot)
+            thread.start()
+            entered.wait(10)
+            assert pipeline_run.status_reason == 'Running'
+        exited.set()
+        thread.join(10)
+
+        assert results == ['Succeeded']
+        assert len(responses.calls) == 2
+
+    @responses.activate
+    @pytest.mark.parametrize(('get_json', 'not_finished'), [
+        (PIPELINE_RUN_JSON, True),
+        ({}, False),
+    ])
+    def test_has_not_finished_single_fetch(self, pipeline_run, get_json, not_finished):
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=get_json)
+
+        assert pipeline_run.has_not_finished() == not_finished
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    @pytest.mark.parametrize(('status', 'reason'), [
+        (None, None),
+        ('True', 'Succeeded'),
+        ('False', 'Failed'),
+        ('Unknown', 'PipelineRunCancelled'),
     ])
-    def test_wait_for_finish(self, pipeline_run, status, reason, sleep_times):
+    def test_wait_for_finish_finished(self, pipeline_run, status, reason):
         get_json = deepcopy(PIPELINE_RUN_JSON)
         get_json['status']['conditions'][0]['reason'] = reason
         get_json['status']['conditions'][0]['status'] = status
         if status is None and reason is None:
             get_json = {}
         responses.add(responses.GET, PIPELINE_RUN_URL, json=get_json)
+        flexmock(time).should_receive('sleep').never()
+
+        assert pipeline_run.wait_for_finish() is True
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    @pytest.mark.parametrize('event_type', ['MODIFIED', 'DELETED'])
+    def test_wait_for_finish_watch(self, pipeline_run, event_type):
+        running = deepcopy(PIPELINE_RUN_JSON)
+        running['metadata'] = {'resourceVersion': '10'}
+        finished = deepcopy(PIPELINE_RUN_JSON)
+        finished['metadata'] = {'resourceVersion': '12'}
+        finished['status']['conditions'][0].update(status='True', reason='Succeeded')
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=running)
+        events = [{'type': 'MODIFIED', 'object': running},
+                  {'type': event_type, 'object': finished}]
+        responses.add(responses.GET, PIPELINE_WATCH_URL,
+                      body='\n'.join(json.dumps(event) for event in events))
+        flexmock(time).should_receive('sleep').never()
+
+        assert pipeline_run.wait_for_finish(timeout=60) is True
+        assert len(responses.calls) == 2
+        watch_url = responses.calls[1].request.url
+        assert 'resourceVersion=10' in watch_url
+        assert 'timeoutSeconds=60' in watch_url
+
+    @responses.activate
+    def test_wait_for_finish_expired_resource_version(self, pipeline_run):
+        finished = deepcopy(PIPELINE_RUN_JSON)
+        finished['status']['conditions'][0].update(status='False', reason='Failed')
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        responses.add(responses.GET, PIPELINE_WATCH_URL,
+                      json={'type': 'ERROR', 'object': {'kind': 'Status', 'code': 410}})
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=finished)
+
+        assert pipeline_run.wait_for_finish() is True
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_wait_for_finish_timeout(self, pipeline_run):
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        responses.add(responses.GET, PIPELINE_WATCH_URL, body='')
+
+        assert pipeline_run.wait_for_finish(timeout=0) is False
+        assert pipeline_run.wait_for_finish(deadline=time.time() - 1) is False
+        # pipeline run is fetched once to check whether it has already finished
+        assert len(responses.calls) == 2
+        assert all(call.request.url == PIPELINE_RUN_URL for call in responses.calls)
+
+    @responses.activate
+    def test_wait_for_finish_watch_reconnect_delay(self, pipeline_run):
+        finished = deepcopy(PIPELINE_RUN_JSON)
+        finished['status']['conditions'][0].update(status='True', reason='Succeeded')
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=finished)
+        # the server keeps closing watch streams right away
+        responses.add(responses.GET, PIPELINE_WATCH_URL, body='')
+        sleeps = []
+        flexmock(time).should_receive('sleep').replace_with(sleeps.append)
 
-        (flexmock(time)
-            .should_receive('sleep')
-            .with_args(WAIT_RETRY_SECS)
-            .times(sleep_times)
-            .and_return(None))
+        assert pipeline_run.wait_for_finish(timeout=3600) is True
+        assert sleeps == [WATCH_RETRY_SECS] * (WATCH_RETRY - 1)
+        watches = [call for call in responses.calls if 'watch' in call.request.url]
+        assert len(watches) == WATCH_RETRY
 
-        pipeline_run.wait_for_finish()
+    @responses.activate
+    def test_wait_for_finish_poll(self, pipeline_run):
+        finished = deepcopy(PIPELINE_RUN_JSON)
+        finished['status']['conditions'][0].update(status='True', reason='Succeeded')
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        responses.add(responses.GET, PIPELINE_WATCH_URL, json={}, status=403)
+        for _ in range(WAIT_POLL_MAX_SECS // WAIT_RETRY_SECS):
+            responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=finished)
+
+        sleeps = []
+        flexmock(time).should_receive('sleep').replace_with(sleeps.append)
+
+        assert pipeline_run.wait_for_finish() is True
+        # interval doubles up to the maximum
+        assert sleeps[:4] == [WAIT_RETRY_SECS, WAIT_RETRY_SECS * 2,
+                              WAIT_RETRY_SECS * 4, WAIT_RETRY_SECS * 8]
+        assert max(sleeps) == WAIT_POLL_MAX_SECS
+        assert len(sleeps) == WAIT_POLL_MAX_SECS // WAIT_RETRY_SECS
 
     @responses.activate
     def test_wait_for_start(self, pipeline_run):
@@ -1062,7 +1496,7 @@ class TestPipelineRun():
         responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
         resp = pipeline_run.wait_for_start()
 
-        assert len(responses.calls) == 2
+        assert len(responses.calls) == 1
         assert resp == PIPELINE_RUN_JSON
 
     @responses.activate
@@ -1090,8 +1524,7 @@ class TestPipelineRun():
         completed_pipeline = deepcopy(PIPELINE_RUN_JSON)
         completed_pipeline['status']['conditions'][0]['status'] = 'True'
         responses.add(responses.GET, PIPELINE_RUN_URL, json=deepcopy(PIPELINE_RUN_JSON))
-        responses.add(responses.GET, TASK_RUN_URL, json=deepcopy(TASK_RUN_JSON))
-        responses.add(responses.GET, TASK_RUN_URL2, json=deepcopy(TASK_RUN_JSON2))
+        add_task_runs_list(deepcopy(TASK_RUN_JSON), deepcopy(TASK_RUN_JSON2))
 
         def custom_watch(api_path, api_version, resource_type, resource_name,
                          **request_args):
@@ -1110,6 +1543,69 @@ class TestPipelineRun():
              PIPELINE_RUN_JSON['status']['childReferences'][0]['name']),
             (TASK_RUN_JSON2['metadata']['labels']['tekton.dev/pipelineTask'],
              PIPELINE_RUN_JSON['status']['childReferences'][1]['name'])]]
+        # task runs are listed only once, not fetched one by one
+        assert len(responses.calls) == 1
+
+    @responses.activate
+    def test_wait_for_taskruns_pipeline_task_name(self, pipeline_run):
+        flexmock(time).should_receive('sleep')
+        running_pipeline = deepcopy(PIPELINE_RUN_JSON)
+        for child_reference, task_run in zip(running_pipeline['status']['childReferences'],
+                                             (TASK_RUN_JSON, TASK_RUN_JSON2)):
+            pipeline_task_name = task_run['metadata']['labels']['tekton.dev/pipelineTask']
+            child_reference['pipelineTaskName'] = pipeline_task_name
+        completed_pipeline = deepcopy(running_pipeline)
+        completed_pipeline['status']['conditions'][0]['status'] = 'True'
+
+        def custom_watch(api_path, api_version, resource_type, resource_name,
+                         **request_args):
+            yield running_pipeline
+            yield completed_pipeline
+
+        flexmock(Openshift).should_receive('watch_resource').replace_with(custom_watch)
+        task_runs = [task_run for task_run in pipeline_run.wait_for_taskruns()]
+
+        assert task_runs == [[
+            (TASK_RUN_JSON['metadata']['labels']['tekton.dev/pipelineTask'], TASK_RUN_NAME),
+            (TASK_RUN_JSON2['metadata']['labels']['tekton.dev/pipelineTask'], TASK_RUN_NAME2)],
+            []]
+        # pipeline task names are known from child references, no task run is fetched
+        assert len(responses.calls) == 0
+
+    @responses.activate
+    def test_get_task_runs(self, pipeline_run):
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        # second task run was not yet in the list, it's fetched separately
+        add_task_runs_list(TASK_RUN_JSON)
+        responses.add(responses.GET, TASK_RUN_URL2, json=TASK_RUN_JSON2)
+
+        assert pipeline_run.get_task_runs() == {
+            TASK_RUN_JSON['metadata']['labels']['tekton.dev/pipelineTask']: TASK_RUN_JSON,
+            TASK_RUN_JSON2['metadata']['labels']['tekton.dev/pipelineTask']: TASK_RUN_JSON2,
+        }
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_get_task_runs_paginated(self, pipeline_run, openshift):
+        responses.add(
+            responses.GET,
+            TASK_RUNS_URL,
+            json={'metadata': {'continue': 'next-page'}, 'items': [TASK_RUN_JSON]},
+            match=[responses.matchers.query_param_matcher(
+                dict(TASK_RUNS_SELECTOR, limit='1'))],
+        )
+        responses.add(
+            responses.GET,
+            TASK_RUNS_URL,
+            json={'metadata': {}, 'items': [TASK_RUN_JSON2]},
+            match=[responses.matchers.query_param_matcher(
+                dict(TASK_RUNS_SELECTOR, limit='1', **{'continue': 'next-page'}))],
+        )
+
+        task_runs = openshift.list_resource(pipeline_run.api_path, pipeline_run.api_version,
+                                            'taskruns', limit=1, **TASK_RUNS_SELECTOR)
+        assert task_runs['items'] == [TASK_RUN_JSON, TASK_RUN_JSON2]
+        assert len(responses.calls) == 2
 
     @responses.activate
     def test_wait_for_taskruns_removed(self, pipeline_run):
@@ -1132,8 +1628,7 @@ class TestPipelineRun():
     ])
     def test_get_logs(self, pipeline_run, get_json, empty_logs):
         responses.add(responses.GET, PIPELINE_RUN_URL, json=get_json)
-        responses.add(responses.GET, TASK_RUN_URL, json=TASK_RUN_JSON)
-        responses.add(responses.GET, TASK_RUN_URL2, json=TASK_RUN_JSON2)
+        add_task_runs_list(TASK_RUN_JSON, TASK_RUN_JSON2)
 
         for container in CONTAINERS:
             url = f"{POD_URL}/log?container={container}"
@@ -1147,15 +1642,39 @@ class TestPipelineRun():
             assert len(responses.calls) == 1
             assert logs is None
         else:
-            # pipeline = 4
-            # tasks = 2
+            # pipeline = 1
+            # tasks list = 1
             # 3 steps per task = 6
-            assert len(responses.calls) == 12
+            assert len(responses.calls) == 8
             assert logs == {TASK_RUN_JSON2['metadata']['labels']['tekton.dev/pipelineTask']:
                             EXPECTED_LOGS2,
                             TASK_RUN_JSON['metadata']['labels']['tekton.dev/pipelineTask']:
                             EXPECTED_LOGS}
 
+    @responses.activate
+    def test_save_logs(self, pipeline_run, tmpdir):
+        responses.add(responses.GET, PIPELINE_RUN_URL, json=PIPELINE_RUN_JSON)
+        add_task_runs_list(TASK_RUN_JSON, TASK_RUN_JSON2)
+        for pod_url, logs in ((POD_URL, EXPECTED_LOGS), (POD_URL2, EXPECTED_LOGS2)):
+            for container, log in logs.items():
+                responses.add(responses.GET, f"{pod_url}/log?container={container}", body=log)
+
+        paths = pipeline_run.save_logs(tmpdir.strpath)
+
+        for task_run, logs in ((TASK_RUN_JSON, EXPECTED_LOGS), (TASK_RUN_JSON2, EXPECTED_LOGS2)):
+            task_name = task_run['metadata']['labels']['tekton.dev/pipelineTask']
+            assert set(paths[task_name]) == set(logs)
+            for container, path in paths[task_name].items():
+                assert path == os.path.join(tmpdir.strpath, f"{task_name}-{container}.log")
+                with open(path) as f:
+                    assert f.read() == logs[container]
+
+    @responses.activate
+    def test_save_logs_removed(self, pipeline_run, tmpdir):
+        responses.add(responses.GET, PIPELINE_RUN_URL, json={})
+        assert pipeline_run.save_logs(tmpdir.strpath) is None
+        assert tmpdir.listdir() == []
+
     @responses.activate
     def test_get_logs_stream(self, pipeline_run):
         responses.add(
@@ -1164,6 +1683,9 @@ class TestPipelineRun():
             json=PIPELINE_RUN_WATCH_JSON,
         )
         responses.add(responses.GET, PIPELINE_RUN_URL, json=deepcopy(PIPELINE_RUN_JSON))
+        add_task_runs_list(deepcopy(TASK_RUN_JSON), deepcopy(TASK_RUN_JSON2))
+        add_task_runs_list(deepcopy(TASK_RUN_JSON), deepcopy(TASK_RUN_JSON2),
+                           deepcopy(TASK_RUN_JSON3))
         responses.add(responses.GET, TASK_RUN_URL, json=deepcopy(TASK_RUN_JSON))
         responses.add(responses.GET, TASK_RUN_URL2, json=deepcopy(TASK_RUN_JSON2))
         responses.add(responses.GET, TASK_RUN_URL3, json=deepcopy(TASK_RUN_JSON3))
@@ -1204,7 +1726,7 @@ class TestPipelineRun():
          .replace_with(custom_watch))
 
         for container in CONTAINERS:
-            url = f"{POD_URL}/log?follow=True&container={container}"
+            url = f"{POD_URL}/log?follow=True&timestamps=true&container={container}"
             responses.add(
                 responses.GET,
                 url,
@@ -1212,15 +1734,18 @@ class TestPipelineRun():
                 match=[responses.matchers.request_kwargs_matcher({"stream": True})]
             )
         for container in CONTAINERS2:
-            url = f"{POD_URL2}/log?follow=True&container={container}"
+            url = f"{POD_URL2}/log?follow=True&timestamps=true&container={container}"
             responses.add(
                 responses.GET,
                 url,
                 body=EXPECTED_LOGS2[container],
                 match=[responses.matchers.request_kwargs_matcher({"stream": True})]
             )
+        for pod_url, pod_json in ((POD_URL, POD_JSON), (POD_URL2, POD_JSON2),
+                                  (POD_URL3, POD_JSON3)):
+            responses.add(responses.GET, pod_url, json=pod_json)
         for container in CONTAINERS3:
-            url = f"{POD_URL3}/log?follow=True&container={container}"
+            url = f"{POD_URL3}/log?follow=True&timestamps=true&container={container}"
             responses.add(
                 responses.GET,
                 url,
@@ -1229,22 +1754,25 @@ class TestPipelineRun():
             )
         logs = [line for line in pipeline_run.get_logs(follow=True, wait=True)]
 
-        assert logs == [(TASK_RUN_JSON['metadata']['labels']['tekton.dev/pipelineTask'],
-                         'Hello World'),
-                        (TASK_RUN_JSON2['metadata']['labels']['tekton.dev/pipelineTask'],
-                         '2Hello World'),
-                        (TASK_RUN_JSON['metadata']['labels']['tekton.dev/pipelineTask'],
-                         'Bye World'),
-                        (TASK_RUN_JSON2['metadata']['labels']['tekton.dev/pipelineTask'],
-                         '2'),
-                        (TASK_RUN_JSON2['metadata']['labels']['tekton.dev/pipelineTask'],
-                         '2Bye World'),
-                        (TASK_RUN_JSON3['metadata']['labels']['tekton.dev/pipelineTask'],
-                         '3Hello World'),
-                        (TASK_RUN_JSON3['metadata']['labels']['tekton.dev/pipelineTask'],
-                         '3'),
-                        (TASK_RUN_JSON3['metadata']['labels']['tekton.dev/pipelineTask'],
-                         '3Bye World')]
+        # containers are streamed at the same time, lines arrive in any order
+        assert sorted(logs) == sorted([
+            (TASK_RUN_JSON['metadata']['labels']['tekton.dev/pipelineTask'],
+             'Hello World'),
+            (TASK_RUN_JSON2['metadata']['labels']['tekton.dev/pipelineTask'],
+             '2Hello World'),
+            (TASK_RUN_JSON['metadata']['labels']['tekton.dev/pipelineTask'],
+             'Bye World'),
+            (TASK_RUN_JSON2['metadata']['labels']['tekton.dev/pipelineTask'],
+             '2'),
+            (TASK_RUN_JSON2['metadata']['labels']['tekton.dev/pipelineTask'],
+             '2Bye World'),
+            (TASK_RUN_JSON3['metadata']['labels']['tekton.dev/pipelineTask'],
+             '3Hello World'),
+            (TASK_RUN_JSON3['metadata']['labels']['tekton.dev/pipelineTask'],
+             '3'),
+            (TASK_RUN_JSON3['metadata']['labels']['tekton.dev/pipelineTask'],
+             '3Bye World'),
+        ])
 
     @responses.activate
     def test_get_logs_stream_removed(self, pipeline_run):
@@ -1254,6 +1782,7 @@ class TestPipelineRun():
             json=PIPELINE_RUN_WATCH_JSON,
         )
         responses.add(responses.GET, PIPELINE_RUN_URL, json=deepcopy(PIPELINE_RUN_JSON))
+        add_task_runs_list(deepcopy(TASK_RUN_JSON), deepcopy(TASK_RUN_JSON2))
         responses.add(responses.GET, TASK_RUN_URL, json=deepcopy(TASK_RUN_JSON))
         responses.add(responses.GET, TASK_RUN_URL2, json=deepcopy(TASK_RUN_JSON2))
 
@@ -1273,22 +1802,183 @@ class TestPipelineRun():
 
         # second task removed
         responses.add(responses.GET, TASK_RUN_URL2, json={})
+        responses.add(responses.GET, POD_URL, json=POD_JSON)
 
         (flexmock(Openshift)
          .should_receive('watch_resource')
          .replace_with(custom_watch))
 
         for container in CONTAINERS:
-            url = f"{POD_URL}/log?follow=True&container={container}"
+            url = f"{POD_URL}/log?follow=True&timestamps=true&container={container}"
             responses.add(
                 responses.GET,
                 url,
                 body=EXPECTED_LOGS[container],
                 match=[responses.matchers.request_kwargs_matcher({"stream": True})]
             )
-        logs = [line for line in pipeline_run.get_logs(follow=True, wait=True)]
+        cursors = {}
+        logs = list(pipeline_run.follow_logs(cursors=cursors))
+
+        assert sorted(logs) == [('short-sleep', 'step-bye', 'Bye World'),
+                                ('short-sleep', 'step-hello', 'Hello World')]
+        assert set(cursors) == {('short-sleep', container) for container in CONTAINERS}
+
+
+class TestListPipelineRunsStatus():
+
+    PIPELINE_RUNS_URL = f'https://openshift.testing/apis/tekton.dev/v1beta1/namespaces/{TEST_OCP_NAMESPACE}/pipelineruns' # noqa E501
+
+    @staticmethod
+    def pipeline_run_json(name, status, reason, completion_time=None):
+        run_status = {'conditions': [{'status': status, 'reason': reason}],
+                      'startTime': '2022-01-01T00:00:00Z'}
+        if completion_time:
+            run_status['completionTime'] = completion_time
+        return {'metadata': {'name': name}, 'status': run_status}
+
+    @responses.activate
+    def test_list_status(self, openshift):
+        running = self.pipeline_run_json('running', 'Unknown', 'Running')
+        failed = self.pipeline_run_json('failed', 'False', 'Failed', '2022-01-01T01:00:00Z')
+        succeeded = self.pipeline_run_json('succeeded', 'True', 'Succeeded',
+                                           '2022-01-01T01:00:00Z')
+        responses.add(
+            responses.GET,
+            self.PIPELINE_RUNS_URL,
+            json={'metadata': {'continue': 'next-page'}, 'items': [running, failed]},
+            match=[responses.matchers.query_param_matcher(
+                {'labelSelector': 'app=osbs', 'limit': '500'})],
+        )
+        responses.add(
+            responses.GET,
+            self.PIPELINE_RUNS_URL,
+            json={'metadata': {}, 'items': [succeeded]},
+            match=[responses.matchers.query_param_matcher(
+                {'labelSelector': 'app=osbs', 'limit': '500', 'continue': 'next-page'})],
+        )
+
+        failed_task_run = deepcopy(TASK_RUN_JSON)
+        failed_task_run['metadata']['labels']['tekton.dev/pipelineRun'] = 'failed'
+        failed_task_run['status']['conditions'][0].update(status='False', reason='Failed')
+        failed_task_run['status']['completionTime'] = '2022-01-01T01:00:00Z'
+        cancelled_task_run = deepcopy(TASK_RUN_JSON2)
+        cancelled_task_run['metadata']['labels']['tekton.dev/pipelineRun'] = 'failed'
+        cancelled_task_run['status']['conditions'][0].update(status='False',
+                                                             reason='TaskRunCancelled')
+        cancelled_task_run['status']['completionTime'] = '2022-01-01T01:00:00Z'
+        responses.add(
+            responses.GET,
+            TASK_RUNS_URL,
+            json={'metadata': {}, 'items': [failed_task_run, cancelled_task_run]},
+            match=[responses.matchers.query_param_matcher(
+                {'labelSelector': 'tekton.dev/pipelineRun in (failed)', 'limit': '500'})],
+        )
+
+        statuses = list_pipeline_runs_status(openshift, label_selector='app=osbs')
+
+        assert statuses == {
+            'running': PipelineRunStatus('running', 'Unknown', 'Running',
+                                         '2022-01-01T00:00:00Z', None, []),
+            'failed': PipelineRunStatus('failed', 'False', 'Failed', '2022-01-01T00:00:00Z',
+                                        '2022-01-01T01:00:00Z', ['short-sleep']),
+            'succeeded': PipelineRunStatus('succeeded', 'True', 'Succeeded',
+                                           '2022-01-01T00:00:00Z', '2022-01-01T01:00:00Z', []),
+        }
+        assert len(responses.calls) == 3
+
+    @responses.activate
+    def test_list_status_by_name(self, openshift):
+        responses.add(responses.GET, f'{self.PIPELINE_RUNS_URL}/running',
+                      json=self.pipeline_run_json('running', 'Unknown', 'Running'))
+        responses.add(responses.GET, f'{self.PIPELINE_RUNS_URL}/gone', status=404,
+                      json={'kind': 'Status', 'code': 404})
+
+        statuses = list_pipeline_runs_status(openshift, pipeline_run_names=['running', 'gone'])
+
+        assert list(statuses) == ['running', 'gone']
+        assert statuses['running'].reason == 'Running'
+        assert statuses['gone'] is None
+        # pipeline runs are fetched by names, no failed ones, task runs are not listed
+        assert len(responses.calls) == 2
+
+    @pytest.mark.parametrize(('names', 'label_selector', 'query'), [
+        (['running', 'gone'], 'app=osbs', {'labelSelector': 'app=osbs', 'limit': '500'}),
+        ([f'run-{i}' for i in range(STATUS_GET_MAX_NAMES)] + ['running'], None,
+         {'limit': '500'}),
+    ])
+    @responses.activate
+    def test_list_status_by_name_listed(self, openshift, names, label_selector, query):
+        responses.add(
+            responses.GET,
+            self.PIPELINE_RUNS_URL,
+            json={'metadata': {}, 'items': [
+                self.pipeline_run_json('running', 'Unknown', 'Running'),
+                self.pipeline_run_json('other', 'Unknown', 'Running'),
+            ]},
+            match=[responses.matchers.query_param_matcher(query)],
+        )
+
+        statuses = list_pipeline_runs_status(openshift, pipeline_run_names=names,
+                                             label_selector=label_selector)
+
+        assert list(statuses) == names
+        assert statuses['running'].reason == 'Running'
+        assert 'other' not in statuses
+        assert len(responses.calls) == 1
+
+
+class TestLogMultiplexer():
+
+    def test_no_head_of_line_blocking(self):
+        fast_line_read = threading.Event()
+
+        def slow_stream():
+            # blocks until the line of the other stream was consumed
+            assert fast_line_read.wait(5)
+            yield 'slow'
+
+        logs = _LogMultiplexer()
+        logs.add(('task1', 'step-slow'), slow_stream)
+        logs.add(('task2', 'step-fast'), iter, ['fast'])
+
+        lines = iter(logs)
+        assert next(lines) == ('task2', 'step-fast', 'fast')
+        fast_line_read.set()
+        assert list(lines) == [('task1', 'step-slow', 'slow')]
+
+    def test_buffer_size(self):
+        produced = []
+
+        def stream():
+            for i in range(5):
+                produced.append(i)
+                yield i
+
+        logs = _LogMultiplexer(buffer_size=2)
+        logs.add(('task', 'step'), stream)
+        lines = iter(logs)
+        assert next(lines) == ('task', 'step', 0)
+        time.sleep(0.1)
+        # one consumed line and two buffered ones, next line waits for a free slot
+        assert len(produced) <= 4
+        assert [line for _, _, line in lines] == [1, 2, 3, 4]
+
+    def test_added_streams(self):
+        logs = _LogMultiplexer()
+
+        def parent():
+            logs.add(('task', 'step'), iter, ['child'])
+            yield 'parent'
+
+        logs.add(('task', 'init'), parent)
+        assert sorted(logs) == [('task', 'init', 'parent'), ('task', 'step', 'child')]
+
+    def test_stream_error(self):
+        def failing_stream():
+            yield 'line'
+            raise OsbsException('stream failed')
 
-        assert logs == [(TASK_RUN_JSON['metadata']['labels']['tekton.dev/pipelineTask'],
-                         'Hello World'),
-                        (TASK_RUN_JSON['metadata']['labels']['tekton.dev/pipelineTask'],
-                         'Bye World')]
+        logs = _LogMultiplexer()
+        logs.add(('task', 'step'), failing_stream)
+        with pytest.raises(OsbsException, match='stream failed'):
+            list(logs)
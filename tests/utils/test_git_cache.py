@@ -0,0 +1,82 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from osbs.utils import clone_git_repo
+from osbs.utils.git_cache import GitMirrorCache
+from tests.utils.test_utils import initialize_git_repo
+
+
+def head(repo_path):
+    return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=repo_path,
+                                   universal_newlines=True).strip()
+
+
+@pytest.fixture
+def source_repo(tmpdir):
+    repo_path = tmpdir.mkdir('source').strpath
+    initialize_git_repo(repo_path, files=['Dockerfile'])
+    return repo_path
+
+
+def test_clone_from_mirror(tmpdir, source_repo):
+    cache = GitMirrorCache(tmpdir.join('cache').strpath)
+    commit = head(source_repo)
+
+    repo_data = clone_git_repo(source_repo, tmpdir.join('first').strpath, commit=commit,
+                               retry_times=0, git_cache=cache)
+    assert repo_data.commit_id == commit
+    assert os.path.isdir(cache.mirror_path(source_repo))
+    remote = subprocess.check_output(['git', 'remote', 'get-url', 'origin'],
+                                     cwd=repo_data.repo_path, universal_newlines=True)
+    assert remote.strip() == source_repo
+
+    # the commit is already mirrored, the source repo isn't needed anymore
+    shutil.move(source_repo, tmpdir.join('moved').strpath)
+    repo_data = clone_git_repo(source_repo, tmpdir.join('second').strpath, commit=commit,
+                               retry_times=0, git_cache=cache)
+    assert repo_data.commit_id == commit
+
+
+def test_mirror_fetched(tmpdir, source_repo):
+    cache = GitMirrorCache(tmpdir.join('cache').strpath)
+    clone_git_repo(source_repo, tmpdir.join('first').strpath, commit=head(source_repo),
+                   retry_times=0, git_cache=cache)
+
+    subprocess.check_call(['git', 'commit', '--allow-empty', '-m', 'more'], cwd=source_repo)
+    commit = head(source_repo)
+    repo_data = clone_git_repo(source_repo, tmpdir.join('second').strpath, commit=commit,
+                               retry_times=0, git_cache=cache)
+    assert repo_data.commit_id == commit
+
+
+def test_evict(tmpdir, source_repo):
+    cache = GitMirrorCache(tmpdir.join('cache').strpath, max_size=0)
+    mirror_path = cache.mirror_path(source_repo)
+
+    clone_git_repo(source_repo, tmpdir.join('first').strpath, commit='HEAD', retry_times=0,
+                   git_cache=cache)
+    assert not os.path.exists(mirror_path)
+
+    cache.max_size = 2 ** 40
+    clone_git_repo(source_repo, tmpdir.join('second').strpath, commit='HEAD', retry_times=0,
+                   git_cache=cache)
+    assert os.path.isdir(mirror_path)
+
+    # mirrors in use are not removed
+    cache.max_size = 0
+    with cache._lock(mirror_path):
+        cache.evict()
+    assert os.path.isdir(mirror_path)
+
+    cache.evict()
+    assert not os.path.exists(mirror_path)
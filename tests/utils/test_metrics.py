@@ -0,0 +1,159 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import logging
+import os
+from textwrap import dedent
+
+import pytest
+import responses
+
+from osbs.osbs_http import HttpSession
+from osbs.utils import metrics
+from osbs.utils.metrics import (COUNT, SPAN, CallbackSink, LoggingSink, MetricEvent,
+                                PrometheusFileSink)
+from osbs.utils.yaml import read_yaml
+
+
+@pytest.fixture
+def events():
+    received = []
+    sink = CallbackSink(received.append)
+    metrics.add_sink(sink)
+    yield received
+    metrics.remove_sink(sink)
+
+
+def test_disabled():
+    assert not metrics.enabled()
+    with metrics.span('operation') as span:
+        assert span is None
+    metrics.count('counter')
+
+    @metrics.instrumented('operation')
+    def func(value):
+        return value
+
+    assert func(1) == 1
+
+
+def test_span_and_count(events):
+    assert metrics.enabled()
+    with metrics.span('operation', kind='test'):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.span('operation'):
+            raise ValueError
+    metrics.count('counter', 3, kind='test')
+
+    assert [(e.kind, e.name, e.labels, e.error) for e in events] == [
+        (SPAN, 'operation', {'kind': 'test'}, False),
+        (SPAN, 'operation', {}, True),
+        (COUNT, 'counter', {'kind': 'test'}, False),
+    ]
+    assert events[0].value >= 0
+    assert events[2].value == 3
+
+
+def test_instrumented(events):
+    @metrics.instrumented('operation')
+    def func(value):
+        return value * 2
+
+    assert func.__name__ == 'func'
+    assert func(2) == 4
+    assert [(e.kind, e.name) for e in events] == [(SPAN, 'operation')]
+
+
+def test_failing_sink(events, caplog):
+    def fail(event):
+        raise RuntimeError('sink failed')
+
+    sink = CallbackSink(fail)
+    metrics.add_sink(sink)
+    try:
+        metrics.count('counter')
+    finally:
+        metrics.remove_sink(sink)
+
+    # other sinks still get the event
+    assert events == [MetricEvent(COUNT, 'counter', 1, {}, False)]
+    assert 'metrics sink' in caplog.text
+
+
+def test_logging_sink(caplog):
+    sink = LoggingSink(level=logging.INFO)
+    metrics.add_sink(sink)
+    try:
+        with caplog.at_level(logging.INFO, logger='osbs.utils.metrics'):
+            with metrics.span('operation', kind='test'):
+                pass
+            metrics.count('counter', 2)
+    finally:
+        metrics.remove_sink(sink)
+
+    assert "span operation {'kind': 'test'} took" in caplog.text
+    assert "count counter {} +2" in caplog.text
+
+
+def test_prometheus_file_sink(tmpdir):
+    path = str(tmpdir.join('osbs.prom'))
+    sink = PrometheusFileSink(path, buckets=(0.1, 1))
+    sink.record_span('http_request', 0.05, {'method': 'get'}, False)
+    sink.record_span('http_request', 0.5, {'method': 'get'}, True)
+    sink.record_count('http_retries', 2, {})
+    sink.record_count('yaml_bytes', 10, {'schema': 'a"b\\c'})
+    assert not os.path.exists(path)
+
+    sink.flush()
+    with open(path) as f:
+        assert f.read() == dedent("""\
+            # TYPE osbs_http_request_seconds histogram
+            osbs_http_request_seconds_bucket{le="0.1",method="get"} 1
+            osbs_http_request_seconds_bucket{le="1",method="get"} 2
+            osbs_http_request_seconds_bucket{le="+Inf",method="get"} 2
+            osbs_http_request_seconds_sum{method="get"} 0.55
+            osbs_http_request_seconds_count{method="get"} 2
+            # TYPE osbs_http_request_errors_total counter
+            osbs_http_request_errors_total{method="get"} 1
+            # TYPE osbs_http_retries_total counter
+            osbs_http_retries_total 2
+            # TYPE osbs_yaml_bytes_total counter
+            osbs_yaml_bytes_total{schema="a\\"b\\\\c"} 10
+            """)
+    assert os.listdir(str(tmpdir)) == ['osbs.prom']
+
+
+def test_prometheus_file_sink_interval(tmpdir):
+    path = str(tmpdir.join('osbs.prom'))
+    sink = PrometheusFileSink(path, interval=0)
+    sink.record_count('counter', 1, {})
+    with open(path) as f:
+        assert 'osbs_counter_total 1' in f.read()
+
+
+@responses.activate
+def test_http_request_metrics(events):
+    url = 'https://openshift.testing/api'
+    responses.add(responses.GET, url, body=b'0123456789')
+
+    HttpSession().get(url)
+
+    assert [(e.kind, e.name, e.labels, e.value) for e in events if e.kind == COUNT] == [
+        (COUNT, 'http_response_bytes', {}, 10),
+    ]
+    assert [(e.name, e.labels) for e in events if e.kind == SPAN] == [
+        ('http_request', {'method': 'get'}),
+    ]
+
+
+def test_read_yaml_metrics(events):
+    read_yaml('platforms:\n  only: [x86_64]\n', 'schemas/container.json')
+    assert [(e.kind, e.name, e.labels) for e in events] == [
+        (COUNT, 'yaml_bytes', {'schema': 'schemas/container.json'}),
+        (SPAN, 'read_yaml', {'schema': 'schemas/container.json'}),
+    ]
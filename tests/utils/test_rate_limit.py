@@ -0,0 +1,75 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import threading
+import time
+
+import pytest
+from flexmock import flexmock
+
+from osbs.utils.rate_limit import RateLimiter
+
+
+@pytest.fixture
+def clock():
+    """Fake monotonic clock, advanced by time.sleep"""
+    now = [1000.0]
+
+    def sleep(seconds):
+        now[0] += seconds
+
+    flexmock(time).should_receive('monotonic').replace_with(lambda: now[0])
+    flexmock(time).should_receive('sleep').replace_with(sleep)
+    return now
+
+
+def test_burst_then_qps(clock):
+    limiter = RateLimiter(qps=2, burst=3)
+    waits = [limiter.acquire() for _ in range(5)]
+    assert waits == [0, 0, 0, 0.5, 0.5]
+    assert clock[0] == 1001.0
+
+    assert limiter.get_stats() == {
+        'requests': 5,
+        'throttled': 2,
+        'wait_seconds': 1.0,
+        'max_wait_seconds': 0.5,
+    }
+
+
+def test_refill(clock):
+    limiter = RateLimiter(qps=1, burst=2)
+    limiter.acquire()
+    limiter.acquire()
+    clock[0] += 10
+    # the bucket holds at most burst tokens
+    assert [limiter.acquire() for _ in range(3)] == [0, 0, 1]
+
+
+def test_default_burst():
+    assert RateLimiter(qps=2.5).burst == 3
+    assert RateLimiter(qps=0.1).burst == 1
+
+
+def test_invalid_qps():
+    with pytest.raises(ValueError):
+        RateLimiter(qps=0)
+
+
+def test_threads():
+    limiter = RateLimiter(qps=1000, burst=1)
+    threads = [threading.Thread(target=limiter.acquire) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = limiter.get_stats()
+    assert stats['requests'] == 20
+    assert stats['throttled'] >= 1
+    # requests reserve consecutive slots, none waits longer than all the others together
+    assert stats['max_wait_seconds'] <= 19 / 1000.0 + 0.01
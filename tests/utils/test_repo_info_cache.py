@@ -0,0 +1,113 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import json
+import os
+import time
+
+import pytest
+from flexmock import flexmock
+
+import osbs.utils
+from osbs.repo_utils import RepoInfo, RepoConfiguration
+from osbs.utils import Labels, get_repo_info
+from osbs.utils.repo_info_cache import RepoInfoCache
+from tests.utils.test_utils import initialize_git_repo
+
+GIT_URI = 'https://git.example.com/repo.git'
+COMMIT = 'a' * 40
+COMMIT2 = 'b' * 40
+
+
+def repo_info(git_ref=COMMIT):
+    return RepoInfo(configuration=RepoConfiguration(git_uri=GIT_URI, git_ref=git_ref))
+
+
+@pytest.mark.parametrize('on_disk', [False, True])
+def test_get_put(tmpdir, on_disk):
+    cache = RepoInfoCache(cache_dir=tmpdir.strpath if on_disk else None)
+    assert cache.get(GIT_URI, COMMIT) is None
+
+    cache.put(GIT_URI, COMMIT, repo_info())
+    cached = cache.get(GIT_URI, COMMIT)
+    assert cached.git_ref == COMMIT
+    # a copy is returned, so callers can't modify the cached entry
+    cached.configuration.git_ref = 'modified'
+    assert cache.get(GIT_URI, COMMIT).git_ref == COMMIT
+
+    assert cache.get(GIT_URI, COMMIT, git_branch='other') is None
+    assert cache.get(GIT_URI, COMMIT2) is None
+
+
+def test_shared_on_disk(tmpdir):
+    RepoInfoCache(cache_dir=tmpdir.strpath).put(GIT_URI, COMMIT, repo_info())
+
+    assert RepoInfoCache(cache_dir=tmpdir.strpath).get(GIT_URI, COMMIT).git_ref == COMMIT
+    assert RepoInfoCache().get(GIT_URI, COMMIT) is None
+
+
+def test_ttl(tmpdir):
+    cache = RepoInfoCache(cache_dir=tmpdir.strpath, ttl=60)
+    cache.put(GIT_URI, COMMIT, repo_info())
+
+    now = time.time()
+    flexmock(time).should_receive('time').and_return(now + 61)
+    assert cache.get(GIT_URI, COMMIT) is None
+    assert os.listdir(tmpdir.strpath) == []
+
+
+def test_max_entries(tmpdir):
+    cache = RepoInfoCache(cache_dir=tmpdir.strpath, max_entries=1)
+    cache.put(GIT_URI, COMMIT, repo_info())
+    cache.put(GIT_URI, COMMIT2, repo_info(COMMIT2))
+
+    assert len(os.listdir(tmpdir.strpath)) == 1
+    assert cache.get(GIT_URI, COMMIT) is None
+    assert cache.get(GIT_URI, COMMIT2).git_ref == COMMIT2
+
+
+def test_unreadable_entry(tmpdir):
+    cache = RepoInfoCache(cache_dir=tmpdir.strpath)
+    cache.put(GIT_URI, COMMIT, repo_info())
+    path = os.path.join(tmpdir.strpath, os.listdir(tmpdir.strpath)[0])
+    with open(path, 'w') as f:
+        f.write('{"git_uri": ')
+
+    assert RepoInfoCache(cache_dir=tmpdir.strpath).get(GIT_URI, COMMIT) is None
+    assert os.listdir(tmpdir.strpath) == []
+
+
+@pytest.mark.parametrize('on_disk', [False, True])
+def test_get_repo_info_cached(tmpdir, on_disk):
+    repo_path = tmpdir.mkdir('repo').strpath
+    with open(os.path.join(repo_path, 'Dockerfile'), 'w') as f:
+        f.write('FROM fedora\nLABEL name=test\n')
+    with open(os.path.join(repo_path, 'container.yaml'), 'w') as f:
+        f.write('platforms:\n  only: [x86_64]\ntags: [latest, v1]\n')
+    initialize_git_repo(repo_path, files=['Dockerfile', 'container.yaml'])
+    commit = osbs.utils.get_commit_id(repo_path)
+    cache_dir = tmpdir.mkdir('cache').strpath if on_disk else None
+
+    cache = RepoInfoCache(cache_dir=cache_dir)
+
+    info = get_repo_info(repo_path, commit, repo_info_cache=cache)
+    if on_disk:
+        with open(os.path.join(cache_dir, os.listdir(cache_dir)[0])) as f:
+            assert json.load(f)['dockerfile']['baseimage'] == 'fedora'
+    flexmock(osbs.utils).should_receive('checkout_git_repo').never()
+    if on_disk:
+        # read by another process
+        cache = RepoInfoCache(cache_dir=cache_dir)
+    cached = get_repo_info(repo_path, commit, repo_info_cache=cache)
+
+    assert cached.git_ref == info.git_ref == commit
+    assert cached.git_commit_depth == info.git_commit_depth
+    assert cached.labels.get_name_and_value(Labels.LABEL_TYPE_NAME) == ('name', 'test')
+    assert cached.base_image == 'fedora'
+    assert cached.configuration.container == info.configuration.container
+    assert sorted(cached.additional_tags.tags) == ['latest', 'v1']
+    assert cached.additional_tags.from_container_yaml
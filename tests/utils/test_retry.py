@@ -0,0 +1,102 @@
+"""
+Copyright (c) 2022 Red Hat, Inc
+All rights reserved.
+
+This software may be modified and distributed under the terms
+of the BSD license. See the LICENSE file for details.
+"""
+import time
+
+import pytest
+from flexmock import flexmock
+
+from osbs.exceptions import OsbsResponseException
+from osbs.utils import RetryFunc
+from osbs.utils.retry import Backoff, CircuitBreaker, decorrelated_jitter
+
+
+def test_decorrelated_jitter():
+    delays = [decorrelated_jitter(1, 10) for _ in range(100)]
+    assert all(1 <= delay <= 30 for delay in delays)
+    assert len(set(delays)) > 1
+    assert all(1 <= decorrelated_jitter(1, 0) <= 3 for _ in range(100))
+    assert decorrelated_jitter(5, 100, max_delay=5) == 5
+
+
+def test_backoff_without_jitter():
+    backoff = Backoff(2, max_delay=10, jitter=False)
+    assert [backoff.next_delay() for _ in range(5)] == [2, 4, 8, 10, 10]
+    assert backoff.attempts == 5
+
+
+def test_backoff_deadline():
+    now = [100]
+    flexmock(time).should_receive('monotonic').replace_with(lambda: now[0])
+    backoff = Backoff(4, jitter=False, deadline=10)
+    assert backoff.remaining() == 10
+    assert backoff.next_delay() == 4
+    now[0] += 4
+    # next delay, 8 seconds, would exceed the deadline
+    assert backoff.next_delay() is None
+
+    flexmock(time).should_receive('sleep').never()
+    assert not backoff.sleep()
+
+
+def test_circuit_breaker():
+    now = [0]
+    flexmock(time).should_receive('monotonic').replace_with(lambda: now[0])
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    breaker.record_failure()
+    assert breaker.allow_request()
+    assert breaker.retry_after() == 0
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    assert not breaker.allow_request()
+    now[0] = 10
+    assert breaker.retry_after() == 20
+
+    # a single trial request after reset_timeout
+    now[0] = 30
+    assert breaker.allow_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert not breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+    now[0] = 60
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.failures == 0
+
+
+def test_circuit_breaker_disabled():
+    breaker = CircuitBreaker(failure_threshold=0, reset_timeout=30)
+    for _ in range(10):
+        breaker.record_failure()
+    assert breaker.allow_request()
+
+
+@pytest.mark.parametrize(('deadline', 'calls'), [
+    (None, 4),
+    (16, 3),
+])
+def test_retry_func_deadline(deadline, calls):
+    sleeps = []
+    flexmock(time).should_receive('sleep').replace_with(sleeps.append)
+    flexmock(time).should_receive('monotonic').replace_with(lambda: sum(sleeps))
+
+    def conflict():
+        conflict.calls += 1
+        raise OsbsResponseException('conflict', 409)
+    conflict.calls = 0
+
+    retry_func = RetryFunc(OsbsResponseException, retry_times=3, retry_delay=5,
+                           deadline=deadline, jitter=False)
+    with pytest.raises(OsbsResponseException):
+        retry_func.go(conflict)
+
+    assert conflict.calls == calls
+    assert sleeps == [5, 10, 20][:calls - 1]
@@ -359,6 +359,55 @@ def test_get_repo_info(tmpdir):
     assert info.configuration.container == {'compose': {'modules': ['n:s:v']}}
 
 
+def test_clone_git_repo_metadata_only(tmpdir):
+    repo_path = tmpdir.mkdir("repo").strpath
+    os.mkdir(os.path.join(repo_path, 'src'))
+    with open(os.path.join(repo_path, 'src', 'main.c'), 'w') as f:
+        f.write('int main() { return 0; }\n')
+    initialize_git_repo(repo_path, files=['Dockerfile', REPO_CONTAINER_CONFIG, 'src/main.c'])
+    subprocess.check_call(['git', 'config', 'uploadpack.allowFilter', 'true'], cwd=repo_path)
+
+    clone_path = tmpdir.join("clone").strpath
+    repo_data = clone_git_repo('file://' + repo_path, clone_path, commit='HEAD',
+                               retry_times=0, metadata_only=True)
+
+    assert len(repo_data.commit_id) == 40
+    assert os.path.exists(os.path.join(clone_path, 'Dockerfile'))
+    assert os.path.exists(os.path.join(clone_path, REPO_CONTAINER_CONFIG))
+    assert not os.path.exists(os.path.join(clone_path, 'src'))
+    # blobs of files which aren't checked out were not fetched
+    missing = subprocess.check_output(['git', 'rev-list', '--objects', '--missing=print', 'HEAD'],
+                                      cwd=clone_path, universal_newlines=True)
+    assert '?' in missing
+
+
+@pytest.mark.parametrize('allow_fetch_by_sha', [True, False])
+def test_clone_git_repo_deepen(tmpdir, monkeypatch, allow_fetch_by_sha):
+    repo_path = tmpdir.mkdir("repo").strpath
+    first_commit = initialize_git_repo(repo_path, files=['Dockerfile']).decode()
+    for i in range(5):
+        subprocess.check_call(['git', 'commit', '--allow-empty', '-m', str(i)], cwd=repo_path)
+    branch = subprocess.check_output(['git', 'rev-parse', '--abbrev-ref', 'HEAD'],
+                                     cwd=repo_path, universal_newlines=True).strip()
+    if not allow_fetch_by_sha:
+        # protocol v2 always allows it, v0 only when configured
+        monkeypatch.setenv('GIT_CONFIG_PARAMETERS', "'protocol.version=0'")
+
+    timings = {}
+    repo_data = clone_git_repo('file://' + repo_path, tmpdir.join("clone").strpath,
+                               commit=first_commit, branch=branch, depth=1, retry_times=0,
+                               timings=timings)
+
+    assert repo_data.commit_id == first_commit
+    assert repo_data.commit_depth is None
+    if allow_fetch_by_sha:
+        assert 'fetch_shallow_since' in timings
+        assert 'fetch_deepen' not in timings
+    else:
+        assert 'fetch_deepen' in timings
+    assert {'clone', 'status', 'resolve', 'reset'} <= set(timings)
+
+
 def initialize_git_repo(rpath, files=None):
     subprocess.Popen(['git', 'init', rpath]).wait()
     subprocess.Popen(['git', 'config', 'user.name', '"Gerald Host"'], cwd=rpath).wait()
@@ -13,20 +13,28 @@ from textwrap import dedent
 from osbs.utils.yaml import (read_yaml,
                              read_yaml_from_file_path,
                              load_schema,
+                             get_schema_validator,
                              validate_with_schema)
 
 
 from osbs.exceptions import OsbsValidationException
+import osbs.utils.yaml
 
 import json
 import jsonschema
 import os
-import pkg_resources
 import pytest
 import yaml
 import re
 
 
+@pytest.fixture(autouse=True)
+def clear_schema_validators():
+    # tests mock loading of schemas, don't reuse validators from other tests
+    get_schema_validator.cache_clear()
+    osbs.utils.yaml._schema_validators.clear()
+
+
 def test_read_yaml_file_ioerrors(tmpdir):
     config_path = os.path.join(str(tmpdir), 'nosuchfile.yaml')
     with pytest.raises(IOError):
@@ -62,15 +70,9 @@ def test_read_yaml_bad_package(caplog):
 
 
 def test_read_yaml_file_bad_extract(tmpdir, caplog):
-    class FakeProvider(object):
-        def get_resource_stream(self, pkg, rsc):
-            raise IOError
-
-    # pkg_resources.resource_stream() cannot be mocked directly
-    # Instead mock the module-level function it calls.
-    (flexmock(pkg_resources)
-        .should_receive('get_provider')
-        .and_return(FakeProvider()))
+    (flexmock(osbs.utils.yaml)
+        .should_receive('_open_resource')
+        .and_raise(IOError))
 
     config_path = os.path.join(str(tmpdir), 'config.yaml')
     with open(config_path, 'w'):
@@ -118,6 +120,14 @@ def test_read_yaml_validation_error(config, expected, caplog):
     assert expected == str(exc_info.value)
 
 
+def test_schema_validator_memoized():
+    validator = get_schema_validator('osbs', 'schemas/container.json')
+    flexmock(json).should_receive('load').never()
+
+    assert get_schema_validator('osbs', 'schemas/container.json') is validator
+    assert read_yaml('platforms: {only: x86_64}', 'schemas/container.json')
+
+
 @pytest.mark.parametrize(('package', 'package_pass'), [
     ('osbs', True),
     ('FOO', False)
@@ -188,6 +198,26 @@ def test_validate_with_schema_validation(config, validation_pass, expected, capl
         assert expected == ''
 
 
+def test_validate_with_schema_memoized():
+    schema = {'type': 'object', 'properties': {'name': {'type': 'string'}}}
+    validate_with_schema({'name': 'foo'}, schema)
+
+    flexmock(jsonschema.Draft4Validator).should_receive('check_schema').never()
+    flexmock(jsonschema).should_receive('Draft4Validator').never()
+    validate_with_schema({'name': 'bar'}, schema)
+    with pytest.raises(OsbsValidationException):
+        validate_with_schema({'name': 1}, schema)
+
+
+def test_validate_with_schema_cache_size(monkeypatch):
+    monkeypatch.setattr(osbs.utils.yaml, 'SCHEMA_VALIDATORS_MAX', 2)
+    schemas = [{'type': 'object'} for _ in range(3)]
+    for schema in schemas:
+        validate_with_schema({}, schema)
+
+    assert [schema for schema, _ in osbs.utils.yaml._schema_validators.values()] == schemas[1:]
+
+
 def test_validate_with_schema_bad_schema(caplog):
     config = {
         'name': 'foo'